@@ -0,0 +1,135 @@
+import email.utils
+import random
+import threading
+import time
+from TokenBucket import TokenBucket
+
+
+class AdaptiveThrottle:
+    """
+    Paces every request made to Instagram, adapting the request rate to how Instagram is responding. The rate is raised
+    a little after each fast, successful response, and cut sharply when Instagram throttles us (429), errors (5xx), or
+    responds slowly, in the manner of additive-increase/multiplicative-decrease congestion control.
+
+    Throttled and failed requests are retried with exponential backoff and full jitter, up to `max_retries` times. When
+    Instagram responds with a Retry-After header, it is honored, and a 429 pauses every worker sharing the throttle, not
+    just the one which was throttled.
+    """
+
+    def __init__(self, rate=1, min_rate=0.05, max_rate=5, max_retries=5, base_delay=1, max_delay=60,
+                 target_latency=2):
+        """
+        Initialization.
+
+        Args:
+            rate: The initial number of requests permitted per second.
+            min_rate: The lowest the request rate will be cut to, unless max_rate is lower still.
+            max_rate: The highest the request rate will be raised to. Never exceeded, whatever the initial rate.
+            max_retries: The maximum number of times a single request is retried.
+            base_delay: The delay, in seconds, before the first retry, which doubles with each further retry.
+            max_delay: The maximum delay, in seconds, before a retry.
+            target_latency: Responses slower than this many seconds are taken as a sign to slow down.
+        """
+        self.min_rate = min(min_rate, max_rate)
+        self.max_rate = max_rate
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.target_latency = target_latency
+
+        self.rate = min(max(rate, self.min_rate), max_rate)
+        self.bucket = TokenBucket(self.rate)
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until the next request may be made.
+        """
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause <= 0:
+                break
+
+            time.sleep(pause)
+
+        self.bucket.acquire()
+
+    def record(self, status_code, latency):
+        """
+        Adjusts the request rate following a response from Instagram.
+
+        Args:
+            status_code: The status code of the response, or None if no response was received.
+            latency: The number of seconds the request took.
+        """
+        with self.lock:
+            if status_code is None or self.is_retryable(status_code):
+                self.rate = max(self.min_rate, self.rate / 2)
+            elif latency > self.target_latency:
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            elif status_code < 400:
+                self.rate = min(self.max_rate, self.rate + 0.05)
+
+            self.bucket.set_rate(self.rate)
+
+    @staticmethod
+    def is_retryable(status_code):
+        """
+        Args:
+            status_code: The status code of a response from Instagram.
+
+        Returns:
+            True if the request was throttled or failed on Instagram's side, and is worth retrying.
+        """
+        return status_code == 429 or status_code >= 500
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Calculates the delay before a request is retried.
+
+        Args:
+            attempt: The number of times the request has already been retried.
+            retry_after: The value of the Retry-After header of the response, if any; either a number of seconds or an
+                HTTP date.
+
+        Returns:
+            The number of seconds to wait before retrying.
+        """
+        retry_after_delay = self.parse_retry_after(retry_after)
+        if retry_after_delay is not None:
+            return min(retry_after_delay, self.max_delay)
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def parse_retry_after(retry_after):
+        """
+        Args:
+            retry_after: The value of a Retry-After header, or None.
+
+        Returns:
+            The number of seconds the header asks us to wait, or None if there is no valid header.
+        """
+        if not retry_after:
+            return None
+
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def pause(self, seconds):
+        """
+        Stops every worker sharing the throttle from making requests for a period.
+
+        Args:
+            seconds: The number of seconds to pause for.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from Opt import Opt
+
+
+class CrawlCheckpoint:
+    """
+    Records the progress of a long crawl in a JSON file, so that an interrupted crawl can be resumed where it stopped
+    rather than started over. Each unit of work, such as a single user, is identified by a key. Once finished, its
+    result is recorded as complete. Until then, any partial progress can be recorded for it, such as the statistics
+    gathered so far and the cursor of the next page to fetch.
+
+    Progress is held in memory and written to disk periodically, and whenever the checkpoint is closed. Safe to share
+    between threads.
+    """
+
+    def __init__(self, path, tool, source, resume=False, flush_interval=10):
+        """
+        Initialization.
+
+        Args:
+            path: The location of the checkpoint file.
+            tool: The name of the tool making the crawl.
+            source: What is being crawled, such as the file of usernames. A checkpoint is only resumed by a crawl of the
+                same tool over the same source.
+            resume: Whether to resume from the checkpoint already at path, if any. Otherwise, the crawl starts afresh,
+                and any existing checkpoint is replaced.
+            flush_interval: The minimum number of seconds between writes of the checkpoint to disk.
+
+        Raises:
+            Exception: If resuming from a checkpoint made by a different crawl.
+        """
+        self.path = path
+        self.tool = tool
+        self.source = source
+        self.flush_interval = flush_interval
+        self.completed = {}
+        self.partial = {}
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+        if resume:
+            try:
+                with open(path) as f:
+                    checkpoint = json.load(f)
+            except FileNotFoundError:
+                return
+
+            if checkpoint['tool'] != tool or checkpoint['source'] != source:
+                raise Exception("The checkpoint at {} is for {} over {}, not {} over {}".format(
+                    path, checkpoint['tool'], checkpoint['source'], tool, source
+                ))
+
+            self.completed = checkpoint['completed']
+            self.partial = checkpoint['partial']
+
+    @classmethod
+    def from_options(cls, options, tool, source):
+        """
+        Creates the checkpoint a tool was asked to keep, with `-checkpoint <path>` to start a crawl afresh, or
+        `-resume <path>` to resume one.
+
+        Args:
+            options: The options the tool was run with.
+            tool: The name of the tool.
+            source: What is being crawled, as per `__init__`.
+
+        Returns:
+            The CrawlCheckpoint, or None if the tool was not asked to keep one.
+        """
+        if Opt.Resume in options:
+            return cls(options[Opt.Resume], tool, source, resume=True)
+
+        if Opt.Checkpoint in options:
+            return cls(options[Opt.Checkpoint], tool, source)
+
+        return None
+
+    def result(self, key):
+        """
+        Args:
+            key: The key of the unit of work.
+
+        Returns:
+            The result recorded for the unit of work, or None if it has not been completed.
+        """
+        with self.lock:
+            return self.completed.get(key)
+
+    def progress(self, key):
+        """
+        Args:
+            key: The key of the unit of work.
+
+        Returns:
+            The partial progress recorded for the unit of work, or None if there is none.
+        """
+        with self.lock:
+            return self.partial.get(key)
+
+    def record_progress(self, key, state):
+        """
+        Records partial progress of a unit of work, replacing any recorded before.
+
+        Args:
+            key: The key of the unit of work.
+            state: The progress, which must be serializable to JSON.
+        """
+        with self.lock:
+            self.partial[key] = state
+            self.flush_if_due()
+
+    def record_result(self, key, result):
+        """
+        Records a unit of work as complete, discarding its partial progress.
+
+        Args:
+            key: The key of the unit of work.
+            result: The result of the unit of work, which must be serializable to JSON.
+        """
+        with self.lock:
+            self.completed[key] = result
+            self.partial.pop(key, None)
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        Writes the checkpoint to disk, if it has not been written within the flush interval. Must be called with the
+        lock held.
+        """
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.write()
+
+    def write(self):
+        """
+        Writes the checkpoint to disk. The checkpoint is written to a temporary file of its own first, so an interrupted
+        write never leaves a corrupt checkpoint behind, and concurrent writes never clash. Must be called with the lock
+        held.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=directory or '.', prefix=os.path.basename(self.path) + '.', suffix='.tmp'
+        )
+
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump({
+                    'tool': self.tool,
+                    'source': self.source,
+                    'updated_at_timestamp': int(time.time()),
+                    'completed': self.completed,
+                    'partial': self.partial
+                }, f)
+
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self.flushed_at = time.monotonic()
+
+    def close(self):
+        """
+        Writes the checkpoint to disk.
+        """
+        with self.lock:
+            self.write()
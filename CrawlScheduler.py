@@ -0,0 +1,102 @@
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class CrawlScheduler:
+    """
+    Interleaves many crawls over a bounded pool of worker threads. Each crawl is a generator which makes one request
+    each time it is advanced, such as fetching the next page of a user's timeline, and returns its result when it
+    finishes.
+
+    Crawls take turns: once a crawl has made a request, it goes to the back of the queue behind every other active
+    crawl. A user with thousands of pages therefore never holds up users with a few, and at most `max_workers` requests
+    are in flight at once, however many crawls are active.
+    """
+
+    def __init__(self, max_workers, max_active=None):
+        """
+        Initialization.
+
+        Args:
+            max_workers: The maximum number of crawls advanced at once.
+            max_active: The maximum number of crawls started but not yet finished. Further crawls are only started as
+                others finish, so that memory stays bounded however many crawls there are. Defaults to four times
+                max_workers.
+        """
+        if max_workers < 1:
+            raise Exception("max_workers must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_active = max_active if max_active is not None else max_workers * 4
+
+    @staticmethod
+    def step(crawl):
+        """
+        Advances a crawl by a single request.
+
+        Args:
+            crawl: The generator of the crawl.
+
+        Returns:
+            A tuple of whether the crawl has finished, and its result if so.
+        """
+        try:
+            next(crawl)
+            return False, None
+        except StopIteration as stop:
+            return True, stop.value
+
+    def run(self, crawls):
+        """
+        Runs crawls to completion.
+
+        Args:
+            crawls: An iterable of (key, generator) tuples, consumed lazily as crawls finish.
+
+        Yields:
+            A (key, result, error) tuple for each crawl as it finishes, where error is the exception the crawl raised,
+            if any, in which case result is None.
+        """
+        crawls = iter(crawls)
+        ready = deque()
+        in_flight = {}
+        active = 0
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                # Start new crawls while there is room for them
+                while not exhausted and active < self.max_active:
+                    try:
+                        ready.append(next(crawls))
+                        active += 1
+                    except StopIteration:
+                        exhausted = True
+
+                # Each step runs in a copy of the caller's context, so that context such as the daemon's capture of a
+                # job's output follows the crawl onto the worker threads
+                while ready and len(in_flight) < self.max_workers:
+                    key, crawl = ready.popleft()
+                    in_flight[executor.submit(contextvars.copy_context().run, self.step, crawl)] = (key, crawl)
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    key, crawl = in_flight.pop(future)
+
+                    try:
+                        finished, result = future.result()
+                    except Exception as e:
+                        active -= 1
+                        yield key, None, e
+                        continue
+
+                    if finished:
+                        active -= 1
+                        yield key, result, None
+                    else:
+                        ready.append((key, crawl))
@@ -0,0 +1,281 @@
+import os
+import sqlite3
+import threading
+from itertools import permutations
+from HashtagTokenizer import HashtagTokenizer
+
+
+class HashtagIndex:
+    """
+    A persistent, SQLite-backed inverted index from hashtags to the posts, and users, which used them. Kept up to date
+    incrementally as media is fetched, so that questions such as which users used #x together with #y can be answered
+    later without crawling again.
+
+    Alongside the postings of each hashtag, the index keeps the number of posts each pair of hashtags appeared together
+    in, and the number of posts each user used each hashtag in, so that the most co-occurring hashtags and a user's most
+    used hashtags are a single indexed lookup. Hashtags are counted once per post, however many times a caption repeats
+    them. Safe to share between threads.
+    """
+
+    default_path = os.path.join(os.path.expanduser('~'), '.igcli', 'hashtags.sqlite3')
+
+    def __init__(self, path=default_path):
+        """
+        Initialization. Opens, and if necessary creates, the index database at `path`.
+
+        Args:
+            path: The location of the SQLite database on disk.
+        """
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            'CREATE TABLE IF NOT EXISTS posts ('
+            'id TEXT PRIMARY KEY, '
+            'owner_id TEXT NOT NULL, '
+            'shortcode TEXT, '
+            'created_at_timestamp INTEGER);'
+            'CREATE INDEX IF NOT EXISTS posts_owner_id ON posts (owner_id);'
+            'CREATE TABLE IF NOT EXISTS users ('
+            'id TEXT PRIMARY KEY, '
+            'username TEXT NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS users_username ON users (username);'
+            'CREATE TABLE IF NOT EXISTS postings ('
+            'hashtag TEXT NOT NULL, '
+            'post_id TEXT NOT NULL, '
+            'PRIMARY KEY (hashtag, post_id)) WITHOUT ROWID;'
+            'CREATE INDEX IF NOT EXISTS postings_post_id ON postings (post_id);'
+            'CREATE TABLE IF NOT EXISTS cooccurrences ('
+            'hashtag TEXT NOT NULL, '
+            'other TEXT NOT NULL, '
+            'count INTEGER NOT NULL, '
+            'PRIMARY KEY (hashtag, other)) WITHOUT ROWID;'
+            'CREATE TABLE IF NOT EXISTS user_hashtags ('
+            'owner_id TEXT NOT NULL, '
+            'hashtag TEXT NOT NULL, '
+            'count INTEGER NOT NULL, '
+            'PRIMARY KEY (owner_id, hashtag)) WITHOUT ROWID;'
+        )
+        self.connection.commit()
+
+    def add_user(self, user_id, username):
+        """
+        Records the username of a user, so that their posts can be reported, and their profile looked up, by username.
+
+        Args:
+            user_id: The ID of the user.
+            username: The username of the user.
+        """
+        with self.lock:
+            self.connection.execute(
+                'INSERT INTO users (id, username) VALUES (?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET username = excluded.username',
+                (str(user_id), username.lower())
+            )
+            self.connection.commit()
+
+    def add_media(self, records):
+        """
+        Indexes the hashtags of posts. Posts already indexed are only updated if their hashtags have since changed.
+
+        Args:
+            records: An iterable of MediaRecords.
+        """
+        with self.lock:
+            for record in records:
+                hashtags = set(HashtagTokenizer.hashtags(record.caption_text))
+                indexed_hashtags = set(hashtag for hashtag, in self.connection.execute(
+                    'SELECT hashtag FROM postings WHERE post_id = ?', (record.id,)
+                ))
+
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO posts (id, owner_id, shortcode, created_at_timestamp) VALUES (?, ?, ?, ?)',
+                    (record.id, record.owner_id, record.shortcode, record.created_at_timestamp)
+                )
+
+                if hashtags != indexed_hashtags:
+                    self.count_hashtags(record.id, record.owner_id, indexed_hashtags, -1)
+                    self.count_hashtags(record.id, record.owner_id, hashtags, 1)
+
+            self.connection.commit()
+
+    def count_hashtags(self, post_id, owner_id, hashtags, delta):
+        """
+        Adds the hashtags of a post to the index, or removes them. Must be called with the lock held.
+
+        Args:
+            post_id: The ID of the post.
+            owner_id: The ID of the user who posted it.
+            hashtags: The set of hashtags the post used.
+            delta: 1 to add the hashtags, or -1 to remove them.
+        """
+        if not hashtags:
+            return
+
+        if delta > 0:
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO postings (hashtag, post_id) VALUES (?, ?)',
+                [(hashtag, post_id) for hashtag in hashtags]
+            )
+        else:
+            self.connection.executemany(
+                'DELETE FROM postings WHERE hashtag = ? AND post_id = ?',
+                [(hashtag, post_id) for hashtag in hashtags]
+            )
+
+        self.connection.executemany(
+            'INSERT INTO user_hashtags (owner_id, hashtag, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (owner_id, hashtag) DO UPDATE SET count = count + excluded.count',
+            [(owner_id, hashtag, delta) for hashtag in hashtags]
+        )
+        self.connection.executemany(
+            'INSERT INTO cooccurrences (hashtag, other, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (hashtag, other) DO UPDATE SET count = count + excluded.count',
+            [(hashtag, other, delta) for hashtag, other in permutations(hashtags, 2)]
+        )
+
+        if delta < 0:
+            self.connection.execute('DELETE FROM user_hashtags WHERE count <= 0')
+            self.connection.execute('DELETE FROM cooccurrences WHERE count <= 0')
+
+    def post_count(self, hashtags):
+        """
+        Args:
+            hashtags: A list of hashtags, without their leading `#`.
+
+        Returns:
+            The number of posts indexed which used every one of the hashtags.
+        """
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM ({})'.format(self.matching_posts_query(hashtags)), hashtags
+            ).fetchone()[0]
+
+    @staticmethod
+    def matching_posts_query(hashtags):
+        """
+        Args:
+            hashtags: A list of hashtags.
+
+        Returns:
+            An SQL query selecting the `post_id` of every post which used every one of the hashtags, taking the hashtags
+            as its parameters.
+        """
+        return 'SELECT post_id FROM postings WHERE hashtag IN ({}) GROUP BY post_id HAVING COUNT(*) = {}'.format(
+            ', '.join('?' * len(hashtags)), len(hashtags)
+        )
+
+    def posts(self, hashtags, limit):
+        """
+        Looks up the posts which used every one of some hashtags.
+
+        Args:
+            hashtags: A list of hashtags, without their leading `#`.
+            limit: The maximum number of posts to return.
+
+        Returns:
+            A list of dictionaries of each post's `id`, `shortcode`, `created_at_timestamp`, `owner_id`, and the
+            `username` of its owner if known, newest first.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT posts.id, posts.shortcode, posts.created_at_timestamp, posts.owner_id, users.username '
+                'FROM ({}) AS matches JOIN posts ON posts.id = matches.post_id '
+                'LEFT JOIN users ON users.id = posts.owner_id '
+                'ORDER BY posts.created_at_timestamp DESC LIMIT ?'.format(self.matching_posts_query(hashtags)),
+                hashtags + [limit]
+            ).fetchall()
+
+        return [
+            dict(zip(('id', 'shortcode', 'created_at_timestamp', 'owner_id', 'username'), row))
+            for row in rows
+        ]
+
+    def users(self, hashtags, limit):
+        """
+        Looks up the users who used every one of some hashtags together in a post.
+
+        Args:
+            hashtags: A list of hashtags, without their leading `#`.
+            limit: The maximum number of users to return.
+
+        Returns:
+            A list of dictionaries of each user's `id`, `username` if known, and the number of such posts as
+            `post_count`, most posts first.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT posts.owner_id, users.username, COUNT(*) AS post_count '
+                'FROM ({}) AS matches JOIN posts ON posts.id = matches.post_id '
+                'LEFT JOIN users ON users.id = posts.owner_id '
+                'GROUP BY posts.owner_id ORDER BY post_count DESC, posts.owner_id LIMIT ?'.format(
+                    self.matching_posts_query(hashtags)
+                ),
+                hashtags + [limit]
+            ).fetchall()
+
+        return [dict(zip(('id', 'username', 'post_count'), row)) for row in rows]
+
+    def cooccurring(self, hashtags, limit):
+        """
+        Looks up the hashtags most often used together with some hashtags.
+
+        Args:
+            hashtags: A list of hashtags, without their leading `#`.
+            limit: The maximum number of hashtags to return.
+
+        Returns:
+            A list of (hashtag, count) tuples, where count is the number of posts the hashtag was used in together with
+            every one of the hashtags, most used first, with ties broken alphabetically.
+        """
+        with self.lock:
+            # Pairs are counted as posts are indexed, so a single hashtag's co-occurrences need no counting at all
+            if len(hashtags) == 1:
+                return self.connection.execute(
+                    'SELECT other, count FROM cooccurrences WHERE hashtag = ? ORDER BY count DESC, other LIMIT ?',
+                    (hashtags[0], limit)
+                ).fetchall()
+
+            return self.connection.execute(
+                'SELECT hashtag, COUNT(*) AS count FROM postings WHERE post_id IN ({}) AND hashtag NOT IN ({}) '
+                'GROUP BY hashtag ORDER BY count DESC, hashtag LIMIT ?'.format(
+                    self.matching_posts_query(hashtags), ', '.join('?' * len(hashtags))
+                ),
+                hashtags + hashtags + [limit]
+            ).fetchall()
+
+    def profile(self, username, limit):
+        """
+        Looks up the hashtags a user has used most.
+
+        Args:
+            username: The username of the user.
+            limit: The maximum number of hashtags to return.
+
+        Returns:
+            A dictionary of the user's `id`, the number of their posts indexed as `post_count`, and their most used
+            `hashtags`, as a list of (hashtag, count) tuples, where count is the number of their posts which used the
+            hashtag. None if the user is not known to the index.
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT id FROM users WHERE username = ?', (username.lower(),)).fetchone()
+
+            if row is None:
+                return None
+
+            user_id = row[0]
+
+            return {
+                'id': user_id,
+                'post_count': self.connection.execute(
+                    'SELECT COUNT(*) FROM posts WHERE owner_id = ?', (user_id,)
+                ).fetchone()[0],
+                'hashtags': self.connection.execute(
+                    'SELECT hashtag, count FROM user_hashtags WHERE owner_id = ? ORDER BY count DESC, hashtag LIMIT ?',
+                    (user_id, limit)
+                ).fetchall()
+            }
@@ -0,0 +1,172 @@
+import heapq
+import re
+from collections import Counter
+from Sketches import HyperLogLog, SpaceSaving
+
+
+class HashtagTokenizer:
+    """
+    Extracts hashtags from captions. A hashtag is a `#` followed by letters, digits, and underscores in any script, and
+    must contain at least one non-digit, as Instagram does not link purely numeric hashtags. Hashtags do not need to be
+    surrounded by whitespace, so `#one#two` and `caption#tag` are both recognised. HTML character references such as
+    `&#39;` are not mistaken for hashtags.
+    """
+
+    pattern = re.compile(r'(?<!&)#(\w*[^\W\d]\w*)')
+
+    @classmethod
+    def hashtags(cls, text):
+        """
+        Extracts the hashtags from some text.
+
+        Args:
+            text: The text to extract hashtags from, such as a caption.
+
+        Returns:
+            A list of the hashtags in the text, without their leading `#` and case folded, in the order they appear.
+        """
+        if not text:
+            return []
+
+        return [hashtag.casefold() for hashtag in cls.pattern.findall(text)]
+
+    @classmethod
+    def count(cls, text):
+        """
+        Counts the hashtags in some text.
+
+        Args:
+            text: The text to count hashtags in, such as a caption.
+
+        Returns:
+            The number of hashtags in the text, including any repeats.
+        """
+        if not text:
+            return 0
+
+        return sum(1 for _ in cls.pattern.finditer(text))
+
+
+class HashtagCounter:
+    """
+    Keeps running counts of hashtags, from which the most used hashtags can be retrieved.
+    """
+
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self.counts = Counter()
+
+    def update(self, hashtags):
+        """
+        Counts a collection of hashtags.
+
+        Args:
+            hashtags: An iterable of hashtags.
+        """
+        self.counts.update(hashtags)
+
+    def total(self):
+        """
+        Returns:
+            The number of hashtags counted, including repeats.
+        """
+        return sum(self.counts.values())
+
+    def distinct(self):
+        """
+        Returns:
+            The number of distinct hashtags counted.
+        """
+        return len(self.counts)
+
+    def top(self, k):
+        """
+        Retrieves the most used hashtags with a heap, without sorting every hashtag counted.
+
+        Args:
+            k: The number of hashtags to retrieve.
+
+        Returns:
+            A list of up to k (hashtag, count) tuples, most used first, with ties broken alphabetically.
+        """
+        return heapq.nsmallest(k, self.counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def merge(self, other):
+        """
+        Merges in the counts of another HashtagCounter, such as one filled by another worker.
+
+        Args:
+            other: The other HashtagCounter.
+        """
+        self.counts.update(other.counts)
+
+
+class ApproximateHashtagCounter:
+    """
+    Keeps running counts of hashtags in fixed memory, however many distinct hashtags there are. The total is exact, the
+    most used hashtags are found with a Space-Saving summary, whose counts are overestimates by at most `error` of the
+    total, and the number of distinct hashtags is estimated with a HyperLogLog, to a standard error of `error`.
+    Counters filled by parallel workers can be merged.
+    """
+
+    def __init__(self, error=0.01):
+        """
+        Initialization.
+
+        Args:
+            error: The error of the estimates, as a fraction of the total, or of the number of distinct hashtags.
+        """
+        self.hashtag_total = 0
+        self.frequent_hashtags = SpaceSaving.for_error(error)
+        self.distinct_hashtags = HyperLogLog.for_error(error)
+
+    def update(self, hashtags):
+        """
+        Counts a collection of hashtags.
+
+        Args:
+            hashtags: An iterable of hashtags.
+        """
+        for hashtag in hashtags:
+            self.hashtag_total += 1
+            self.frequent_hashtags.update(hashtag)
+            self.distinct_hashtags.add(hashtag)
+
+    def total(self):
+        """
+        Returns:
+            The number of hashtags counted, including repeats.
+        """
+        return self.hashtag_total
+
+    def distinct(self):
+        """
+        Returns:
+            An estimate of the number of distinct hashtags counted.
+        """
+        return self.distinct_hashtags.count()
+
+    def top(self, k):
+        """
+        Args:
+            k: The number of hashtags to retrieve.
+
+        Returns:
+            A list of up to k (hashtag, count) tuples, most used first, with ties broken alphabetically. Counts are
+            estimates, never below the true count.
+        """
+        return self.frequent_hashtags.top(k)
+
+    def merge(self, other):
+        """
+        Merges in the counts of another ApproximateHashtagCounter of the same error, such as one filled by another
+        worker.
+
+        Args:
+            other: The other ApproximateHashtagCounter.
+        """
+        self.hashtag_total += other.hashtag_total
+        self.frequent_hashtags.merge(other.frequent_hashtags)
+        self.distinct_hashtags.merge(other.distinct_hashtags)
@@ -0,0 +1,184 @@
+import contextvars
+import io
+import json
+import os
+import socketserver
+import sys
+from contextlib import contextmanager
+import igcli
+from Opt import Opt
+
+
+class JobStdout:
+    """
+    A stand-in for sys.stdout which lets each job capture what it prints. Tools print some of their results, such as
+    the rows of the user scoreboard, so the daemon captures each job's output to send back to the client, while other
+    jobs run concurrently on other threads.
+
+    The capture buffer is held in a context variable rather than per thread, so that output printed by the worker
+    threads of a job, which tools run in a copy of the job's context, is captured along with the job's own.
+    """
+
+    def __init__(self, stream):
+        """
+        Initialization.
+
+        Args:
+            stream: The stream written to by threads which are not capturing their output.
+        """
+        self.stream = stream
+        self.buffer = contextvars.ContextVar('buffer', default=None)
+
+    def write(self, text):
+        """
+        Writes to the current job's capture buffer, or to the underlying stream if no job is capturing.
+        """
+        return (self.buffer.get() or self.stream).write(text)
+
+    def flush(self):
+        """
+        Flushes the underlying stream.
+        """
+        self.stream.flush()
+
+    @contextmanager
+    def capture(self):
+        """
+        Captures everything the current job prints within the enclosed block.
+
+        Yields:
+            The io.StringIO the output is captured in.
+        """
+        buffer = io.StringIO()
+        token = self.buffer.set(buffer)
+
+        try:
+            yield buffer
+        finally:
+            self.buffer.reset(token)
+
+
+class IgcliDaemon:
+    """
+    A long-running igcli server. Holds a single InstagramDataService, bootstrapped once and kept warm with its
+    connections, cache, and throttle, and runs tools against it on request.
+
+    Jobs are sent over a local Unix socket as a single line of JSON, `{"tool": "like-analysis", "options": {"-u": "..."}}`,
+    and answered with a single line of JSON, `{"result": ..., "output": "..."}`, or `{"error": "..."}` if the job failed.
+    Each connection is handled on its own thread, so jobs run concurrently and share the service's throttle.
+    """
+
+    default_path = os.path.join(os.path.expanduser('~'), '.igcli', 'igcli.sock')
+
+    # Seconds users and pages of timelines are remembered for between jobs. The daemon outlives any single run, so
+    # results are only shared by jobs close together in time, rather than cleared between jobs, which would stop jobs
+    # running at once from sharing them.
+    remembered_ttl = 60
+
+    def __init__(self, path, instagram_data_service):
+        """
+        Initialization.
+
+        Args:
+            path: The location of the Unix socket to listen on.
+            instagram_data_service: The InstagramDataService tools are run against.
+        """
+        self.path = path
+        self.instagram_data_service = instagram_data_service
+        self.tools = {}
+        self.stdout = JobStdout(sys.stdout)
+
+    def handle(self, job):
+        """
+        Runs a single job.
+
+        Args:
+            job: A dictionary of the `tool` to run, and its `options`, as a dictionary of option flags to values.
+
+        Returns:
+            A dictionary of the `result` returned by the tool, and any `output` it printed, or of an `error`.
+        """
+        try:
+            if job.get('tool') not in igcli.get_toolkit():
+                raise Exception("Please provide one of the following igcli tools: {}".format(igcli.get_toolkit()))
+
+            opts = igcli.parse_option_dict(job.get('options', {}))
+            opts[Opt.Tool] = job['tool']
+
+            if opts.get(Opt.File) == '-':
+                raise Exception("stdin cannot be read by the daemon, please provide a file")
+
+            if job['tool'] not in self.tools:
+                self.tools[job['tool']] = igcli.load_tool(job['tool'])
+
+            Tool = self.tools[job['tool']]
+            tool = Tool(self.instagram_data_service if Tool.requires_network() else None)
+            options = igcli.gather_opts(opts, tool.requested_options())
+
+            with self.stdout.capture() as output:
+                result = tool.run(options)
+
+            if self.instagram_data_service.exporter is not None:
+                self.instagram_data_service.exporter.flush()
+
+            return {
+                'result': result,
+                'output': output.getvalue()
+            }
+        except Exception as e:
+            return {
+                'error': str(e)
+            }
+
+    def serve(self):
+        """
+        Listens for jobs on the socket until interrupted.
+        """
+        daemon = self
+
+        class JobHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if not line:
+                    return
+
+                try:
+                    response = daemon.handle(json.loads(line))
+                except ValueError:
+                    response = {'error': 'Job was not valid JSON'}
+
+                self.wfile.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # A socket left behind by a daemon which did not shut down cleanly would stop us from listening.
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        sys.stdout = self.stdout
+
+        # The socket is created only accessible to the current user, rather than briefly open to others until chmod
+        umask = os.umask(0o077)
+        try:
+            server = socketserver.ThreadingUnixStreamServer(self.path, JobHandler)
+        finally:
+            os.umask(umask)
+
+        server.daemon_threads = True
+        os.chmod(self.path, 0o600)
+
+        print("igcli daemon listening on {}".format(self.path), file=sys.stderr)
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            sys.stdout = self.stdout.stream
+            os.remove(self.path)
+
+            if self.instagram_data_service.exporter is not None:
+                self.instagram_data_service.exporter.close()
@@ -1,8 +1,18 @@
+import contextlib
 import urllib.parse
 import re
 import hashlib
 import json
+import threading
+import time
 import requests
+import requests.adapters
+from AdaptiveThrottle import AdaptiveThrottle
+from ResponseCache import ResponseCache
+from MediaRecord import MediaRecord
+from ResponseParser import ResponseParser
+from SingleFlight import SingleFlight
+from UserSearchIndex import UserSearchIndex
 
 
 def unauthenticated(fn):
@@ -23,6 +33,13 @@ def authenticated(fn):
     return wrapper
 
 
+class UserNotFoundException(Exception):
+    """
+    Raised when Instagram has no user by the username looked up. Unlike other failures, retrying will not help.
+    """
+    pass
+
+
 class InstagramDataService:
     """
     InstagramDataService.
@@ -32,13 +49,180 @@ class InstagramDataService:
                  'Version/11.0.1 Safari/604.3.5'
     rhx_gis = None
     csrf_token_cookie = None
-    session = requests.Session()
 
-    def __init__(self):
+    # The fields user_info can return, as a path within the result to a path within Instagram's response.
+    user_info_fields = {
+        ('id',): ('graphql', 'user', 'id'),
+        ('username',): ('graphql', 'user', 'username'),
+        ('full_name',): ('graphql', 'user', 'full_name'),
+        ('profile_picture',): ('graphql', 'user', 'profile_pic_url_hd'),
+        ('bio',): ('graphql', 'user', 'biography'),
+        ('website',): ('graphql', 'user', 'external_url'),
+        ('counts', 'media'): ('graphql', 'user', 'edge_owner_to_timeline_media', 'count'),
+        ('counts', 'follows'): ('graphql', 'user', 'edge_follow', 'count'),
+        ('counts', 'followed_by'): ('graphql', 'user', 'edge_followed_by', 'count')
+    }
+
+    # The parts of a page of a user's timeline that users_user_id_media_recent reads
+    timeline_media_fields = {
+        'edges': ('data', 'user', 'edge_owner_to_timeline_media', 'edges'),
+        'page_info': ('data', 'user', 'edge_owner_to_timeline_media', 'page_info')
+    }
+
+    def __init__(self, cache=None, session_store=None, throttle=None, pool_size=16, keep_alive=True,
+                 per_worker_sessions=False, profiler=None, exporter=None, search_index=None, hashtag_index=None,
+                 remembered_pages=0, remembered_ttl=None):
+        """
+        Initialization. No requests are made to Instagram until they are needed; the session is bootstrapped lazily,
+        by the first request which is not served from the cache.
+
+        Args:
+            cache: An optional ResponseCache to serve repeated requests from, instead of Instagram's servers.
+            session_store: An optional SessionStateStore to reuse a previously bootstrapped session from.
+            throttle: The AdaptiveThrottle which paces and retries requests. Defaults to an AdaptiveThrottle with its
+                default settings.
+            pool_size: The maximum number of connections to Instagram each session keeps open for reuse.
+            keep_alive: Whether connections are kept open between requests. If False, every request opens a new
+                connection.
+            per_worker_sessions: If True, each thread making requests is given its own session, and so its own
+                connection pool, carrying the cookies of the bootstrapped session. Otherwise, all threads share a
+                single session.
+            profiler: An optional Profiler to record every request, and the time spent parsing responses, with.
+            exporter: An optional MediaExporter to export every post and user fetched to.
+            search_index: An optional UserSearchIndex to answer searches from the results of previous searches.
+            hashtag_index: An optional HashtagIndex to index the hashtags of every post fetched in.
+            remembered_pages: The number of pages of timelines remembered in memory, so that tools run one after another
+                in the same process page through a timeline only once between them. None are remembered by default.
+            remembered_ttl: The number of seconds users and pages are remembered for. Defaults to the life of the
+                service, which suits a single run, but not a long-running daemon.
+        """
+        self.cache = cache
+        self.session_store = session_store
+        self.throttle = throttle if throttle is not None else AdaptiveThrottle()
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.per_worker_sessions = per_worker_sessions
+
+        self.session = self.create_session()
+        self.worker_sessions = threading.local()
+        self.cookie_generation = 0
+        self.profiler = profiler
+        self.exporter = exporter
+        self.search_index = search_index
+        self.hashtag_index = hashtag_index
+        self.bootstrapped = False
+        self.reused_session = False
+        self.bootstrap_lock = threading.Lock()
+
+        # Identical requests in flight at once share a single fetch, and users looked up once are remembered for the
+        # rest of the run, or for remembered_ttl seconds.
+        self.request_flight = SingleFlight()
+        self.user_info_flight = SingleFlight(remember=True, ttl=remembered_ttl)
+        self.page_flight = None
+        if remembered_pages:
+            self.page_flight = SingleFlight(remember=True, max_remembered=remembered_pages, ttl=remembered_ttl)
+
+    def create_session(self):
+        """
+        Creates a session with a connection pool sized as requested.
+
+        Returns:
+            The requests.Session.
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def profile_phase(self, name):
+        """
+        Records the duration of the enclosed block as a phase, if the service is being profiled.
+
+        Args:
+            name: The name of the phase.
+
+        Returns:
+            A context manager.
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+
+        return self.profiler.phase(name)
+
+    def worker_session(self):
+        """
+        Retrieves the session requests should be made with from the current thread. With per-worker sessions, each thread
+        lazily creates its own session, and takes a fresh copy of the bootstrapped cookies whenever they have changed.
+
+        Returns:
+            The requests.Session.
+        """
+        if not self.per_worker_sessions:
+            return self.session
+
+        worker = self.worker_sessions
+
+        if getattr(worker, 'session', None) is None:
+            worker.session = self.create_session()
+            worker.cookie_generation = None
+
+        if worker.cookie_generation != self.cookie_generation:
+            with self.bootstrap_lock:
+                worker.session.cookies.update(self.session.cookies.get_dict())
+                worker.cookie_generation = self.cookie_generation
+
+        return worker.session
+
+    def bootstrap(self):
         """
         Initialize our Instagram session by making a request to the homepage. From here, grab the rhx_gis special token
         and set it on the InstagramDataService class. This special token is needed to make future requests over Instagram's
         private web API.
+
+        If a session store was provided and holds an unexpired session, its tokens and cookies are reused instead, and
+        no request is made. Only the first call bootstraps the session, subsequent calls return immediately.
+        """
+        if self.bootstrapped:
+            return
+
+        with self.bootstrap_lock:
+            if self.bootstrapped:
+                return
+
+            state = self.session_store.load() if self.session_store is not None else None
+
+            if state is not None:
+                self.rhx_gis = state['rhx_gis']
+                self.csrf_token_cookie = state['csrf_token_cookie']
+                self.session.cookies.update(state['cookies'])
+                self.reused_session = True
+                self.cookie_generation += 1
+            else:
+                self.fetch_bootstrap()
+
+            self.bootstrapped = True
+
+    def refresh_bootstrap(self, stale_rhx_gis):
+        """
+        Bootstraps the session afresh from the Instagram homepage, after a request signed with a reused token was
+        rejected.
+
+        Args:
+            stale_rhx_gis: The rhx_gis token the rejected request was signed with. If another thread has already
+                refreshed the session since, it is not refreshed again.
+        """
+        with self.bootstrap_lock:
+            if self.rhx_gis == stale_rhx_gis:
+                self.fetch_bootstrap()
+
+    def fetch_bootstrap(self):
+        """
+        Requests the Instagram homepage and scrapes the rhx_gis token from it, saving the resulting session state to the
+        session store if one was provided. Must be called with the bootstrap lock held.
         """
         res = self.session.get('https://www.instagram.com', headers={
             'User-Agent': self.user_agent
@@ -47,6 +231,13 @@ class InstagramDataService:
         if regex_match:
             self.rhx_gis = regex_match.group('rhx_gis')
 
+        self.csrf_token_cookie = self.session.cookies.get('csrftoken')
+        self.reused_session = False
+        self.cookie_generation += 1
+
+        if self.session_store is not None and self.rhx_gis is not None:
+            self.session_store.save(self.rhx_gis, self.csrf_token_cookie, self.session.cookies.get_dict())
+
     def build_signature(self, query_variables):
         """
         Given the magic rhx_gis string first retrieved in an initial instagram request, and the query variables being
@@ -82,12 +273,19 @@ class InstagramDataService:
                 to Instagram's servers, this dict is translated into a URL-safe string. Most be provided if endpoint is set as
                 'graphql', will be ignored otherwise.
 
+            cache_mode: Overrides the mode of the response cache for this request, one of 'use', 'refresh', or 'bypass'.
+                Defaults to the mode the cache was created with.
+
         Returns:
-            The raw response from Instagram's servers.
+            The raw response from Instagram's servers, or a CachedResponse if the request was served from the cache. If
+            Instagram throttled or failed the request, it is retried with backoff as per the throttle, and the final
+            response is returned.
         """
         endpoint_url = None
         signature_var = None
+        cache_identity = None
         query_params = kwargs.pop('query_params', {})
+        cache_mode = kwargs.pop('cache_mode', None)
 
         if kwargs['endpoint'] is "username":
             if 'username' not in kwargs:
@@ -98,9 +296,11 @@ class InstagramDataService:
             query_params = {
                 '__a': '1'
             }
+            cache_identity = kwargs['username']
 
         elif kwargs['endpoint'] is "search":
             endpoint_url = 'https://www.instagram.com/web/search/topsearch/'
+            cache_identity = query_params
 
         elif kwargs['endpoint'] is "graphql":
             if 'query_hash' not in kwargs:
@@ -110,11 +310,116 @@ class InstagramDataService:
             query_params['query_hash'] = kwargs['query_hash']
 
             signature_var = query_params['variables'] = json.dumps(kwargs['query_variables'])
+            cache_identity = [kwargs['query_hash'], kwargs['query_variables']]
 
-        return self.session.get(endpoint_url + "?{}".format(urllib.parse.urlencode(query_params)), headers={
-            'User-Agent': self.user_agent,
-            'X-Instagram-GIS': self.build_signature(signature_var)
-        })
+        started_at = time.perf_counter()
+        profiled_at = self.profiler.now() if self.profiler is not None else None
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = ResponseCache.key(kwargs['endpoint'], cache_identity)
+            cached_response = self.cache.get(kwargs['endpoint'], cache_key, mode=cache_mode)
+
+            if cached_response is not None:
+                if self.profiler is not None:
+                    self.profiler.record_request(kwargs['endpoint'], profiled_at, time.perf_counter() - started_at,
+                                                 cached_response.status_code, len(cached_response.content),
+                                                 cache_hit=True)
+
+                return cached_response
+
+        return self.request_flight.do(
+            ResponseCache.key(kwargs['endpoint'], cache_identity),
+            lambda: self.send(kwargs['endpoint'], endpoint_url, query_params, signature_var, cache_key, cache_mode,
+                              started_at, profiled_at)
+        )
+
+    def send(self, endpoint, endpoint_url, query_params, signature_var, cache_key, cache_mode, started_at, profiled_at):
+        """
+        Sends a request to Instagram's servers, bootstrapping the session first if need be, and retrying it with backoff
+        as per the throttle. Called by `request` for requests which could not be served from the cache.
+
+        Args:
+            endpoint: The endpoint of the request, one of 'username', 'search', or 'graphql'.
+            endpoint_url: The URL of the endpoint, without its query string.
+            query_params: A dict of the query parameters of the request.
+            signature_var: The string the request's X-Instagram-GIS signature is built from.
+            cache_key: The key the response is cached under, if there is a cache.
+            cache_mode: The mode of the response cache for this request.
+            started_at: When the request was started, as per time.perf_counter().
+            profiled_at: When the request was started, as per the profiler's clock, if there is a profiler.
+
+        Returns:
+            The final response from Instagram's servers.
+        """
+        if not self.bootstrapped:
+            with self.profile_phase('bootstrap'):
+                self.bootstrap()
+
+        url = endpoint_url + "?{}".format(urllib.parse.urlencode(query_params))
+        attempt = 0
+        refreshed_session = False
+        throttle_wait = 0
+
+        while True:
+            # Wait for our turn, as paced by the throttle
+            waited_at = time.perf_counter()
+            self.throttle.acquire()
+
+            rhx_gis, reused_session = self.rhx_gis, self.reused_session
+            sent_at = time.perf_counter()
+            throttle_wait += sent_at - waited_at
+
+            try:
+                response = self.worker_session().get(url, headers={
+                    'User-Agent': self.user_agent,
+                    'X-Instagram-GIS': self.build_signature(signature_var)
+                })
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.throttle.record(None, time.perf_counter() - sent_at)
+
+                if attempt >= self.throttle.max_retries:
+                    raise
+
+                delay = self.throttle.backoff(attempt)
+                time.sleep(delay)
+                throttle_wait += delay
+                attempt += 1
+                continue
+
+            self.throttle.record(response.status_code, time.perf_counter() - sent_at)
+
+            # Instagram rejects requests signed with an expired rhx_gis token. If the token was reused from a previous
+            # session, bootstrap a new session and try once more.
+            if response.status_code == 403 and signature_var is not None and reused_session and not refreshed_session:
+                self.refresh_bootstrap(rhx_gis)
+                refreshed_session = True
+                continue
+
+            if self.throttle.is_retryable(response.status_code) and attempt < self.throttle.max_retries:
+                delay = self.throttle.backoff(attempt, response.headers.get('Retry-After'))
+
+                # Being throttled applies to every worker, whereas a server error only delays this request.
+                if response.status_code == 429:
+                    self.throttle.pause(delay)
+                else:
+                    time.sleep(delay)
+                    throttle_wait += delay
+
+                attempt += 1
+                continue
+
+            break
+
+        if self.profiler is not None:
+            self.profiler.record_request(endpoint, profiled_at, time.perf_counter() - started_at,
+                                         response.status_code, len(response.content),
+                                         retries=attempt + int(refreshed_session), throttle_wait=throttle_wait)
+
+        if self.cache is not None:
+            self.cache.set(endpoint, cache_key, response, mode=cache_mode)
+
+        return response
 
     @authenticated
     def users_self(self):
@@ -130,42 +435,103 @@ class InstagramDataService:
         pass
 
     @unauthenticated
-    def user_info(self, username):
+    def user_info(self, username, fields=None):
         """
         For the user with the provided username, returns their user details, including media counts, website, & bio.
 
         Args:
             username: The username of the user to retrieve details for.
+            fields: An optional collection of the fields to return, each a tuple path within `data` such as `('id',)`
+                or `('counts', 'media')`, as listed in `user_info_fields`. Only these fields are returned.
+                Defaults to all fields.
 
         Returns:
             JSON formatted similarly to https://www.instagram.com/developer/endpoints/users/#get_users
+
+        Raises:
+            UserNotFoundException: If Instagram has no user by the username.
+
+        Notes:
+            Usernames are normalized before they are looked up, so `@Someone` and `someone` are the same user. Each
+            user is only fetched once, whatever fields are asked for; repeated lookups, including those made
+            concurrently, share the first lookup's result. Every lookup extracts all of `user_info_fields` from the
+            response, which costs next to nothing over extracting a few of them, so that a later lookup asking for
+            other fields is answered without fetching the user again.
         """
         if username is None:
             raise Exception("Please provide a username")
 
+        username = self.normalize_username(username)
+        fields = fields if fields is not None else self.user_info_fields.keys()
+
+        projection = self.user_info_flight.do(username, lambda: self.fetch_user_info(username))
+
+        return {
+            'data': self.nest_fields(dict((field, projection[field]) for field in fields))
+        }
+
+    def fetch_user_info(self, username):
+        """
+        Fetches the details of a user from Instagram, for user_info.
+
+        Args:
+            username: The normalized username of the user to retrieve details for.
+
+        Returns:
+            A dictionary of each field listed in `user_info_fields` to its value.
+        """
         r = self.request(endpoint='username', username=username)
 
+        if r.status_code == 404:
+            raise UserNotFoundException("Instagram has no user {}".format(username))
+
         # Ensure status code is 200
         if r.status_code is not 200:
             raise Exception("Instagram responded with {} status code".format(str(r.status_code)))
 
-        json_response = r.json()
+        with self.profile_phase('parse'):
+            projection = ResponseParser.project(r.content, self.user_info_fields)
 
-        return {
-            'data': {
-                'id': json_response['graphql']['user']['id'],
-                'username': json_response['graphql']['user']['username'],
-                'full_name': json_response['graphql']['user']['full_name'],
-                'profile_picture': json_response['graphql']['user']['profile_pic_url_hd'],
-                'bio': json_response['graphql']['user']['biography'],
-                'website': json_response['graphql']['user']['external_url'],
-                'counts': {
-                    'media': json_response['graphql']['user']['edge_owner_to_timeline_media']['count'],
-                    'follows': json_response['graphql']['user']['edge_follow']['count'],
-                    'followed_by': json_response['graphql']['user']['edge_followed_by']['count']
-                }
-            }
-        }
+        data = self.nest_fields(projection)
+
+        if self.exporter is not None:
+            self.exporter.write_user(username, data)
+
+        if self.hashtag_index is not None and 'id' in data and 'username' in data:
+            self.hashtag_index.add_user(data['id'], data['username'])
+
+        return projection
+
+    @staticmethod
+    def nest_fields(projection):
+        """
+        Args:
+            projection: A dictionary of fields, as listed in `user_info_fields`, to their values.
+
+        Returns:
+            The fields nested as they are in user_info's `data`, such as `{'counts': {'media': 1}}`.
+        """
+        data = {}
+        for field, value in projection.items():
+            parent = data
+            for key in field[:-1]:
+                parent = parent.setdefault(key, {})
+            parent[field[-1]] = value
+
+        return data
+
+    @staticmethod
+    def normalize_username(username):
+        """
+        Normalizes a username as Instagram would, ignoring surrounding whitespace, a leading @, and case.
+
+        Args:
+            username: The username to normalize.
+
+        Returns:
+            The normalized username.
+        """
+        return username.strip().lstrip('@').lower()
 
     @authenticated
     def users_self_media_recent(self, **kwargs):
@@ -216,17 +582,20 @@ class InstagramDataService:
             user_id: The ID of the user to retrieve media results for.
 
         Keyword Args:
-            after: Includes `count` results after the ID of the image provided in after.
-            Defaults to none if not included.
+            after: Includes `count` results after the cursor provided in after, as returned in `pagination.next_max_id`
+            of a previous response. Defaults to none if not included.
 
             count: The number of media entities to retrieve, defaults to 12.
 
+            compact: If True, each media entity is returned as a MediaRecord rather than a dictionary. Defaults to False.
+
         Returns:
             JSON formatted similarly to https://www.instagram.com/developer/endpoints/users/#get_users_media_recent
 
         Notes:
             Divergences from the Instagram API: `max_id` has been subsumed by `after`,
-            and `min_id` is no longer available.
+            and `min_id` is no longer available. `pagination.next_max_id` is None on the last page of media, and
+            `pagination.next_url` is not provided.
         """
         if user_id is None:
             raise Exception("Please provide a user id")
@@ -257,54 +626,163 @@ class InstagramDataService:
         if r.status_code is not 200:
             raise Exception("Instagram responded with {} status code".format(str(r.status_code)))
 
-        images = r.json()['data']['user']['edge_owner_to_timeline_media']['edges']
-
-        # Transform response data from instagram to make it sane.
-        transformed_images = []
-
-        for image in images:
-            # Pull across useful properties
-            transformed_image = {
-                "id": image['node']['id'],
-                "created_at_timestamp": image['node']['taken_at_timestamp'],
-                "caption": None, # Set later if applicable
-                "comments": {
-                    "count": image['node']['edge_media_to_comment']['count'],
-                    "is_disabled": image['node']['comments_disabled']
-                },
-                "shortcode": image['node']['shortcode'],
-                "dimensions": {
-                    "width": image['node']['dimensions']['width'],
-                    "height": image['node']['dimensions']['height'],
-                },
-                "display_url": image['node']['display_url'],
-                "likes": {
-                    "count": image['node']['edge_media_preview_like']['count']
-                },
-                "owner": {
-                    "id": image['node']['owner']['id']
-                },
-                "thumbnail_src": image['node']['thumbnail_src'],
-                "thumbnail_resources": image['node']['thumbnail_resources'],
-                "is_video": image['node']['is_video']
-            }
+        with self.profile_phase('parse'):
+            timeline_media = ResponseParser.project(r.content, self.timeline_media_fields)
+            page_info = timeline_media['page_info']
+
+        compact = kwargs.get('compact', False)
+        transform = MediaRecord.from_node if compact else self.transform_media
 
-            # Only include video_view_count if the entity is a video
-            if transformed_image["is_video"]:
-                transformed_image['video_view_count'] = image['node']['video_view_count']
+        with self.profile_phase('transform'):
+            images = [transform(image['node']) for image in timeline_media['edges']]
 
-            # Set the text of the caption if one exists
-            if len(image['node']['edge_media_to_caption']['edges']) != 0:
-                transformed_image["caption"] = {
-                    "text": image['node']['edge_media_to_caption']['edges'][0]["node"]["text"]
-                }
+        if self.exporter is not None or self.hashtag_index is not None:
+            records = images if compact else [MediaRecord.from_node(image['node']) for image in timeline_media['edges']]
 
-            transformed_images.append(transformed_image)
+            if self.exporter is not None:
+                self.exporter.write_media(records)
+
+            if self.hashtag_index is not None:
+                self.hashtag_index.add_media(records)
 
         return {
-            'data': transformed_images
+            'data': images,
+            'pagination': {
+                'next_max_id': page_info['end_cursor'] if page_info['has_next_page'] else None
+            }
         }
 
+    def iter_user_media_pages(self, user_id, count=50, after=None, cursors=False, window=None):
+        """
+        For the user with the provided user_id, lazily pages through their entire timeline of media, newest first,
+        following the cursor Instagram returns with each page. Each page is only requested once the previous one has
+        been consumed.
+
+        Args:
+            user_id: The ID of the user to retrieve media results for.
+            count: The number of media entities to request per page, up to 50.
+            after: The cursor to start paging from, as returned with a previous page. Defaults to the newest media.
+            cursors: If True, each page is yielded along with the cursor of the page after it, so that paging can be
+                resumed from there later.
+            window: An optional TimeWindow. Only media within it are yielded, pages are made no larger than its limit
+                needs, and paging stops as soon as it has been exhausted.
+
+        Yields:
+            Lists of MediaRecords, or (list of MediaRecords, cursor) tuples if cursors is True, where the cursor is None
+            on the last page.
+        """
+        selected = 0
+        oldest = None
+
+        while True:
+            page_size = window.page_size(count, selected, oldest) if window is not None else count
+            if page_size == 0:
+                return
+
+            page = self.media_page(user_id, page_size, after)
+            records = page['data']
+            after = page['pagination']['next_max_id']
+
+            if window is not None:
+                if records:
+                    oldest = records[-1].created_at_timestamp
+
+                records, exhausted = window.select(records, selected)
+                selected += len(records)
+
+                if exhausted:
+                    after = None
+
+            yield (records, after) if cursors else records
+
+            if after is None:
+                return
+
+    def media_page(self, user_id, count, after):
+        """
+        Fetches a single page of a user's timeline as MediaRecords, or takes it from memory if it was remembered.
+
+        Args:
+            user_id: The ID of the user to retrieve media results for.
+            count: The number of media entities to request, up to 50.
+            after: The cursor of the page, or None for the newest media.
+
+        Returns:
+            The page, as returned by `users_user_id_media_recent` with `compact`.
+        """
+        if self.page_flight is None:
+            return self.users_user_id_media_recent(user_id, count=count, after=after, compact=True)
+
+        return self.page_flight.do(
+            (user_id, count, after),
+            lambda: self.users_user_id_media_recent(user_id, count=count, after=after, compact=True)
+        )
+
+    def iter_user_media(self, user_id, count=50, window=None):
+        """
+        For the user with the provided user_id, lazily iterates through their entire timeline of media, newest first,
+        one post at a time. Only a single page of media is held in memory at once.
+
+        Args:
+            user_id: The ID of the user to retrieve media results for.
+            count: The number of media entities to request per page, up to 50.
+            window: An optional TimeWindow to bound the media by, as per `iter_user_media_pages`.
+
+        Yields:
+            Individual MediaRecords.
+        """
+        for page in self.iter_user_media_pages(user_id, count=count, window=window):
+            yield from page
+
+    @staticmethod
+    def transform_media(node):
+        """
+        Transforms a media node from Instagram's GraphQL API into a saner format.
+
+        Args:
+            node: The `node` of a single edge of `edge_owner_to_timeline_media`.
+
+        Returns:
+            The media, formatted similarly to an item of https://www.instagram.com/developer/endpoints/users/#get_users_media_recent
+        """
+        # Pull across useful properties
+        transformed_image = {
+            "id": node['id'],
+            "created_at_timestamp": node['taken_at_timestamp'],
+            "caption": None, # Set later if applicable
+            "comments": {
+                "count": node['edge_media_to_comment']['count'],
+                "is_disabled": node['comments_disabled']
+            },
+            "shortcode": node['shortcode'],
+            "dimensions": {
+                "width": node['dimensions']['width'],
+                "height": node['dimensions']['height'],
+            },
+            "display_url": node['display_url'],
+            "likes": {
+                "count": node['edge_media_preview_like']['count']
+            },
+            "owner": {
+                "id": node['owner']['id']
+            },
+            "thumbnail_src": node['thumbnail_src'],
+            "thumbnail_resources": node['thumbnail_resources'],
+            "is_video": node['is_video']
+        }
+
+        # Only include video_view_count if the entity is a video
+        if transformed_image["is_video"]:
+            transformed_image['video_view_count'] = node['video_view_count']
+
+        # Set the text of the caption if one exists
+        if len(node['edge_media_to_caption']['edges']) != 0:
+            transformed_image["caption"] = {
+                "text": node['edge_media_to_caption']['edges'][0]["node"]["text"]
+            }
+
+        return transformed_image
+
     @authenticated
     def users_self_media_liked(self):
         """
@@ -329,33 +807,51 @@ class InstagramDataService:
         Notes:
             Divergences from the Instagram API: 1) Instagram has dropped support for first name and last names on the
             platform in lieu of fullnames. 2) Instagram now provides a lot more data on each returned user via search.
-            This is included in the result.
+            This is included in the result. 3) Each user is returned at most once. 4) If a search index was provided,
+            repeats of a query whose results are already known, and if it narrows, queries which can be narrowed down
+            from those of a shorter query, are answered without a request to Instagram.
         """
 
         # Ensure a search query is provided.
         if 'q' not in kwargs:
             raise Exception("Please provide a search query")
 
-        # Make the request
-        r = self.request(endpoint='search', query_params={
-            'context': 'blended',
-            'query': kwargs['q']
-        })
+        # Answer the query locally if the results of previous queries allow it
+        query = UserSearchIndex.normalize(kwargs['q'])
+        users = self.search_index.search(query) if self.search_index is not None else None
 
-        # Ensure status code is 200
-        if r.status_code is not 200:
-            raise Exception("Instagram responded with {} status code".format(str(r.status_code)))
+        if users is None:
+            # Make the request
+            r = self.request(endpoint='search', query_params={
+                'context': 'blended',
+                'query': kwargs['q']
+            })
+
+            # Ensure status code is 200
+            if r.status_code is not 200:
+                raise Exception("Instagram responded with {} status code".format(str(r.status_code)))
+
+            with self.profile_phase('parse'):
+                results = r.json()['users']
+
+            # The same user can turn up more than once, so keep only the first, best ranked, result for each.
+            users = []
+            seen_ids = set()
+            for result in results:
+                user = result['user']
+                user['id'] = int(user.pop('pk', None))
+
+                if user['id'] not in seen_ids:
+                    seen_ids.add(user['id'])
+                    users.append(user)
+
+            if self.search_index is not None:
+                self.search_index.add(query, users)
 
         # delimit the number of users we take.
-        users = r.json()['users']
         if 'count' in kwargs:
             users = users[:kwargs['count']]
 
-        transformed_users = []
-        for user in users:
-            user['user']['id'] = int(user['user'].pop('pk', None))
-            transformed_users.append(user['user'])
-
         return {
-            'data': transformed_users
+            'data': users
         }
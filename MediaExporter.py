@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import threading
+import time
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TableWriter:
+    """
+    Appends rows to a single file in CSV, JSONL, or Parquet format. Rows are buffered and written a batch at a time, so
+    that memory stays constant however many rows are written.
+    """
+
+    def __init__(self, path, columns, file_format, batch_size):
+        """
+        Initialization.
+
+        Args:
+            path: The location of the file to write. Any existing file is replaced.
+            columns: The columns of each row, as (name, type) tuples, where type is one of 'string', 'int64', or 'bool_'
+                as named by pyarrow.
+            file_format: One of 'csv', 'jsonl', or 'parquet'.
+            batch_size: The number of rows buffered before they are written.
+        """
+        self.path = path
+        self.columns = [name for name, _ in columns]
+        self.column_types = [column_type for _, column_type in columns]
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.rows = []
+        self.file = None
+        self.parquet_writer = None
+
+        if file_format == 'csv':
+            self.file = open(path, 'w', newline='')
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(self.columns)
+        elif file_format == 'jsonl':
+            self.file = open(path, 'w')
+
+    def write(self, row):
+        """
+        Buffers a row, writing out the buffer once it is full.
+
+        Args:
+            row: A tuple of values, in the order of the columns.
+        """
+        self.rows.append(row)
+
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes out any buffered rows.
+        """
+        if not self.rows:
+            return
+
+        if self.file_format == 'csv':
+            self.csv_writer.writerows(self.rows)
+            self.file.flush()
+        elif self.file_format == 'jsonl':
+            self.file.writelines(json.dumps(dict(zip(self.columns, row))) + '\n' for row in self.rows)
+            self.file.flush()
+        else:
+            # Each batch is written as its own row group. The schema is explicit, so that a batch in which a column
+            # happens to be entirely empty is typed the same as every other batch.
+            schema = pyarrow.schema([
+                (column, getattr(pyarrow, column_type)())
+                for column, column_type in zip(self.columns, self.column_types)
+            ])
+            table = pyarrow.Table.from_pydict(
+                dict((column, [row[index] for row in self.rows]) for index, column in enumerate(self.columns)),
+                schema=schema
+            )
+
+            if self.parquet_writer is None:
+                self.parquet_writer = pyarrow.parquet.ParquetWriter(self.path, schema)
+
+            self.parquet_writer.write_table(table)
+
+        self.rows = []
+
+    def close(self):
+        """
+        Writes out any buffered rows, and closes the file.
+        """
+        self.flush()
+
+        if self.file is not None:
+            self.file.close()
+
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+class MediaExporter:
+    """
+    Exports everything crawled to disk as it arrives: every post fetched from a user's timeline to `media.<format>`,
+    and the counts of every user looked up to `users.<format>`, ready for bulk loading into a warehouse. Safe to share
+    between threads.
+    """
+
+    formats = {'csv', 'jsonl', 'parquet'}
+
+    media_columns = (
+        ('id', 'string'),
+        ('shortcode', 'string'),
+        ('owner_id', 'string'),
+        ('created_at_timestamp', 'int64'),
+        ('like_count', 'int64'),
+        ('comment_count', 'int64'),
+        ('comments_disabled', 'bool_'),
+        ('is_video', 'bool_'),
+        ('video_view_count', 'int64'),
+        ('width', 'int64'),
+        ('height', 'int64'),
+        ('caption_text', 'string'),
+        ('display_url', 'string'),
+        ('thumbnail_src', 'string')
+    )
+
+    user_columns = (
+        ('username', 'string'),
+        ('id', 'string'),
+        ('media_count', 'int64'),
+        ('follows_count', 'int64'),
+        ('followed_by_count', 'int64'),
+        ('fetched_at_timestamp', 'int64')
+    )
+
+    def __init__(self, directory, file_format='csv', batch_size=1000):
+        """
+        Initialization. Creates the export directory if it does not yet exist, replacing any previous export in it.
+
+        Args:
+            directory: The directory to export to.
+            file_format: One of 'csv', 'jsonl', or 'parquet'. Parquet requires the `pyarrow` package.
+            batch_size: The number of rows buffered before they are written to disk.
+        """
+        if file_format not in self.formats:
+            raise Exception("export format must be one of: {}".format(", ".join(sorted(self.formats))))
+
+        if file_format == 'parquet' and pyarrow is None:
+            raise Exception("Please install pyarrow to export to parquet")
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.media = TableWriter(
+            os.path.join(directory, 'media.' + file_format), self.media_columns, file_format, batch_size
+        )
+        self.users = TableWriter(
+            os.path.join(directory, 'users.' + file_format), self.user_columns, file_format, batch_size
+        )
+
+    def write_media(self, records):
+        """
+        Exports posts.
+
+        Args:
+            records: An iterable of MediaRecords.
+        """
+        with self.lock:
+            for record in records:
+                self.media.write(tuple(getattr(record, column) for column, _ in self.media_columns))
+
+    def write_user(self, username, data):
+        """
+        Exports the counts of a user.
+
+        Args:
+            username: The username the user was looked up by.
+            data: The user's details, as returned in `data` by `InstagramDataService.user_info`. Fields which were not
+                requested are exported as empty.
+        """
+        counts = data.get('counts', {})
+
+        with self.lock:
+            self.users.write((
+                username,
+                data.get('id'),
+                counts.get('media'),
+                counts.get('follows'),
+                counts.get('followed_by'),
+                int(time.time())
+            ))
+
+    def flush(self):
+        """
+        Writes out any buffered rows. Parquet files are only complete once the exporter is closed.
+        """
+        with self.lock:
+            self.media.flush()
+            self.users.flush()
+
+    def close(self):
+        """
+        Writes out any buffered rows, and closes the export files.
+        """
+        with self.lock:
+            self.media.close()
+            self.users.close()
@@ -0,0 +1,122 @@
+from array import array
+
+
+class MediaRecord:
+    """
+    A compact representation of a single post on a user's timeline. Uses `__slots__` rather than a nested dictionary,
+    and keeps only scalar fields, so that large numbers of posts can be held in memory at once.
+    """
+
+    __slots__ = (
+        'id', 'shortcode', 'created_at_timestamp', 'caption_text', 'like_count', 'comment_count', 'comments_disabled',
+        'owner_id', 'is_video', 'video_view_count', 'width', 'height', 'display_url', 'thumbnail_src'
+    )
+
+    def __init__(self, **kwargs):
+        """
+        Initialization.
+
+        Keyword Args:
+            Any of the fields named in `__slots__`. Fields which are not provided default to None.
+        """
+        for field in self.__slots__:
+            setattr(self, field, kwargs.get(field))
+
+    @classmethod
+    def from_node(cls, node):
+        """
+        Builds a MediaRecord directly from a media node from Instagram's GraphQL API, without building the intermediate
+        dictionary that `InstagramDataService.transform_media` does.
+
+        Args:
+            node: The `node` of a single edge of `edge_owner_to_timeline_media`.
+
+        Returns:
+            The MediaRecord.
+        """
+        caption_edges = node['edge_media_to_caption']['edges']
+
+        return cls(
+            id=node['id'],
+            shortcode=node['shortcode'],
+            created_at_timestamp=node['taken_at_timestamp'],
+            caption_text=caption_edges[0]['node']['text'] if caption_edges else None,
+            like_count=node['edge_media_preview_like']['count'],
+            comment_count=node['edge_media_to_comment']['count'],
+            comments_disabled=node['comments_disabled'],
+            owner_id=node['owner']['id'],
+            is_video=node['is_video'],
+            video_view_count=node.get('video_view_count') if node['is_video'] else None,
+            width=node['dimensions']['width'],
+            height=node['dimensions']['height'],
+            display_url=node['display_url'],
+            thumbnail_src=node['thumbnail_src']
+        )
+
+
+class MediaBatch:
+    """
+    A columnar batch of posts, holding the fields used for aggregation as parallel arrays rather than one object per
+    post. Timestamps, like counts, and comment counts are stored as packed 64-bit integers, which can be handed straight
+    to `RunningStatistics.summarize` or NumPy.
+    """
+
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self.ids = []
+        self.created_at_timestamps = array('q')
+        self.like_counts = array('q')
+        self.comment_counts = array('q')
+
+    def __len__(self):
+        """
+        Returns:
+            The number of posts in the batch.
+        """
+        return len(self.ids)
+
+    def append(self, record):
+        """
+        Adds a post to the batch.
+
+        Args:
+            record: The MediaRecord of the post.
+        """
+        self.ids.append(record.id)
+        self.created_at_timestamps.append(record.created_at_timestamp)
+        self.like_counts.append(record.like_count)
+        self.comment_counts.append(record.comment_count)
+
+    def extend(self, records):
+        """
+        Adds several posts to the batch.
+
+        Args:
+            records: An iterable of MediaRecords.
+        """
+        for record in records:
+            self.append(record)
+
+    @classmethod
+    def from_posts(cls, posts):
+        """
+        Builds a batch from the posts of a snapshot, as stored by MediaSnapshotStore.
+
+        Args:
+            posts: A list of posts, each a dict of `id`, `created_at_timestamp`, `likes`, and `comments`. Posts
+                snapshotted before comment counts were kept are counted as having none.
+
+        Returns:
+            The MediaBatch.
+        """
+        batch = cls()
+
+        for post in posts:
+            batch.ids.append(post['id'])
+            batch.created_at_timestamps.append(post['created_at_timestamp'])
+            batch.like_counts.append(post['likes'])
+            batch.comment_counts.append(post.get('comments', 0))
+
+        return batch
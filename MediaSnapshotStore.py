@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import time
+
+
+class MediaSnapshotStore:
+    """
+    Stores a snapshot of each user's timeline on disk, as a JSON file per user. A snapshot holds just enough of each post
+    to analyse it without refetching it: its ID, the timestamp it was posted at, and its like and comment counts. Posts
+    are stored newest first, mirroring the order Instagram returns them in.
+    """
+
+    default_path = os.path.join(os.path.expanduser('~'), '.igcli', 'snapshots')
+
+    def __init__(self, directory=default_path):
+        """
+        Initialization.
+
+        Args:
+            directory: The directory the snapshots are stored in. Created if it does not yet exist.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, user_id):
+        """
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            The location on disk of the snapshot for the user.
+        """
+        return os.path.join(self.directory, '{}.json'.format(user_id))
+
+    def load(self, user_id):
+        """
+        Loads the snapshot for a user.
+
+        Args:
+            user_id: The ID of the user.
+
+        Returns:
+            A list of posts, newest first, each a dict of `id`, `created_at_timestamp`, `likes`, and `comments`. None if
+            no snapshot has been saved for the user. Posts saved before comment counts were kept have no `comments`.
+        """
+        try:
+            with open(self.path(user_id)) as f:
+                return json.load(f)['posts']
+        except FileNotFoundError:
+            return None
+
+    def save(self, user_id, username, posts):
+        """
+        Saves the snapshot for a user, replacing any previous snapshot. The snapshot is written to a temporary file
+        of its own first, so an interrupted save never leaves a corrupt snapshot behind, and concurrent saves never
+        clash.
+
+        Args:
+            user_id: The ID of the user.
+            username: The username of the user, stored for reference.
+            posts: A list of posts, newest first, each a dict of `id`, `created_at_timestamp`, `likes`, and
+                `comments`.
+        """
+        path = self.path(user_id)
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.', suffix='.tmp'
+        )
+
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump({
+                    'user_id': user_id,
+                    'username': username,
+                    'updated_at_timestamp': int(time.time()),
+                    'posts': posts
+                }, f)
+
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
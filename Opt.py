@@ -6,5 +6,33 @@ class Opt(Enum):
     Tool = "tool"
     Username = "-u"
     Caption = "-c"
+    Query = "-q"
     RecentPostLimit = "-rpl"
     File = "-file"
+    Concurrency = "-concurrency"
+    RateLimit = "-rate"
+    Cache = "-cache"
+    CacheMode = "-cache-mode"
+    Snapshots = "-snapshots"
+    RefreshWindow = "-refresh"
+    TopCount = "-top"
+    Format = "-format"
+    SessionState = "-session"
+    MaxRetries = "-retries"
+    PoolSize = "-pool-size"
+    KeepAlive = "-keep-alive"
+    WorkerSessions = "-worker-sessions"
+    Profile = "-profile"
+    Socket = "-socket"
+    Export = "-export"
+    ExportFormat = "-export-format"
+    Checkpoint = "-checkpoint"
+    Resume = "-resume"
+    Since = "-since"
+    Until = "-until"
+    Queue = "-queue"
+    HashtagIndex = "-index"
+    Hashtag = "-tag"
+    Approximate = "-approximate"
+    RememberedPages = "-remember-pages"
+    NarrowSearches = "-narrow-searches"
@@ -0,0 +1,141 @@
+import json
+import igcli
+from Opt import Opt
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+class Pipeline:
+    """
+    Runs several tools one after another in a single process, against a single InstagramDataService. The session is
+    bootstrapped once, profiles looked up by one tool are reused by the next, and pages of timelines are remembered, so
+    that a user's timeline is crawled once however many tools analyse it.
+
+    Pipelines are described by a job file, in JSON, or in YAML if PyYAML is installed, such as:
+
+        {
+            "options": {"-u": "instagram", "-rpl": 100},
+            "jobs": [
+                {"tool": "like-analysis"},
+                {"tool": "hashtag-analysis", "options": {"-top": 5}},
+                {"tool": "user-scoreboard", "options": {"-file": "users.txt"}}
+            ]
+        }
+
+    The top-level `options` configure the data service, as per the options which apply to every tool, and are given to
+    every job, where each job's own `options` take precedence over them. Options given on the command line take
+    precedence over both.
+    """
+
+    # Pages of timelines remembered for reuse, unless overridden with -remember-pages. At 50 posts a page, enough to
+    # share the timelines of most batches of users between tools.
+    default_remembered_pages = 2000
+
+    def __init__(self, jobs, options, instagram_data_service, profiler=None, overrides=None):
+        """
+        Initialization.
+
+        Args:
+            jobs: A list of jobs, each a dictionary of the `tool` to run, and its `options`, as a dictionary of option
+                flags to values.
+            options: The options given to every job, as a dictionary of Opt keys to values.
+            instagram_data_service: The InstagramDataService every tool is run against.
+            profiler: An optional Profiler to record the duration of each job with.
+            overrides: Options which take precedence over each job's own, such as those given on the command line, as a
+                dictionary of Opt keys to values.
+        """
+        self.jobs = jobs
+        self.options = options
+        self.overrides = overrides or {}
+        self.instagram_data_service = instagram_data_service
+        self.profiler = profiler
+        self.tools = {}
+
+    @staticmethod
+    def load(path):
+        """
+        Reads a job file.
+
+        Args:
+            path: The location of the job file. Files ending in `.yaml` or `.yml` are read as YAML, and any other file
+                as JSON.
+
+        Returns:
+            A dictionary of the pipeline's `options`, and its `jobs`.
+
+        Raises:
+            Exception: If the job file is not valid.
+        """
+        with open(path) as f:
+            if path.endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    raise Exception("Please install PyYAML to read YAML job files")
+
+                pipeline = yaml.safe_load(f)
+            else:
+                pipeline = json.load(f)
+
+        if not isinstance(pipeline, dict) or not isinstance(pipeline.get('jobs'), list):
+            raise Exception("The job file must have a list of jobs")
+
+        for job in pipeline['jobs']:
+            if job.get('tool') not in igcli.get_toolkit():
+                raise Exception("Please provide one of the following igcli tools for every job: {}".format(
+                    igcli.get_toolkit()
+                ))
+
+        return {
+            'options': pipeline.get('options') or {},
+            'jobs': pipeline['jobs']
+        }
+
+    def run_job(self, job):
+        """
+        Runs a single job.
+
+        Args:
+            job: A dictionary of the `tool` to run, and its `options`.
+
+        Returns:
+            The result returned by the tool.
+        """
+        if job['tool'] not in self.tools:
+            self.tools[job['tool']] = igcli.load_tool(job['tool'])
+
+        opts = {**self.options, **igcli.parse_option_dict(job.get('options') or {}), **self.overrides}
+        opts[Opt.Tool] = job['tool']
+
+        Tool = self.tools[job['tool']]
+        tool = Tool(self.instagram_data_service if Tool.requires_network() else None)
+        options = igcli.gather_opts(opts, tool.requested_options())
+
+        if self.profiler is None:
+            return tool.run(options)
+
+        with self.profiler.phase('run:{}'.format(tool)):
+            return tool.run(options)
+
+    def run(self):
+        """
+        Runs every job in turn. Each job's result is printed as a line of JSON once it has finished, as
+        `{"tool": ..., "result": ...}`, or `{"tool": ..., "error": ...}` if it failed, after anything the tool itself
+        printed. A failed job does not stop the jobs after it.
+
+        Returns:
+            The number of jobs which failed.
+        """
+        failures = 0
+
+        for job in self.jobs:
+            try:
+                line = {'tool': job['tool'], 'result': self.run_job(job)}
+            except Exception as e:
+                failures += 1
+                line = {'tool': job['tool'], 'error': str(e)}
+
+            print(json.dumps(line, default=str), flush=True)
+
+        return failures
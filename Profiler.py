@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+    Records where a run spends its time: every request made through InstagramDataService, with its wall time, time spent
+    waiting on the throttle, bytes received, status code, retries, and whether it was served from the cache; and the
+    duration of named phases, such as parsing responses or running a tool.
+
+    The recording can be written out in the Chrome trace event format, viewable in chrome://tracing or Perfetto, and
+    summarised as latency percentiles and request throughput.
+    """
+
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self.started_at = time.perf_counter()
+        self.requests = []
+        self.phases = []
+        self.lock = threading.Lock()
+
+    def now(self):
+        """
+        Returns:
+            The number of seconds since the profiler was created.
+        """
+        return time.perf_counter() - self.started_at
+
+    def record_request(self, endpoint, started_at, duration, status_code, bytes_received=0, retries=0,
+                       throttle_wait=0, cache_hit=False):
+        """
+        Records a request made through InstagramDataService.
+
+        Args:
+            endpoint: The endpoint of the request, one of 'username', 'search', or 'graphql'.
+            started_at: When the request started, as returned by `now`.
+            duration: The wall time of the request in seconds, including any retries and waits.
+            status_code: The status code of the final response.
+            bytes_received: The size of the final response body.
+            retries: The number of times the request was retried.
+            throttle_wait: The number of seconds spent waiting on the throttle and backing off.
+            cache_hit: Whether the request was served from the cache.
+        """
+        with self.lock:
+            self.requests.append({
+                'endpoint': endpoint,
+                'started_at': started_at,
+                'duration': duration,
+                'status_code': status_code,
+                'bytes_received': bytes_received,
+                'retries': retries,
+                'throttle_wait': throttle_wait,
+                'cache_hit': cache_hit,
+                'thread_id': threading.get_ident()
+            })
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Records the duration of the enclosed block as a named phase.
+
+        Args:
+            name: The name of the phase.
+        """
+        started_at = self.now()
+
+        try:
+            yield
+        finally:
+            duration = self.now() - started_at
+
+            with self.lock:
+                self.phases.append({
+                    'name': name,
+                    'started_at': started_at,
+                    'duration': duration,
+                    'thread_id': threading.get_ident()
+                })
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        """
+        Args:
+            sorted_values: A sorted list of values.
+            fraction: The percentile to retrieve, as a fraction between 0 and 1.
+
+        Returns:
+            The value at the percentile, using the nearest rank, or None if there are no values.
+        """
+        if not sorted_values:
+            return None
+
+        return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+    def summary(self):
+        """
+        Returns:
+            A dictionary summarising the run: the number of `requests` and `cache_hits`, the `network_requests` which
+            were not, their `latency_p50` and `latency_p95` in seconds, `requests_per_second` over the whole run, the
+            total `bytes_received`, `retries` and `throttle_wait`, and the total duration of each of the `phases`.
+        """
+        with self.lock:
+            requests = list(self.requests)
+            phases = list(self.phases)
+
+        elapsed = self.now()
+        network_requests = [request for request in requests if not request['cache_hit']]
+        latencies = sorted(request['duration'] for request in network_requests)
+
+        phase_durations = {}
+        for phase in phases:
+            phase_durations[phase['name']] = phase_durations.get(phase['name'], 0) + phase['duration']
+
+        return {
+            'elapsed': elapsed,
+            'requests': len(requests),
+            'cache_hits': len(requests) - len(network_requests),
+            'network_requests': len(network_requests),
+            'latency_p50': self.percentile(latencies, 0.5),
+            'latency_p95': self.percentile(latencies, 0.95),
+            'requests_per_second': len(requests) / elapsed if elapsed > 0 else None,
+            'bytes_received': sum(request['bytes_received'] for request in requests),
+            'retries': sum(request['retries'] for request in requests),
+            'throttle_wait': sum(request['throttle_wait'] for request in requests),
+            'phases': phase_durations
+        }
+
+    def chrome_trace(self):
+        """
+        Returns:
+            The recording in the Chrome trace event format, with the summary included as `otherData`.
+        """
+        pid = os.getpid()
+        events = []
+
+        with self.lock:
+            for request in self.requests:
+                events.append({
+                    'name': 'request:' + request['endpoint'],
+                    'cat': 'cache' if request['cache_hit'] else 'network',
+                    'ph': 'X',
+                    'ts': request['started_at'] * 1e6,
+                    'dur': request['duration'] * 1e6,
+                    'pid': pid,
+                    'tid': request['thread_id'],
+                    'args': dict((key, request[key]) for key in (
+                        'status_code', 'bytes_received', 'retries', 'throttle_wait', 'cache_hit'
+                    ))
+                })
+
+            for phase in self.phases:
+                events.append({
+                    'name': phase['name'],
+                    'cat': 'phase',
+                    'ph': 'X',
+                    'ts': phase['started_at'] * 1e6,
+                    'dur': phase['duration'] * 1e6,
+                    'pid': pid,
+                    'tid': phase['thread_id']
+                })
+
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': self.summary()
+        }
+
+    def write(self, path):
+        """
+        Writes the recording to a file in the Chrome trace event format.
+
+        Args:
+            path: The location to write the trace to.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def format_summary(self):
+        """
+        Returns:
+            A human readable summary of the run.
+        """
+        summary = self.summary()
+
+        def milliseconds(seconds):
+            return "-" if seconds is None else "{:.0f}ms".format(seconds * 1000)
+
+        lines = [
+            "{} requests ({} from cache) in {:.2f}s, {:.2f} requests/s".format(
+                summary['requests'], summary['cache_hits'], summary['elapsed'], summary['requests_per_second'] or 0
+            ),
+            "latency p50 {}, p95 {}; {} bytes received, {} retries, {:.2f}s throttled".format(
+                milliseconds(summary['latency_p50']), milliseconds(summary['latency_p95']),
+                summary['bytes_received'], summary['retries'], summary['throttle_wait']
+            )
+        ]
+
+        for name, duration in sorted(summary['phases'].items(), key=lambda phase: phase[1], reverse=True):
+            lines.append("{} {:.3f}s".format(name.ljust(40), duration))
+
+        return "\n".join(lines)
@@ -0,0 +1,317 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CachedResponse:
+    """
+    A response to an Instagram request that has been served from the ResponseCache. Mimics the parts of
+    `requests.Response` used by InstagramDataService, so callers can treat cached and live responses alike.
+    """
+
+    def __init__(self, status_code, content):
+        """
+        Initialization.
+
+        Args:
+            status_code: The HTTP status code Instagram originally responded with.
+            content: The raw bytes of the response body.
+        """
+        self.status_code = status_code
+        self.content = content
+        self.from_cache = True
+
+    @property
+    def text(self):
+        """
+        The response body, decoded as UTF-8.
+        """
+        return self.content.decode('utf-8')
+
+    def json(self):
+        """
+        Returns:
+            The response body parsed as JSON.
+        """
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """
+    A persistent, SQLite-backed cache of successful responses from Instagram. Entries expire after a time-to-live that
+    depends on the endpoint they were fetched from, and the least recently used entries are evicted once the cache grows
+    beyond `max_bytes`.
+
+    The cache operates in one of three modes: 'use' reads from and writes to the cache, 'refresh' ignores any cached
+    entries but stores fresh responses, and 'bypass' neither reads nor writes.
+
+    The cache can be shared by several processes at once. Reads never write to the database: when entries were last
+    used is remembered in memory, and written out in batches alongside new entries. The combined size of the entries is
+    kept in the database itself, so that every process evicts against the same total.
+    """
+
+    modes = {'use', 'refresh', 'bypass'}
+
+    default_path = os.path.join(os.path.expanduser('~'), '.igcli', 'cache.sqlite3')
+
+    # Seconds each endpoint's responses are considered fresh for
+    default_ttls = {
+        'username': 60 * 60,
+        'graphql': 60 * 60,
+        'search': 15 * 60
+    }
+
+    # Evictions trim the cache down to this fraction of max_bytes, so that each eviction frees a useful amount of room
+    eviction_low_water = 0.9
+
+    # Number of cache hits remembered before when they were used is written out, if no response is stored sooner
+    access_batch_size = 100
+
+    def __init__(self, path=default_path, mode='use', ttls=None, max_bytes=256 * 1024 * 1024):
+        """
+        Initialization. Opens, and if necessary creates, the cache database at `path`.
+
+        Args:
+            path: The location of the SQLite database on disk.
+            mode: One of 'use', 'refresh', or 'bypass'.
+            ttls: A dict of endpoint names to time-to-live in seconds, overriding the defaults for those endpoints.
+            max_bytes: The maximum combined size of the cached response bodies.
+        """
+        if mode not in self.modes:
+            raise Exception("cache mode must be one of: {}".format(", ".join(sorted(self.modes))))
+
+        self.mode = mode
+        self.ttls = dict(self.default_ttls, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.accessed_at = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Transactions are begun explicitly, so that stores take the database's write lock before reading the size of
+        # the entries they replace. Write-ahead logging lets other processes read while one writes.
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, '
+            'endpoint TEXT NOT NULL, '
+            'status_code INTEGER NOT NULL, '
+            'content BLOB NOT NULL, '
+            'size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, '
+            'accessed_at REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS totals ('
+            'name TEXT PRIMARY KEY, '
+            'value INTEGER NOT NULL)'
+        )
+        self.connection.execute(
+            "INSERT OR IGNORE INTO totals (name, value) "
+            "SELECT 'bytes', COALESCE(SUM(size), 0) FROM responses"
+        )
+
+    @staticmethod
+    def key(endpoint, identity):
+        """
+        Builds the cache key for a request.
+
+        Args:
+            endpoint: The endpoint of the request, one of 'username', 'search', or 'graphql'.
+            identity: The parts of the request which distinguish it from other requests to the same endpoint; the
+                username, the query parameters, or the query_hash and query variables.
+
+        Returns:
+            A string uniquely identifying the request.
+        """
+        return endpoint + ':' + json.dumps(identity, sort_keys=True, separators=(',', ':'))
+
+    def get(self, endpoint, key, mode=None):
+        """
+        Retrieves a fresh cached response for a request.
+
+        Args:
+            endpoint: The endpoint of the request.
+            key: The cache key of the request, as built by `key`.
+            mode: Overrides the cache mode for this lookup only.
+
+        Returns:
+            A CachedResponse, or None if there is no fresh entry or cached entries are not being read. Expired entries
+            are left to be replaced, or evicted, by a later store.
+        """
+        if (mode or self.mode) != 'use':
+            return None
+
+        now = time.time()
+
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT status_code, content, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            status_code, content, created_at = row
+
+            if now - created_at > self.ttls.get(endpoint, 0):
+                return None
+
+            self.accessed_at[key] = now
+
+            if len(self.accessed_at) >= self.access_batch_size:
+                self.write_accesses()
+
+        return CachedResponse(status_code, bytes(content))
+
+    def set(self, endpoint, key, response, mode=None):
+        """
+        Stores a successful response in the cache, evicting the least recently used entries if the cache has grown
+        too large.
+
+        Args:
+            endpoint: The endpoint of the request.
+            key: The cache key of the request, as built by `key`.
+            response: The response from Instagram. Only responses with a 200 status code are stored.
+            mode: Overrides the cache mode for this store only.
+        """
+        if (mode or self.mode) == 'bypass' or response.status_code != 200:
+            return
+
+        content = response.content
+        now = time.time()
+
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+
+            try:
+                self.delete(key)
+                self.connection.execute(
+                    'INSERT INTO responses (key, endpoint, status_code, content, size, created_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key, endpoint, response.status_code, sqlite3.Binary(content), len(content), now, now)
+                )
+                self.add_bytes(len(content))
+
+                if self.total_bytes() > self.max_bytes:
+                    self.evict()
+
+                self.update_accesses()
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+
+            self.accessed_at = {}
+
+    def write_accesses(self):
+        """
+        Writes out when the cache hits remembered since the last write were used, so that they are not the first to be
+        evicted. As this is only a hint for eviction, it is given up on if another process holds the database for too
+        long. Must be called with the lock held.
+        """
+        try:
+            self.connection.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError:
+            return
+
+        try:
+            self.update_accesses()
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+
+        self.accessed_at = {}
+
+    def update_accesses(self):
+        """
+        Updates when the cache hits remembered were used. Must be called with the lock held, within a transaction.
+        """
+        self.connection.executemany(
+            'UPDATE responses SET accessed_at = MAX(accessed_at, ?) WHERE key = ?',
+            [(accessed_at, key) for key, accessed_at in self.accessed_at.items()]
+        )
+
+    def total_bytes(self):
+        """
+        Returns:
+            The combined size of the cached response bodies, as recorded in the database.
+        """
+        return self.connection.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+
+    def add_bytes(self, size):
+        """
+        Adjusts the combined size of the cached response bodies. Must be called with the lock held, within a
+        transaction.
+
+        Args:
+            size: The number of bytes added, or if negative, removed.
+        """
+        self.connection.execute("UPDATE totals SET value = value + ? WHERE name = 'bytes'", (size,))
+
+    def delete(self, key):
+        """
+        Removes a single entry from the cache. Must be called with the lock held, within a transaction.
+
+        Args:
+            key: The cache key of the entry to remove.
+        """
+        row = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+
+        if row is not None:
+            self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.add_bytes(-row[0])
+
+    def evict(self):
+        """
+        Removes expired entries, then the least recently used entries until the cache is back under its size limit.
+        Must be called with the lock held, within a transaction.
+        """
+        now = time.time()
+
+        for endpoint, ttl in self.ttls.items():
+            self.connection.execute(
+                'DELETE FROM responses WHERE endpoint = ? AND created_at < ?', (endpoint, now - ttl)
+            )
+
+        # The total is recomputed from the entries themselves, so that any drift in it is corrected
+        self.update_accesses()
+        total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        target = self.max_bytes * self.eviction_low_water
+
+        cursor = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed_at')
+        evicted_keys = []
+
+        for key, size in cursor:
+            if total_bytes <= target:
+                break
+
+            evicted_keys.append((key,))
+            total_bytes -= size
+
+        self.connection.executemany('DELETE FROM responses WHERE key = ?', evicted_keys)
+        self.connection.execute("UPDATE totals SET value = ? WHERE name = 'bytes'", (total_bytes,))
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+
+            try:
+                self.connection.execute('DELETE FROM responses')
+                self.connection.execute("UPDATE totals SET value = 0 WHERE name = 'bytes'")
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+
+            self.accessed_at = {}
@@ -0,0 +1,113 @@
+import io
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class ResponseParser:
+    """
+    Extracts a projection of fields from a JSON response body, without building the entire document. Each field is
+    requested as a path of keys from the root of the document.
+
+    If `ijson` is installed, the body is parsed incrementally as a stream of events. Only the values at the requested
+    paths are built, and parsing stops as soon as all of them have been found, so the remainder of a large response is
+    never parsed at all. Otherwise, the body is parsed in full with the standard library, and the fields picked out.
+    """
+
+    @staticmethod
+    def project(content, paths):
+        """
+        Extracts the values at the requested paths from a JSON document.
+
+        Args:
+            content: The raw bytes of the JSON document.
+            paths: A dictionary of names to paths, where each path is a tuple of the keys leading to a value.
+
+        Returns:
+            A dictionary of the names to the values found at their paths.
+
+        Raises:
+            Exception: If any of the paths are not present in the document.
+        """
+        if ijson is None:
+            return ResponseParser.project_document(json.loads(content), paths)
+
+        return ResponseParser.project_stream(content, paths)
+
+    @staticmethod
+    def project_document(document, paths):
+        """
+        Extracts the values at the requested paths from an already parsed JSON document.
+
+        Args:
+            document: The parsed JSON document.
+            paths: A dictionary of names to paths, as per `project`.
+
+        Returns:
+            A dictionary of the names to the values found at their paths.
+        """
+        projection = {}
+
+        for name, path in paths.items():
+            value = document
+
+            try:
+                for key in path:
+                    value = value[key]
+            except (KeyError, IndexError, TypeError):
+                raise Exception("Instagram response is missing {}".format(".".join(path)))
+
+            projection[name] = value
+
+        return projection
+
+    @staticmethod
+    def project_stream(content, paths):
+        """
+        Extracts the values at the requested paths from a JSON document, parsing it incrementally with ijson.
+
+        Args:
+            content: The raw bytes of the JSON document.
+            paths: A dictionary of names to paths, as per `project`.
+
+        Returns:
+            A dictionary of the names to the values found at their paths.
+        """
+        # ijson describes the position of each event as a dotted prefix of map keys.
+        names_by_prefix = dict((".".join(path), name) for name, path in paths.items())
+        projection = {}
+
+        builder = None
+        building_name = None
+        depth = 0
+
+        for prefix, event, value in ijson.parse(io.BytesIO(content), use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+
+                if event in ('start_map', 'start_array'):
+                    depth += 1
+                elif event in ('end_map', 'end_array'):
+                    depth -= 1
+
+                if depth == 0:
+                    projection[building_name] = builder.value
+                    builder = None
+
+            elif prefix in names_by_prefix and event != 'map_key':
+                if event in ('start_map', 'start_array'):
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                    building_name = names_by_prefix[prefix]
+                    depth = 1
+                else:
+                    projection[names_by_prefix[prefix]] = value
+
+            if builder is None and len(projection) == len(paths):
+                return projection
+
+        missing_paths = [".".join(path) for name, path in paths.items() if name not in projection]
+        raise Exception("Instagram response is missing {}".format(", ".join(missing_paths)))
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import time
+
+
+class SessionStateStore:
+    """
+    Persists the tokens scraped when bootstrapping an Instagram session, along with the session's cookies, to a JSON
+    file on disk. Later runs reuse them until they expire, instead of downloading and scraping the Instagram homepage
+    again.
+    """
+
+    default_path = os.path.join(os.path.expanduser('~'), '.igcli', 'session.json')
+
+    # Seconds a bootstrapped session is reused for
+    default_ttl = 6 * 60 * 60
+
+    def __init__(self, path=default_path, ttl=default_ttl):
+        """
+        Initialization.
+
+        Args:
+            path: The location of the state file on disk.
+            ttl: The number of seconds after it was saved that the state expires.
+        """
+        self.path = path
+        self.ttl = ttl
+
+    def load(self):
+        """
+        Loads the saved session state.
+
+        Returns:
+            A dictionary of the `rhx_gis` and `csrf_token_cookie` tokens, and a dictionary of `cookies`. None if no
+            state has been saved, or the saved state has expired or cannot be read.
+        """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() >= state.get('expires_at_timestamp', 0):
+            return None
+
+        return state
+
+    def save(self, rhx_gis, csrf_token_cookie, cookies):
+        """
+        Saves the session state, replacing any previous state. The file is only readable by the current user, as it
+        contains session cookies.
+
+        Args:
+            rhx_gis: The rhx_gis token scraped from the Instagram homepage.
+            csrf_token_cookie: The value of the csrftoken cookie.
+            cookies: A dictionary of the session's cookies.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Each save writes to a temporary file of its own, readable only by the current user, so that processes
+        # sharing the session state never write to, or replace the state with, each other's half-written files
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=directory or '.', prefix=os.path.basename(self.path) + '.', suffix='.tmp'
+        )
+
+        try:
+            with os.fdopen(descriptor, 'w') as f:
+                json.dump({
+                    'rhx_gis': rhx_gis,
+                    'csrf_token_cookie': csrf_token_cookie,
+                    'cookies': cookies,
+                    'expires_at_timestamp': time.time() + self.ttl
+                }, f)
+
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    def clear(self):
+        """
+        Removes the saved session state, if any.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
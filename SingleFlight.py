@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class Flight:
+    """
+    A call in progress, which other callers with the same key wait on.
+    """
+
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical calls. While a call for a key is in flight, further calls for the same key wait for it and
+    share its result, rather than repeating it. Optionally, results are also remembered once the call completes, so
+    that repeated calls later on are answered without being made at all, for as long as they are fresh.
+    """
+
+    def __init__(self, remember=False, max_remembered=100000, ttl=None):
+        """
+        Initialization.
+
+        Args:
+            remember: Whether to remember the results of completed calls.
+            max_remembered: The maximum number of results remembered. Beyond this, the least recently used results are
+                forgotten.
+            ttl: The number of seconds a result is remembered for. Defaults to remembering results until they are
+                forgotten to make room, or cleared.
+        """
+        self.remember = remember
+        self.max_remembered = max_remembered
+        self.ttl = ttl
+        self.flights = {}
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Calls fn, unless a call for the same key is already in flight, or has been remembered.
+
+        Args:
+            key: A hashable key identifying the call.
+            fn: A function of no arguments making the call.
+
+        Returns:
+            The result of the call.
+
+        Raises:
+            Exception: Whatever the call raised, to every caller sharing it. Failed calls are never remembered.
+        """
+        with self.lock:
+            if key in self.results:
+                result, remembered_at = self.results[key]
+
+                if self.ttl is None or time.monotonic() - remembered_at < self.ttl:
+                    self.results.move_to_end(key)
+                    return result
+
+                del self.results[key]
+
+            flight = self.flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self.flights[key] = Flight()
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+
+                if self.remember and flight.error is None:
+                    self.results[key] = (flight.result, time.monotonic())
+
+                    if len(self.results) > self.max_remembered:
+                        self.results.popitem(last=False)
+
+            flight.done.set()
+
+    def clear(self):
+        """
+        Forgets every remembered result.
+        """
+        with self.lock:
+            self.results.clear()
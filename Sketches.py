@@ -0,0 +1,390 @@
+import base64
+import hashlib
+import heapq
+import math
+import random
+
+
+class SpaceSaving:
+    """
+    Finds the most frequent items in a stream in fixed memory, with the Space-Saving algorithm. At most `capacity` items
+    are counted at once; once full, a new item takes the place of the least counted item, and inherits its count. Any
+    item counted more than `total / capacity` times is guaranteed to be among those counted, and each count is an
+    overestimate by at most that much.
+    """
+
+    def __init__(self, capacity):
+        """
+        Initialization.
+
+        Args:
+            capacity: The maximum number of items counted at once.
+        """
+        if capacity < 1:
+            raise Exception("capacity must be at least 1")
+
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        self.heap = []
+
+    @classmethod
+    def for_error(cls, error):
+        """
+        Args:
+            error: The largest overestimate of an item's count wanted, as a fraction of all items counted.
+
+        Returns:
+            A SpaceSaving sized to overestimate no count by more than error.
+        """
+        return cls(math.ceil(1 / error))
+
+    def update(self, item, weight=1):
+        """
+        Counts an item.
+
+        Args:
+            item: The item, which must be hashable and orderable against the other items.
+            weight: The number of times to count the item.
+        """
+        self.total += weight
+
+        if item in self.counts:
+            self.counts[item] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+        else:
+            minimum_item, minimum_count = self.minimum()
+            del self.counts[minimum_item]
+            del self.errors[minimum_item]
+            self.counts[item] = minimum_count + weight
+            self.errors[item] = minimum_count
+
+        heapq.heappush(self.heap, (self.counts[item], item))
+
+        # The heap holds an entry for every count an item has had, so is rebuilt once stale entries outnumber live ones
+        if len(self.heap) > self.capacity * 4:
+            self.heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def minimum(self):
+        """
+        Returns:
+            A tuple of the least counted item, and its count.
+        """
+        while True:
+            count, item = self.heap[0]
+
+            if self.counts.get(item) == count:
+                return item, count
+
+            heapq.heappop(self.heap)
+
+    def top(self, k):
+        """
+        Args:
+            k: The number of items to retrieve.
+
+        Returns:
+            A list of up to k (item, count) tuples, most counted first, with ties broken by item.
+        """
+        return heapq.nsmallest(k, self.counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def merge(self, other):
+        """
+        Merges in the counts of another SpaceSaving of the same capacity, such as one filled by another worker.
+
+        Args:
+            other: The other SpaceSaving.
+        """
+        # An item missing from a full summary may have been counted up to that summary's minimum count
+        own_floor = self.minimum()[1] if len(self.counts) >= self.capacity else 0
+        other_floor = other.minimum()[1] if len(other.counts) >= other.capacity else 0
+
+        counts = {}
+        errors = {}
+
+        for item in set(self.counts) | set(other.counts):
+            counts[item] = self.counts.get(item, own_floor) + other.counts.get(item, other_floor)
+            errors[item] = self.errors.get(item, own_floor) + other.errors.get(item, other_floor)
+
+        kept = heapq.nlargest(self.capacity, counts.items(), key=lambda item: item[1])
+
+        self.total += other.total
+        self.counts = dict(kept)
+        self.errors = dict((item, errors[item]) for item, _ in kept)
+        self.heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self.heap)
+
+    def state(self):
+        """
+        Returns:
+            The summary, as a dictionary which can be serialized to JSON, and restored with `from_state`.
+        """
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'counts': [[item, count, self.errors[item]] for item, count in self.counts.items()]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Args:
+            state: The summary, as returned by `state`.
+
+        Returns:
+            The SpaceSaving.
+        """
+        summary = cls(state['capacity'])
+        summary.total = state['total']
+
+        for item, count, error in state['counts']:
+            summary.counts[item] = count
+            summary.errors[item] = error
+
+        summary.heap = [(count, item) for item, count in summary.counts.items()]
+        heapq.heapify(summary.heap)
+        return summary
+
+
+class HyperLogLog:
+    """
+    Estimates the number of distinct items in a stream in fixed memory, with HyperLogLog. Memory is `2 ** precision`
+    bytes, and the standard error of the estimate is `1.04 / sqrt(2 ** precision)`.
+    """
+
+    def __init__(self, precision=14):
+        """
+        Initialization.
+
+        Args:
+            precision: The number of bits of each item's hash used to choose its register, from 4 to 18.
+        """
+        if not 4 <= precision <= 18:
+            raise Exception("precision must be between 4 and 18")
+
+        self.precision = precision
+        self.registers = bytearray(2 ** precision)
+
+    @classmethod
+    def for_error(cls, error):
+        """
+        Args:
+            error: The standard error of the estimate wanted, as a fraction of the number of distinct items.
+
+        Returns:
+            A HyperLogLog of the smallest precision with at most that standard error.
+        """
+        return cls(min(max(math.ceil(math.log2((1.04 / error) ** 2)), 4), 18))
+
+    def add(self, item):
+        """
+        Counts an item.
+
+        Args:
+            item: The item, which is hashed by its string representation.
+        """
+        hashed = int.from_bytes(hashlib.blake2b(str(item).encode('utf-8'), digest_size=8).digest(), 'big')
+        remaining_bits = 64 - self.precision
+        register = hashed >> remaining_bits
+        rank = remaining_bits - (hashed & ((1 << remaining_bits) - 1)).bit_length() + 1
+
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def count(self):
+        """
+        Returns:
+            The estimated number of distinct items counted.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+
+        # Few distinct items leave many registers empty, for which linear counting is more accurate
+        empty_registers = self.registers.count(0)
+        if estimate <= 2.5 * m and empty_registers:
+            estimate = m * math.log(m / empty_registers)
+
+        return int(round(estimate))
+
+    def merge(self, other):
+        """
+        Merges in the items counted by another HyperLogLog of the same precision.
+
+        Args:
+            other: The other HyperLogLog.
+        """
+        if other.precision != self.precision:
+            raise Exception("Only HyperLogLogs of the same precision can be merged")
+
+        self.registers = bytearray(max(pair) for pair in zip(self.registers, other.registers))
+
+    def state(self):
+        """
+        Returns:
+            The sketch, as a dictionary which can be serialized to JSON, and restored with `from_state`.
+        """
+        return {
+            'precision': self.precision,
+            'registers': base64.b64encode(bytes(self.registers)).decode('ascii')
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Args:
+            state: The sketch, as returned by `state`.
+
+        Returns:
+            The HyperLogLog.
+        """
+        sketch = cls(state['precision'])
+        sketch.registers = bytearray(base64.b64decode(state['registers']))
+        return sketch
+
+
+class KllSketch:
+    """
+    Estimates quantiles of a stream of values in fixed memory, with a KLL sketch. Values are held in a hierarchy of
+    compactors; when a compactor fills, it is sorted and every other value promoted to the next, where each value stands
+    for twice as many. With k of 200, ranks are estimated to within about 1.65% of the number of values, and the error
+    shrinks in proportion to k.
+    """
+
+    def __init__(self, k=200):
+        """
+        Initialization.
+
+        Args:
+            k: The capacity of the top compactor. Larger is more accurate, and uses proportionately more memory.
+        """
+        if k < 8:
+            raise Exception("k must be at least 8")
+
+        self.k = k
+        self.count = 0
+        self.compactors = [[]]
+
+    @classmethod
+    def for_error(cls, error):
+        """
+        Args:
+            error: The rank error wanted, as a fraction of the number of values.
+
+        Returns:
+            A KllSketch sized to estimate ranks to within roughly that error.
+        """
+        return cls(max(math.ceil(3.3 / error), 8))
+
+    def capacity(self, level):
+        """
+        Args:
+            level: The level of a compactor, 0 being the lowest.
+
+        Returns:
+            The number of values the compactor holds before it is compacted. Lower compactors are smaller.
+        """
+        depth = len(self.compactors) - level - 1
+        return max(math.ceil(self.k * (2 / 3) ** depth), 2)
+
+    def add(self, value):
+        """
+        Adds a value to the sketch.
+
+        Args:
+            value: The numeric value.
+        """
+        self.compactors[0].append(value)
+        self.count += 1
+
+        if len(self.compactors[0]) >= self.capacity(0):
+            self.compress()
+
+    def compress(self):
+        """
+        Compacts every compactor that has filled up, promoting half its values to the level above.
+        """
+        level = 0
+
+        while level < len(self.compactors):
+            if len(self.compactors[level]) >= self.capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+
+                values = sorted(self.compactors[level])
+
+                # An odd value out stays behind, so that the total weight of the sketch is preserved exactly
+                self.compactors[level] = [values.pop()] if len(values) % 2 else []
+                self.compactors[level + 1].extend(values[random.randint(0, 1)::2])
+
+            level += 1
+
+    def merge(self, other):
+        """
+        Merges in the values of another KllSketch, such as one filled by another worker.
+
+        Args:
+            other: The other KllSketch.
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+
+        for level, values in enumerate(other.compactors):
+            self.compactors[level].extend(values)
+
+        self.count += other.count
+        self.compress()
+
+    def quantile(self, q):
+        """
+        Args:
+            q: The quantile, from 0 to 1.
+
+        Returns:
+            An estimate of the value at quantile q, or None if no values have been added.
+        """
+        if self.count == 0:
+            return None
+
+        weighted_values = sorted(
+            (value, 2 ** level) for level, values in enumerate(self.compactors) for value in values
+        )
+        target = q * (self.count - 1)
+        seen = 0
+
+        for value, weight in weighted_values:
+            seen += weight
+
+            if seen > target:
+                return value
+
+        return weighted_values[-1][0]
+
+    def state(self):
+        """
+        Returns:
+            The sketch, as a dictionary which can be serialized to JSON, and restored with `from_state`.
+        """
+        return {
+            'k': self.k,
+            'count': self.count,
+            'compactors': self.compactors
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Args:
+            state: The sketch, as returned by `state`.
+
+        Returns:
+            The KllSketch.
+        """
+        sketch = cls(state['k'])
+        sketch.count = state['count']
+        sketch.compactors = [list(values) for values in state['compactors']]
+        return sketch
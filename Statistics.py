@@ -0,0 +1,350 @@
+from collections import Counter
+from Sketches import KllSketch, SpaceSaving
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class RunningStatistics:
+    """
+    Computes summary statistics over a stream of values in a single pass: the count, sum, mean, median, mode, and the
+    smallest and largest values along with the items they belong to. Rather than retaining every value, a frequency
+    table of the distinct values seen is kept, so memory grows with the number of distinct values rather than the number
+    of values. Like and hashtag counts repeat heavily, so this stays small even over millions of values.
+    """
+
+    def __init__(self):
+        """
+        Initialization.
+        """
+        self.count = 0
+        self.total = 0
+        self.frequencies = Counter()
+        self.minimum = None
+        self.minimum_item = None
+        self.maximum = None
+        self.maximum_item = None
+
+    def add(self, value, item=None):
+        """
+        Adds a value to the statistics.
+
+        Args:
+            value: The value to add.
+            item: An optional identifier of what the value belongs to, such as a post ID, which is reported if the value
+                turns out to be the smallest or largest.
+        """
+        self.count += 1
+        self.total += value
+        self.count_value(value)
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+            self.minimum_item = item
+
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+            self.maximum_item = item
+
+    def count_value(self, value):
+        """
+        Counts a value towards the distribution of values, from which the median, mode, and percentiles are found.
+
+        Args:
+            value: The value added.
+        """
+        self.frequencies[value] += 1
+
+    def quantile(self, q):
+        """
+        Args:
+            q: The quantile, from 0 to 1.
+
+        Returns:
+            The value at quantile q of the values added, as the nearest value at or below it, or None if no values have
+            been added.
+        """
+        if self.count == 0:
+            return None
+
+        target = q * (self.count - 1)
+        seen = 0
+
+        for value in sorted(self.frequencies):
+            seen += self.frequencies[value]
+
+            if seen > target:
+                return value
+
+    def median(self):
+        """
+        Returns:
+            The median of the values added, or None if no values have been added.
+        """
+        if self.count == 0:
+            return None
+
+        # The values either side of the middle of the sorted values; the same value when the count is odd.
+        lower_index = (self.count - 1) // 2
+        upper_index = self.count // 2
+        lower = None
+        seen = 0
+
+        for value in sorted(self.frequencies):
+            seen += self.frequencies[value]
+
+            if lower is None and seen > lower_index:
+                lower = value
+
+            if seen > upper_index:
+                return (lower + value) / 2
+
+    def mode(self):
+        """
+        Returns:
+            The most frequent of the values added, preferring the smallest value on a tie, or None if no values have
+            been added.
+        """
+        if self.count == 0:
+            return None
+
+        return min(self.frequencies.items(), key=lambda frequency: (-frequency[1], frequency[0]))[0]
+
+    def summary(self):
+        """
+        Returns:
+            A dictionary of the `count`, `sum`, `mean`, `median`, `mode`, `minimum`, and `maximum` of the values added.
+            `minimum` and `maximum` are dictionaries of the `value` and the `item` it belongs to. `percentiles` is a
+            dictionary of the 90th and 99th percentiles, as `p90` and `p99`. All but `count` and `sum` are None if no
+            values have been added.
+        """
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'median': self.median(),
+            'mode': self.mode(),
+            'percentiles': {'p90': self.quantile(0.9), 'p99': self.quantile(0.99)} if self.count else None,
+            'minimum': {'value': self.minimum, 'item': self.minimum_item} if self.count else None,
+            'maximum': {'value': self.maximum, 'item': self.maximum_item} if self.count else None
+        }
+
+    def merge(self, other):
+        """
+        Merges in the statistics of other values, such as those gathered by another worker.
+
+        Args:
+            other: The statistics of the other values, of the same class.
+        """
+        if other.count == 0:
+            return
+
+        if self.count == 0 or other.minimum < self.minimum:
+            self.minimum, self.minimum_item = other.minimum, other.minimum_item
+
+        if self.count == 0 or other.maximum > self.maximum:
+            self.maximum, self.maximum_item = other.maximum, other.maximum_item
+
+        self.count += other.count
+        self.total += other.total
+        self.merge_values(other)
+
+    def merge_values(self, other):
+        """
+        Merges in the distribution of other values, as per `merge`.
+
+        Args:
+            other: The statistics of the other values.
+        """
+        self.frequencies.update(other.frequencies)
+
+    def state(self):
+        """
+        Returns:
+            The statistics gathered so far, as a dictionary which can be serialized to JSON, and restored with
+            `from_state`.
+        """
+        return {
+            'count': self.count,
+            'total': self.total,
+            'frequencies': list(self.frequencies.items()),
+            'minimum': [self.minimum, self.minimum_item],
+            'maximum': [self.maximum, self.maximum_item]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restores statistics gathered previously, so that more values can be added to them.
+
+        Args:
+            state: The statistics, as returned by `state`.
+
+        Returns:
+            The RunningStatistics.
+        """
+        statistics = cls()
+        statistics.count = state['count']
+        statistics.total = state['total']
+        statistics.frequencies = Counter(dict((value, frequency) for value, frequency in state['frequencies']))
+        statistics.minimum, statistics.minimum_item = state['minimum']
+        statistics.maximum, statistics.maximum_item = state['maximum']
+        return statistics
+
+    @classmethod
+    def summarize(cls, values, items=None):
+        """
+        Computes summary statistics over values which are already in memory. Vectorized with NumPy if it is installed,
+        otherwise the values are streamed through a RunningStatistics.
+
+        Args:
+            values: A sequence of numeric values, such as a column of a MediaBatch.
+            items: An optional sequence of identifiers, parallel to values.
+
+        Returns:
+            A dictionary formatted as per `summary`.
+        """
+        if numpy is None:
+            statistics = cls()
+
+            for index, value in enumerate(values):
+                statistics.add(value, items[index] if items is not None else None)
+
+            return statistics.summary()
+
+        values = numpy.asarray(values)
+
+        if len(values) == 0:
+            return cls().summary()
+
+        distinct_values, frequencies = numpy.unique(values, return_counts=True)
+        minimum_index = int(numpy.argmin(values))
+        maximum_index = int(numpy.argmax(values))
+
+        # Percentiles are the nearest value at or below, as per `RunningStatistics.quantile`
+        sorted_values = numpy.sort(values)
+
+        return {
+            'count': len(values),
+            'sum': values.sum().item(),
+            'mean': values.mean().item(),
+            'median': numpy.median(values).item(),
+            'mode': distinct_values[numpy.argmax(frequencies)].item(),
+            'percentiles': {
+                'p90': sorted_values[int(0.9 * (len(values) - 1))].item(),
+                'p99': sorted_values[int(0.99 * (len(values) - 1))].item()
+            },
+            'minimum': {
+                'value': values[minimum_index].item(),
+                'item': items[minimum_index] if items is not None else None
+            },
+            'maximum': {
+                'value': values[maximum_index].item(),
+                'item': items[maximum_index] if items is not None else None
+            }
+        }
+
+
+class ApproximateStatistics(RunningStatistics):
+    """
+    Computes the same summary statistics as RunningStatistics, in fixed memory however many distinct values there are.
+    The count, sum, mean, and smallest and largest values are exact. The median and percentiles are estimated with a KLL
+    sketch, to within `error` of the number of values in rank, and the mode with a Space-Saving summary. Statistics
+    gathered by parallel workers can be merged.
+    """
+
+    def __init__(self, error=0.01):
+        """
+        Initialization.
+
+        Args:
+            error: The error of the estimates, as a fraction of the number of values.
+        """
+        super().__init__()
+        self.error = error
+        self.frequencies = None
+        self.quantiles = KllSketch.for_error(error)
+        self.frequent_values = SpaceSaving.for_error(error)
+
+    def count_value(self, value):
+        """
+        Counts a value towards the sketches of the distribution of values.
+
+        Args:
+            value: The value added.
+        """
+        self.quantiles.add(value)
+        self.frequent_values.update(value)
+
+    def quantile(self, q):
+        """
+        Args:
+            q: The quantile, from 0 to 1.
+
+        Returns:
+            An estimate of the value at quantile q of the values added, or None if no values have been added.
+        """
+        return self.quantiles.quantile(q)
+
+    def median(self):
+        """
+        Returns:
+            An estimate of the median of the values added, or None if no values have been added.
+        """
+        return self.quantile(0.5)
+
+    def mode(self):
+        """
+        Returns:
+            An estimate of the most frequent of the values added, or None if no values have been added.
+        """
+        top = self.frequent_values.top(1)
+        return top[0][0] if top else None
+
+    def merge_values(self, other):
+        """
+        Merges in the sketches of other values, as per `merge`.
+
+        Args:
+            other: The statistics of the other values.
+        """
+        self.quantiles.merge(other.quantiles)
+        self.frequent_values.merge(other.frequent_values)
+
+    def state(self):
+        """
+        Returns:
+            The statistics gathered so far, as a dictionary which can be serialized to JSON, and restored with
+            `from_state`.
+        """
+        return {
+            'error': self.error,
+            'count': self.count,
+            'total': self.total,
+            'quantiles': self.quantiles.state(),
+            'frequent_values': self.frequent_values.state(),
+            'minimum': [self.minimum, self.minimum_item],
+            'maximum': [self.maximum, self.maximum_item]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Restores statistics gathered previously, so that more values can be added to them, or they can be merged.
+
+        Args:
+            state: The statistics, as returned by `state`.
+
+        Returns:
+            The ApproximateStatistics.
+        """
+        statistics = cls(state['error'])
+        statistics.count = state['count']
+        statistics.total = state['total']
+        statistics.quantiles = KllSketch.from_state(state['quantiles'])
+        statistics.frequent_values = SpaceSaving.from_state(state['frequent_values'])
+        statistics.minimum, statistics.minimum_item = state['minimum']
+        statistics.maximum, statistics.maximum_item = state['maximum']
+        return statistics
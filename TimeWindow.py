@@ -0,0 +1,153 @@
+import datetime
+import re
+import time
+from Opt import Opt
+
+
+class TimeWindow:
+    """
+    Bounds which of a user's posts are analysed: those posted within a window of time, optionally only the most recent
+    few of them. Timelines arrive newest first, so once a post older than the window, or the last post within the limit,
+    has been seen, there is nothing more to fetch.
+    """
+
+    # Units of relative times, such as `30d`, in seconds
+    units = {
+        's': 1,
+        'm': 60,
+        'h': 60 * 60,
+        'd': 24 * 60 * 60,
+        'w': 7 * 24 * 60 * 60
+    }
+
+    def __init__(self, since=None, until=None, limit=None):
+        """
+        Initialization.
+
+        Args:
+            since: The earliest timestamp of posts within the window, inclusive. Defaults to no bound.
+            until: The timestamp posts within the window must be posted before, exclusive. Defaults to no bound.
+            limit: The maximum number of posts within the window, the most recent first. Defaults to no limit.
+        """
+        if limit is not None and limit < 0:
+            raise Exception("The post limit cannot be negative")
+
+        self.since = since
+        self.until = until
+        self.limit = limit
+
+    @classmethod
+    def from_options(cls, options):
+        """
+        Creates the window a tool was asked to analyse, with `-rpl <count>`, `-since <time>`, and `-until <time>`.
+
+        Args:
+            options: The options the tool was run with.
+
+        Returns:
+            The TimeWindow, or None if the tool was asked to analyse every post.
+        """
+        if not {Opt.RecentPostLimit, Opt.Since, Opt.Until} & set(options.keys()):
+            return None
+
+        return cls(
+            since=cls.parse_time(options[Opt.Since]) if Opt.Since in options else None,
+            until=cls.parse_time(options[Opt.Until]) if Opt.Until in options else None,
+            limit=int(options[Opt.RecentPostLimit]) if Opt.RecentPostLimit in options else None
+        )
+
+    @classmethod
+    def parse_time(cls, value):
+        """
+        Interprets a time given as an option.
+
+        Args:
+            value: A Unix timestamp, such as `1530000000`, an ISO 8601 date or time in local time, such as `2018-06-26`,
+                or a time relative to now, such as `30d` for thirty days ago, in `s`, `m`, `h`, `d`, or `w`.
+
+        Returns:
+            The time as a Unix timestamp.
+
+        Raises:
+            Exception: If the value is not recognised.
+        """
+        if re.fullmatch(r'\d+', value):
+            return int(value)
+
+        relative_match = re.fullmatch(r'(?P<amount>\d+)(?P<unit>[smhdw])', value)
+        if relative_match:
+            return int(time.time()) - int(relative_match.group('amount')) * cls.units[relative_match.group('unit')]
+
+        try:
+            return int(datetime.datetime.fromisoformat(value).timestamp())
+        except ValueError:
+            raise Exception("Please provide a time as a timestamp, a date such as 2018-06-26, or such as 30d, "
+                            "not {}".format(value))
+
+    def reduced_by(self, count):
+        """
+        Args:
+            count: The number of posts within the window already analysed.
+
+        Returns:
+            The window left once count posts have been analysed, such as when resuming a crawl.
+        """
+        return TimeWindow(self.since, self.until, max(self.limit - count, 0) if self.limit is not None else None)
+
+    def page_size(self, count, selected, oldest=None):
+        """
+        Args:
+            count: The largest page size wanted.
+            selected: The number of posts selected so far.
+            oldest: The timestamp of the oldest post seen so far, selected or not, or None if none have been seen.
+
+        Returns:
+            The number of posts to request in the next page, so that a small limit does not fetch more than it needs.
+            Pages are only made smaller once paging has passed `until`, as until then the posts it skips are not
+            counted against the limit.
+        """
+        if self.limit is None:
+            return count
+
+        if self.until is not None and (oldest is None or oldest >= self.until):
+            return count
+
+        return max(min(count, self.limit - selected), 0)
+
+    def select(self, records, selected):
+        """
+        Selects the posts within the window from a page of a timeline.
+
+        Args:
+            records: The page, as a list of MediaRecords, newest first.
+            selected: The number of posts selected from previous pages.
+
+        Returns:
+            A tuple of the list of MediaRecords within the window, and whether the window has been exhausted, in which
+            case no later page holds any posts within it.
+        """
+        selected_records = []
+
+        for record in records:
+            if self.since is not None and record.created_at_timestamp < self.since:
+                return selected_records, True
+
+            if self.until is not None and record.created_at_timestamp >= self.until:
+                continue
+
+            selected_records.append(record)
+
+            if self.limit is not None and selected + len(selected_records) >= self.limit:
+                return selected_records, True
+
+        return selected_records, False
+
+    def contains(self, timestamp):
+        """
+        Args:
+            timestamp: The timestamp a post was posted at.
+
+        Returns:
+            Whether the post falls within the window's bounds of time. The limit is not taken into account.
+        """
+        return (self.since is None or timestamp >= self.since) and (self.until is None or timestamp < self.until)
@@ -0,0 +1,68 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter. Tokens are replenished at a steady `rate` per second, up to a maximum of
+    `capacity` tokens, and each request to Instagram consumes a single token. Shared between workers so that the
+    combined request rate of a concurrent crawl never exceeds `rate`.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        Initialization.
+
+        Args:
+            rate: The number of tokens replenished per second.
+            capacity: The maximum number of tokens the bucket can hold, i.e. the largest burst of requests permitted.
+        """
+        if rate <= 0:
+            raise Exception("rate must be greater than 0")
+
+        if capacity < 1:
+            raise Exception("capacity must be at least 1")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        """
+        Tops up the bucket with the tokens accrued since the last refill. Must be called with the lock held.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def set_rate(self, rate):
+        """
+        Changes the rate tokens are replenished at, from now on.
+
+        Args:
+            rate: The number of tokens replenished per second.
+        """
+        if rate <= 0:
+            raise Exception("rate must be greater than 0")
+
+        with self.lock:
+            self.refill()
+            self.rate = float(rate)
+
+    def acquire(self):
+        """
+        Blocks until a token is available, then consumes it.
+        """
+        while True:
+            with self.lock:
+                self.refill()
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
@@ -0,0 +1,160 @@
+import bisect
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSearchIndex:
+    """
+    An in-memory cache of user search results, indexed by query. Interactive lookups tend to send the same queries again
+    and again as the user edits what they typed, so a query whose results are already known is answered locally.
+
+    Optionally, a longer query, such as "food" after "foo", is also answered by narrowing down the results of a shorter
+    query, through a prefix index over every user they have turned up. The narrowed results are the users among them
+    whose username, or a word of whose full name, starts with the query, in the order Instagram ranked them. Instagram's
+    search is fuzzy, and does not promise to return every user matching a query, even when it returns fewer than
+    `max_results`, so narrowed results may leave out users Instagram itself would have found. Narrowing is therefore off
+    unless asked for.
+    """
+
+    # The number of results Instagram returns a search at most, beyond which other matching users were certainly left out
+    max_results = 50
+
+    def __init__(self, ttl=15 * 60, max_queries=10000, max_users=100000, narrow=False):
+        """
+        Initialization.
+
+        Args:
+            ttl: The number of seconds the results of a query are considered fresh for.
+            max_queries: The maximum number of queries whose results are remembered. Beyond this, the least recently
+                used queries are forgotten.
+            max_users: The maximum number of users indexed. Beyond this, the index is emptied and starts afresh.
+            narrow: Whether to answer queries by narrowing down the results of a shorter query, at the risk of leaving
+                out users Instagram would have found.
+        """
+        self.ttl = ttl
+        self.max_queries = max_queries
+        self.max_users = max_users
+        self.narrow = narrow
+        self.queries = OrderedDict()
+        self.users = {}
+        self.prefixes = []
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query):
+        """
+        Normalizes a query, ignoring surrounding whitespace and case.
+
+        Args:
+            query: The search query.
+
+        Returns:
+            The normalized query.
+        """
+        return ' '.join(query.split()).casefold()
+
+    @staticmethod
+    def prefix_keys(user):
+        """
+        Args:
+            user: A user, as returned by `InstagramDataService.users_search`.
+
+        Returns:
+            The normalized strings the user is indexed under: their username, and each word of their full name.
+        """
+        keys = {(user.get('username') or '').casefold()}
+        keys.update(word.casefold() for word in (user.get('full_name') or '').split())
+        keys.discard('')
+        return keys
+
+    def search(self, query):
+        """
+        Answers a query from the results of a previous identical query, or if narrowing, of a shorter query.
+
+        Args:
+            query: The normalized search query.
+
+        Returns:
+            A list of users, copied so that callers are free to modify them, or None if the query cannot be answered
+            locally.
+        """
+        with self.lock:
+            now = time.monotonic()
+            entry = self.queries.get(query)
+
+            if entry is not None and now - entry['fetched_at'] < self.ttl:
+                self.queries.move_to_end(query)
+                return copy.deepcopy([self.users[user_id] for user_id in entry['ids']])
+
+            # Narrowing by prefix only makes sense for a single word
+            if not self.narrow or ' ' in query:
+                return None
+
+            for length in range(len(query) - 1, 0, -1):
+                parent = self.queries.get(query[:length])
+
+                if parent is None or now - parent['fetched_at'] >= self.ttl or len(parent['ids']) >= self.max_results:
+                    continue
+
+                matching_ids = self.matching_ids(query)
+                return copy.deepcopy([self.users[user_id] for user_id in parent['ids'] if user_id in matching_ids])
+
+            return None
+
+    def matching_ids(self, query):
+        """
+        Looks up the users indexed under a key starting with a query. Must be called with the lock held.
+
+        Args:
+            query: The normalized search query.
+
+        Returns:
+            A set of user IDs.
+        """
+        matching_ids = set()
+        index = bisect.bisect_left(self.prefixes, (query,))
+
+        while index < len(self.prefixes) and self.prefixes[index][0].startswith(query):
+            matching_ids.add(self.prefixes[index][1])
+            index += 1
+
+        return matching_ids
+
+    def add(self, query, users):
+        """
+        Remembers the results of a query, and indexes the users in them.
+
+        Args:
+            query: The normalized search query.
+            users: The users Instagram returned for the query, in the order ranked, each with an `id`. Copies are kept,
+                so that callers are free to modify them.
+        """
+        with self.lock:
+            if len(self.users) + len(users) > self.max_users:
+                self.queries.clear()
+                self.users.clear()
+                self.prefixes = []
+
+            for user in users:
+                # The most recent details of a user are kept, and indexed, however many queries they have turned up in
+                keys = self.prefix_keys(user)
+                indexed_keys = self.prefix_keys(self.users[user['id']]) if user['id'] in self.users else set()
+
+                for key in indexed_keys - keys:
+                    del self.prefixes[bisect.bisect_left(self.prefixes, (key, user['id']))]
+
+                for key in keys - indexed_keys:
+                    bisect.insort(self.prefixes, (key, user['id']))
+
+                self.users[user['id']] = copy.deepcopy(user)
+
+            self.queries[query] = {
+                'ids': [user['id'] for user in users],
+                'fetched_at': time.monotonic()
+            }
+            self.queries.move_to_end(query)
+
+            if len(self.queries) > self.max_queries:
+                self.queries.popitem(last=False)
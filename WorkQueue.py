@@ -0,0 +1,217 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+class WorkQueue:
+    """
+    A persistent, SQLite-backed queue of work shared between processes, on one host or on several hosts sharing a
+    filesystem. Each item is identified by a key. Workers lease items, so that no two workers hold the same item at once,
+    then acknowledge them with their result once done. Items whose work failed are retried, up to `max_attempts` times
+    in all, and items leased by a worker which died are handed out again once their lease expires.
+
+    SQLite relies on file locking to keep the queue consistent, which some network filesystems do not implement
+    reliably; on those, keep the queue on a local disk and run the workers on a single host.
+    """
+
+    default_path = os.path.join(os.path.expanduser('~'), '.igcli', 'queue.sqlite3')
+
+    def __init__(self, path=default_path, lease_seconds=300, max_attempts=3):
+        """
+        Initialization. Opens, and if necessary creates, the queue database at `path`.
+
+        Args:
+            path: The location of the SQLite database on disk.
+            lease_seconds: The number of seconds a worker holds an item for, before it may be handed to another worker.
+            max_attempts: The number of times an item is attempted before it is given up on as failed.
+        """
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = '{}:{}:{}'.format(socket.gethostname(), os.getpid(), id(self))
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Transactions are begun explicitly, so that leasing can take the database's write lock before reading.
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS items ('
+            'key TEXT PRIMARY KEY, '
+            'value TEXT NOT NULL, '
+            'state TEXT NOT NULL, '
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'lease_owner TEXT, '
+            'lease_expires_at REAL, '
+            'result TEXT, '
+            'error TEXT, '
+            'position INTEGER NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS items_state ON items (state, position)')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS claims ('
+            'name TEXT PRIMARY KEY, '
+            'worker_id TEXT NOT NULL)'
+        )
+
+    def enqueue(self, items):
+        """
+        Adds items to the queue. Items already in the queue, in whatever state, are left as they are, so every worker
+        can safely enqueue the same items. Adding any new item releases every claim, as the tasks claimed were for the
+        queue's previous contents.
+
+        Args:
+            items: An iterable of (key, value) tuples, where value is a string.
+        """
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+
+            try:
+                position = self.connection.execute('SELECT COALESCE(MAX(position), 0) FROM items').fetchone()[0]
+                inserted = 0
+
+                for key, value in items:
+                    position += 1
+                    inserted += self.connection.execute(
+                        "INSERT OR IGNORE INTO items (key, value, state, position) VALUES (?, ?, 'pending', ?)",
+                        (key, value, position)
+                    ).rowcount
+
+                if inserted:
+                    self.connection.execute('DELETE FROM claims')
+
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    def lease(self, count):
+        """
+        Leases items to this worker, in the order they were enqueued: pending items first, then items whose lease has
+        expired.
+
+        Args:
+            count: The maximum number of items to lease.
+
+        Returns:
+            A list of (key, value) tuples, empty if there is nothing left to lease.
+        """
+        now = time.time()
+
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+
+            try:
+                # Items whose every attempt was leased by a worker which died are given up on, like any other failure
+                self.connection.execute(
+                    "UPDATE items SET state = 'failed', error = 'Lease expired', lease_owner = NULL, "
+                    "lease_expires_at = NULL WHERE state = 'leased' AND lease_expires_at < ? AND attempts >= ?",
+                    (now, self.max_attempts)
+                )
+
+                rows = self.connection.execute(
+                    "SELECT key, value FROM items WHERE state = 'pending' "
+                    "OR (state = 'leased' AND lease_expires_at < ?) ORDER BY position LIMIT ?",
+                    (now, count)
+                ).fetchall()
+
+                self.connection.executemany(
+                    "UPDATE items SET state = 'leased', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1 "
+                    "WHERE key = ?",
+                    [(self.worker_id, now + self.lease_seconds, key) for key, _ in rows]
+                )
+
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+
+        return rows
+
+    def ack(self, key, result):
+        """
+        Records an item leased to this worker as done. If the lease expired and the item was handed to another worker
+        in the meantime, the first result recorded wins.
+
+        Args:
+            key: The key of the item.
+            result: The result of the item's work, which must be serializable to JSON.
+        """
+        with self.lock:
+            self.connection.execute(
+                "UPDATE items SET state = 'done', result = ?, lease_owner = NULL, lease_expires_at = NULL "
+                "WHERE key = ? AND state != 'done'",
+                (json.dumps(result), key)
+            )
+
+    def fail(self, key, error, retry=True):
+        """
+        Records that the work of an item leased to this worker failed. The item is returned to the queue to be retried,
+        unless it has been attempted `max_attempts` times already, or is not worth retrying, in which case it is given
+        up on.
+
+        Args:
+            key: The key of the item.
+            error: A description of why the work failed.
+            retry: False if the work would fail again however many times it was retried.
+        """
+        with self.lock:
+            self.connection.execute(
+                "UPDATE items SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, "
+                "lease_owner = NULL, lease_expires_at = NULL WHERE key = ? AND lease_owner = ? AND state = 'leased'",
+                (self.max_attempts if retry else 0, str(error), key, self.worker_id)
+            )
+
+    def claim(self, name):
+        """
+        Claims a task which only one of the workers sharing the queue should carry out, such as reporting its results.
+        A claim lasts until new items are added to the queue, after which the task may be claimed again.
+
+        Args:
+            name: The name of the task.
+
+        Returns:
+            True if this worker is the first to claim the task, and should carry it out.
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                'INSERT OR IGNORE INTO claims (name, worker_id) VALUES (?, ?)', (name, self.worker_id)
+            )
+
+        return cursor.rowcount == 1
+
+    def counts(self):
+        """
+        Returns:
+            A dictionary of the number of items in each state: 'pending', 'leased', 'done', and 'failed'.
+        """
+        with self.lock:
+            rows = self.connection.execute('SELECT state, COUNT(*) FROM items GROUP BY state').fetchall()
+
+        return dict({'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}, **dict(rows))
+
+    def results(self):
+        """
+        Returns:
+            A list of (key, result) tuples for every item done, in the order they were enqueued.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT key, result FROM items WHERE state = 'done' ORDER BY position"
+            ).fetchall()
+
+        return [(key, json.loads(result)) for key, result in rows]
+
+    def failures(self):
+        """
+        Returns:
+            A list of (value, error) tuples for every item given up on, in the order they were enqueued.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT value, error FROM items WHERE state = 'failed' ORDER BY position"
+            ).fetchall()
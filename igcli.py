@@ -1,6 +1,16 @@
+import os
 import sys
+import socket
+import contextlib
 import importlib
 from InstagramDataService import InstagramDataService
+from ResponseCache import ResponseCache
+from SessionStateStore import SessionStateStore
+from AdaptiveThrottle import AdaptiveThrottle
+from Profiler import Profiler
+from MediaExporter import MediaExporter
+from UserSearchIndex import UserSearchIndex
+from HashtagIndex import HashtagIndex
 from Opt import Opt
 
 
@@ -15,7 +25,10 @@ def get_toolkit():
     Returns:
         A set of the tools available.
     """
-    return {'like-analysis', 'caption-hashtag-count-preview', 'hashtag-analysis', 'user-scoreboard'}
+    return {
+        'like-analysis', 'caption-hashtag-count-preview', 'hashtag-analysis', 'user-scoreboard', 'hashtag-query',
+        'user-search'
+    }
 
 
 def get_opts(argv):
@@ -38,17 +51,49 @@ def get_opts(argv):
     else:
         raise Exception("Please provide one of the following igcli tools as the first parameter: {}", get_toolkit())
 
-    argv = argv[2:]
+    opts.update(parse_options(argv[2:]))
+
+    return opts
+
+
+def parse_options(argv):
+    """
+    Parses a list of options and their values.
+
+    Args:
+        argv: A list of arguments, alternating between an option such as `-u`, and its value.
+
+    Returns:
+        A dictionary of Opt keys to the values provided for them.
+    """
+    opts = {}
 
     while argv:
         if argv[0][0] == "-":
-            # Lookup name of option enum by value provided
+            # Lookup name of option enum by value provided. The value is consumed along with the option, so that values
+            # which themselves start with a dash, such as `-file -`, are not mistaken for options.
             opts[Opt[Opt(argv[0]).name]] = argv[1]
-        argv = argv[1:]
+            argv = argv[2:]
+        else:
+            argv = argv[1:]
 
     return opts
 
 
+def parse_option_dict(options):
+    """
+    Parses options given as a dictionary, such as in a job sent to the daemon, or in a job file.
+
+    Args:
+        options: A dictionary of options such as `-u` to their values. Values which are not strings, such as numbers
+            in a JSON job file, are converted to strings, as if they had been given on the command line.
+
+    Returns:
+        A dictionary of Opt keys to the values provided for them.
+    """
+    return dict((Opt(flag), str(value)) for flag, value in options.items())
+
+
 def gather_opts(options, requirements):
     """
     Gathers the options requested by the tool to run, and ensures that all mandatory options requested by the calling
@@ -80,20 +125,177 @@ def gather_opts(options, requirements):
     return dict((opt_key, options[opt_key]) for opt_key in returned_opt_keys)
 
 
+def parse_flag(value):
+    """
+    Interprets the value of a yes/no option.
+
+    Args:
+        value: The value provided for the option.
+
+    Returns:
+        True if the value is one of 'yes', 'true', 'on', or '1', False if it is one of 'no', 'false', 'off', or '0'.
+
+    Raises:
+        Exception: If the value is not recognised.
+    """
+    if value.lower() in {'yes', 'true', 'on', '1'}:
+        return True
+
+    if value.lower() in {'no', 'false', 'off', '0'}:
+        return False
+
+    raise Exception("Please provide yes or no, not {}".format(value))
+
+
+def load_tool(tool):
+    """
+    Imports the class implementing a tool from the toolkit.
+
+    Args:
+        tool: The name of the tool, such as `like-analysis`.
+
+    Returns:
+        The class of the tool.
+    """
+    tool_name = tool.title().replace("-", "") + "Tool"
+    module_name = importlib.import_module("toolkit.{}".format(tool_name))
+    return getattr(module_name, tool_name)
+
+
+def build_data_service(opts, profiler=None, remembered_ttl=None):
+    """
+    Creates the InstagramDataService tools make requests through, configured by the options that apply to every tool.
+
+    Args:
+        opts: The options provided to igcli.
+        profiler: An optional Profiler to record requests with.
+        remembered_ttl: The number of seconds users and pages of timelines are remembered for, as per
+            InstagramDataService. Defaults to the life of the data service.
+
+    Returns:
+        The InstagramDataService.
+    """
+    # Responses are cached on disk between runs, unless the cache is bypassed with `-cache-mode bypass`
+    cache_mode = opts.get(Opt.CacheMode, 'use')
+    cache = None
+    if cache_mode != 'bypass':
+        cache = ResponseCache(opts.get(Opt.Cache, ResponseCache.default_path), mode=cache_mode)
+
+    # Repeated searches are answered from memory, unless the cache is bypassed. With `-narrow-searches yes`, so are
+    # longer queries whose results can be narrowed down from those of a shorter one.
+    search_index = None
+    if cache_mode != 'bypass':
+        search_index = UserSearchIndex(narrow=parse_flag(opts.get(Opt.NarrowSearches, 'no')))
+
+    # The bootstrapped session is reused between runs until it expires
+    session_store = SessionStateStore(opts.get(Opt.SessionState, SessionStateStore.default_path))
+
+    # Requests are made at up to -rate per second, slowing down when Instagram struggles, and never exceeding it
+    rate = float(opts.get(Opt.RateLimit, 1))
+    throttle = AdaptiveThrottle(
+        rate=rate,
+        max_rate=rate,
+        max_retries=int(opts.get(Opt.MaxRetries, 5))
+    )
+
+    # With -export, everything crawled is written to disk as it arrives. Workers sharing a -queue each export to their
+    # own subdirectory, so that they do not overwrite each other's files.
+    exporter = None
+    if Opt.Export in opts:
+        export_directory = opts[Opt.Export]
+        if Opt.Queue in opts:
+            export_directory = os.path.join(export_directory, '{}-{}'.format(socket.gethostname(), os.getpid()))
+
+        exporter = MediaExporter(export_directory, opts.get(Opt.ExportFormat, 'csv'))
+
+    # With -index, the hashtags of every post fetched are indexed, to be queried offline by hashtag-query
+    hashtag_index = None
+    if Opt.HashtagIndex in opts:
+        hashtag_index = HashtagIndex(opts[Opt.HashtagIndex])
+
+    return InstagramDataService(
+        cache=cache,
+        session_store=session_store,
+        throttle=throttle,
+        pool_size=int(opts.get(Opt.PoolSize, 16)),
+        keep_alive=parse_flag(opts.get(Opt.KeepAlive, 'yes')),
+        per_worker_sessions=parse_flag(opts.get(Opt.WorkerSessions, 'no')),
+        profiler=profiler,
+        exporter=exporter,
+        search_index=search_index,
+        hashtag_index=hashtag_index,
+        remembered_pages=int(opts.get(Opt.RememberedPages, 0)),
+        remembered_ttl=remembered_ttl
+    )
+
+
 # Run application
 if __name__ == '__main__':
+    # `igcli.py serve` runs a daemon which keeps a data service warm, and runs tools sent to it over a Unix socket
+    if len(sys.argv) >= 2 and sys.argv[1] == 'serve':
+        from IgcliDaemon import IgcliDaemon
+
+        serve_opts = parse_options(sys.argv[2:])
+        IgcliDaemon(
+            serve_opts.get(Opt.Socket, IgcliDaemon.default_path),
+            build_data_service(serve_opts, remembered_ttl=IgcliDaemon.remembered_ttl)
+        ).serve()
+        sys.exit(0)
+
+    # `igcli.py run <jobfile>` runs every tool listed in a job file, one after another, sharing a single data service
+    if len(sys.argv) >= 3 and sys.argv[1] == 'run':
+        from Pipeline import Pipeline
+
+        pipeline = Pipeline.load(sys.argv[2])
+        command_line_opts = parse_options(sys.argv[3:])
+        pipeline_opts = {**parse_option_dict(pipeline['options']), **command_line_opts}
+        pipeline_opts.setdefault(Opt.RememberedPages, str(Pipeline.default_remembered_pages))
+
+        profiler = Profiler() if Opt.Profile in pipeline_opts else None
+        igds = build_data_service(pipeline_opts, profiler)
+
+        try:
+            failures = Pipeline(pipeline['jobs'], pipeline_opts, igds, profiler, command_line_opts).run()
+        finally:
+            if igds.exporter is not None:
+                igds.exporter.close()
+
+        if profiler is not None:
+            profiler.write(pipeline_opts[Opt.Profile])
+            print(profiler.format_summary(), file=sys.stderr)
+
+        sys.exit(1 if failures else 0)
+
     opts = get_opts(sys.argv)
 
-    igds = InstagramDataService()
+    # With -profile, requests and phases are recorded and written out as a Chrome trace at the end of the run
+    profiler = Profiler() if Opt.Profile in opts else None
 
-    tool_name = opts[Opt.Tool].title().replace("-", "") + "Tool"
-    module_name = importlib.import_module("toolkit.{}".format(tool_name))
-    Tool = getattr(module_name, tool_name)
+    def phase(name):
+        return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+    with phase('load-tool'):
+        Tool = load_tool(opts[Opt.Tool])
+
+    # Tools which work offline are not given a data service at all, so never open the cache or touch the network.
+    igds = None
+    if Tool.requires_network():
+        igds = build_data_service(opts, profiler)
 
     tool = Tool(igds)
     options = gather_opts(opts, tool.requested_options())
 
     # Execute the application
-    result = tool.run(options)
+    try:
+        with phase('run:{}'.format(tool)):
+            result = tool.run(options)
+    finally:
+        if igds is not None and igds.exporter is not None:
+            igds.exporter.close()
+
+    with phase('output'):
+        print(result)
 
-    print(result)
+    if profiler is not None:
+        profiler.write(opts[Opt.Profile])
+        print(profiler.format_summary(), file=sys.stderr)
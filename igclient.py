@@ -0,0 +1,53 @@
+import json
+import os
+import socket
+import sys
+
+# Must match IgcliDaemon.default_path. Not imported from there, so that the client starts without loading igcli itself.
+default_socket_path = os.path.join(os.path.expanduser('~'), '.igcli', 'igcli.sock')
+
+
+def submit(tool, options, path=default_socket_path):
+    """
+    Sends a job to a running igcli daemon, and waits for its response.
+
+    Args:
+        tool: The name of the tool to run, such as `like-analysis`.
+        options: A dictionary of option flags, such as `-u`, to their values.
+        path: The location of the daemon's Unix socket.
+
+    Returns:
+        The daemon's response, a dictionary of the `result` and `output` of the tool, or of an `error`.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(json.dumps({'tool': tool, 'options': options}).encode('utf-8') + b'\n')
+
+        with connection.makefile('rb') as f:
+            return json.loads(f.readline())
+
+
+# Run client
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        raise Exception("Please provide an igcli tool as the first parameter")
+
+    argv = sys.argv[2:]
+    options = {}
+
+    while argv:
+        if argv[0][0] == "-":
+            options[argv[0]] = argv[1]
+            argv = argv[2:]
+        else:
+            argv = argv[1:]
+
+    path = options.pop('-socket', default_socket_path)
+    response = submit(sys.argv[1], options, path)
+
+    if 'error' in response:
+        print(response['error'], file=sys.stderr)
+        sys.exit(1)
+
+    sys.stdout.write(response['output'])
+    print(response['result'] if isinstance(response['result'], str) else json.dumps(response['result']))
@@ -0,0 +1,103 @@
+import email.utils
+import random
+import time
+import pytest
+from AdaptiveThrottle import AdaptiveThrottle
+
+
+def test_parse_retry_after_seconds():
+    assert AdaptiveThrottle.parse_retry_after('120') == 120
+    assert AdaptiveThrottle.parse_retry_after('1.5') == 1.5
+    assert AdaptiveThrottle.parse_retry_after('-3') == 0
+
+
+def test_parse_retry_after_http_date():
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+    a_minute_ago = email.utils.formatdate(time.time() - 60, usegmt=True)
+
+    assert 58 <= AdaptiveThrottle.parse_retry_after(in_a_minute) <= 60
+    assert AdaptiveThrottle.parse_retry_after(a_minute_ago) == 0
+
+
+@pytest.mark.parametrize('retry_after', [None, '', 'soon', 'Mon, 99 Foo 2018 00:00:00 GMT'])
+def test_parse_retry_after_invalid(retry_after):
+    assert AdaptiveThrottle.parse_retry_after(retry_after) is None
+
+
+def test_backoff_is_jittered_within_exponential_bounds():
+    random.seed(1)
+    throttle = AdaptiveThrottle(base_delay=1, max_delay=10)
+
+    for attempt in range(8):
+        bound = min(10, 2 ** attempt)
+        delays = [throttle.backoff(attempt) for _ in range(200)]
+
+        assert all(0 <= delay <= bound for delay in delays)
+        assert max(delays) > bound / 2
+
+
+def test_backoff_honors_retry_after_up_to_max_delay():
+    throttle = AdaptiveThrottle(max_delay=60)
+
+    assert throttle.backoff(0, retry_after='30') == 30
+    assert throttle.backoff(5, retry_after='0') == 0
+    assert throttle.backoff(0, retry_after='3600') == 60
+
+
+def test_record_increases_additively_up_to_max_rate():
+    throttle = AdaptiveThrottle(rate=1, max_rate=1.2)
+
+    throttle.record(200, 0.1)
+    assert throttle.rate == pytest.approx(1.05)
+
+    for _ in range(10):
+        throttle.record(200, 0.1)
+
+    assert throttle.rate == 1.2
+    assert throttle.bucket.rate == 1.2
+
+
+def test_record_decreases_multiplicatively_down_to_min_rate():
+    throttle = AdaptiveThrottle(rate=4, min_rate=0.5, max_rate=4, target_latency=2)
+
+    throttle.record(429, 0.1)
+    assert throttle.rate == 2
+
+    throttle.record(None, 0.1)
+    assert throttle.rate == 1
+
+    throttle.record(200, 5)
+    assert throttle.rate == pytest.approx(0.9)
+
+    for _ in range(10):
+        throttle.record(503, 0.1)
+
+    assert throttle.rate == 0.5
+    assert throttle.bucket.rate == 0.5
+
+
+def test_client_errors_leave_rate_alone():
+    throttle = AdaptiveThrottle(rate=2)
+
+    throttle.record(404, 0.1)
+
+    assert throttle.rate == 2
+
+
+def test_initial_rate_is_clamped():
+    assert AdaptiveThrottle(rate=10, max_rate=5).rate == 5
+    assert AdaptiveThrottle(rate=0.001, min_rate=0.05).rate == 0.05
+
+    # A ceiling below the floor lowers the floor, so the rate never exceeds max_rate
+    throttle = AdaptiveThrottle(rate=0.01, min_rate=0.05, max_rate=0.01)
+    throttle.record(429, 0.1)
+
+    assert throttle.rate == 0.01
+
+
+def test_is_retryable():
+    assert AdaptiveThrottle.is_retryable(429)
+    assert AdaptiveThrottle.is_retryable(500)
+    assert AdaptiveThrottle.is_retryable(503)
+    assert not AdaptiveThrottle.is_retryable(404)
+    assert not AdaptiveThrottle.is_retryable(200)
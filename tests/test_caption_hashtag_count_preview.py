@@ -0,0 +1,53 @@
+import json
+import pytest
+from Opt import Opt
+
+pytest.importorskip('requests')
+
+from toolkit.CaptionHashtagCountPreviewTool import CaptionHashtagCountPreviewTool
+
+
+def run_batch(tmp_path, capsys, lines, input_format):
+    """
+    Runs the tool over a file of lines.
+
+    Returns:
+        The lines the tool printed.
+    """
+    path = tmp_path / 'captions.txt'
+    path.write_text(''.join(line + '\n' for line in lines))
+
+    CaptionHashtagCountPreviewTool(None).run({Opt.File: str(path), Opt.Format: input_format, Opt.Concurrency: '2'})
+    return capsys.readouterr().out.splitlines()
+
+
+def test_every_plain_line_gets_a_verdict(tmp_path, capsys):
+    output = run_batch(tmp_path, capsys, ['#one #two', '', 'none'], 'lines')
+
+    assert len(output) == 3
+    assert output[0].startswith('Your caption contains 2 hashtags')
+    assert output[1].startswith('Your caption contains 0 hashtags')
+
+
+def test_unreadable_json_lines_get_errors_in_order(tmp_path, capsys):
+    output = [json.loads(line) for line in run_batch(tmp_path, capsys, [
+        '{"id": 1, "caption": "#one#two"}',
+        'not json',
+        '{"id": 3}',
+        '"#one"',
+        '{"id": 5, "caption": null}',
+        '[1, 2]',
+        '{"id": 7, "caption": "#1 #a"}'
+    ], 'jsonl')]
+
+    assert [line['id'] for line in output] == [1, None, 3, None, 5, None, 7]
+    assert [line.get('hashtag_count') for line in output] == [2, None, None, 1, None, None, 1]
+    assert output[1]['error'].startswith('Invalid JSON')
+    assert output[2]['error'] == 'Missing caption'
+    assert all('error' in output[index] for index in [1, 2, 4, 5])
+
+
+def test_parse_entry():
+    assert CaptionHashtagCountPreviewTool.parse_entry('#a\n', 'lines') == ('#a', None, None)
+    assert CaptionHashtagCountPreviewTool.parse_entry('{"id": "x", "caption": "#a"}', 'jsonl') == ('#a', 'x', None)
+    assert CaptionHashtagCountPreviewTool.parse_entry('{"caption": "#a"', 'jsonl')[2].startswith('Invalid JSON')
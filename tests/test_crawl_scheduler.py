@@ -0,0 +1,79 @@
+import threading
+import time
+import pytest
+from CrawlScheduler import CrawlScheduler
+
+
+def test_crawls_take_turns():
+    steps = []
+
+    def crawl(key, pages):
+        for page in range(pages):
+            steps.append(key)
+            yield
+        return key * 10
+
+    scheduler = CrawlScheduler(max_workers=1)
+    results = list(scheduler.run([(1, crawl(1, 5)), (2, crawl(2, 2)), (3, crawl(3, 1))]))
+
+    assert steps == [1, 2, 3, 1, 2, 1, 1, 1]
+    assert [(key, result) for key, result, _ in results] == [(3, 30), (2, 20), (1, 10)]
+
+
+def test_errors_are_yielded_without_stopping_other_crawls():
+    def failing():
+        yield
+        raise Exception("User not found")
+
+    def succeeding():
+        yield
+        yield
+        return 'done'
+
+    results = dict((key, (result, error)) for key, result, error in CrawlScheduler(2).run(
+        [('failing', failing()), ('succeeding', succeeding())]
+    ))
+
+    assert str(results['failing'][1]) == "User not found"
+    assert results['succeeding'] == ('done', None)
+
+
+def test_requests_in_flight_and_active_crawls_are_bounded():
+    lock = threading.Lock()
+    in_flight = [0]
+    most_in_flight = [0]
+    started = [0]
+    most_active = [0]
+    finished = [0]
+
+    def crawl():
+        with lock:
+            started[0] += 1
+            most_active[0] = max(most_active[0], started[0] - finished[0])
+
+        for _ in range(3):
+            with lock:
+                in_flight[0] += 1
+                most_in_flight[0] = max(most_in_flight[0], in_flight[0])
+
+            time.sleep(0.01)
+
+            with lock:
+                in_flight[0] -= 1
+
+            yield
+
+        with lock:
+            finished[0] += 1
+
+    crawls = ((key, crawl()) for key in range(40))
+    results = list(CrawlScheduler(max_workers=3, max_active=6).run(crawls))
+
+    assert len(results) == 40
+    assert most_in_flight[0] <= 3
+    assert most_active[0] <= 6
+
+
+def test_max_workers_must_be_positive():
+    with pytest.raises(Exception):
+        CrawlScheduler(0)
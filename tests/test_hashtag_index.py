@@ -0,0 +1,88 @@
+from HashtagIndex import HashtagIndex
+from MediaRecord import MediaRecord
+
+
+def post(post_id, caption, owner_id='1', created_at_timestamp=1530000000):
+    """
+    Returns:
+        A MediaRecord of a post with the caption.
+    """
+    return MediaRecord(
+        id=post_id, shortcode='B' + post_id, owner_id=owner_id, created_at_timestamp=created_at_timestamp,
+        caption_text=caption
+    )
+
+
+def counts(index):
+    """
+    Returns:
+        Every row of the index's co-occurrence and per-user counts.
+    """
+    return (
+        sorted(index.connection.execute('SELECT hashtag, other, count FROM cooccurrences')),
+        sorted(index.connection.execute('SELECT owner_id, hashtag, count FROM user_hashtags'))
+    )
+
+
+def assert_same_answers(index, fresh_index, hashtags):
+    assert counts(index) == counts(fresh_index)
+    assert index.profile('alice', 10) == fresh_index.profile('alice', 10)
+    assert index.profile('bob', 10) == fresh_index.profile('bob', 10)
+
+    for query in [[hashtag] for hashtag in hashtags] + [['travel', 'sun'], ['travel', 'food']]:
+        assert index.post_count(query) == fresh_index.post_count(query)
+        assert index.cooccurring(query, 10) == fresh_index.cooccurring(query, 10)
+        assert index.users(query, 10) == fresh_index.users(query, 10)
+        assert index.posts(query, 10) == fresh_index.posts(query, 10)
+
+
+def test_reindexing_a_changed_caption_matches_a_fresh_index(tmp_path):
+    index = HashtagIndex(str(tmp_path / 'index.sqlite3'))
+    fresh_index = HashtagIndex(str(tmp_path / 'fresh.sqlite3'))
+
+    for each_index in [index, fresh_index]:
+        each_index.add_user('1', 'alice')
+        each_index.add_user('2', 'bob')
+
+    index.add_media([
+        post('10', '#travel #sun #beach'),
+        post('11', '#travel #sun', created_at_timestamp=1530000100),
+        post('20', '#travel #food', owner_id='2')
+    ])
+
+    # The first post's caption is edited, dropping #sun and #beach, and adding #food
+    index.add_media([post('10', '#travel #food #travel')])
+
+    fresh_index.add_media([
+        post('10', '#travel #food'),
+        post('11', '#travel #sun', created_at_timestamp=1530000100),
+        post('20', '#travel #food', owner_id='2')
+    ])
+
+    assert index.post_count(['beach']) == 0
+    assert index.cooccurring(['beach'], 10) == []
+    assert index.cooccurring(['travel'], 10) == [('food', 2), ('sun', 1)]
+    assert index.profile('alice', 10)['hashtags'] == [('travel', 2), ('food', 1), ('sun', 1)]
+    assert_same_answers(index, fresh_index, ['travel', 'sun', 'beach', 'food'])
+
+
+def test_removing_every_hashtag_leaves_no_counts(tmp_path):
+    index = HashtagIndex(str(tmp_path / 'index.sqlite3'))
+    index.add_user('1', 'alice')
+
+    index.add_media([post('10', '#travel #sun')])
+    index.add_media([post('10', 'No hashtags any more')])
+
+    assert counts(index) == ([], [])
+    assert index.post_count(['travel']) == 0
+    assert index.profile('alice', 10) == {'id': '1', 'post_count': 1, 'hashtags': []}
+
+
+def test_reindexing_an_unchanged_caption_changes_nothing(tmp_path):
+    index = HashtagIndex(str(tmp_path / 'index.sqlite3'))
+
+    index.add_media([post('10', '#travel #sun')])
+    before = counts(index)
+    index.add_media([post('10', '#sun #travel, again')])
+
+    assert counts(index) == before
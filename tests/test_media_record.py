@@ -0,0 +1,42 @@
+from MediaRecord import MediaRecord, MediaBatch
+from Statistics import RunningStatistics
+
+
+def record(index):
+    return MediaRecord(
+        id=str(index), created_at_timestamp=1530000000 - index, like_count=(index * 37) % 11, comment_count=index
+    )
+
+
+def test_batch_columns_follow_records():
+    batch = MediaBatch()
+    batch.append(record(0))
+    batch.extend(record(index) for index in range(1, 5))
+
+    assert len(batch) == 5
+    assert batch.ids == ['0', '1', '2', '3', '4']
+    assert list(batch.created_at_timestamps) == [1530000000 - index for index in range(5)]
+    assert list(batch.like_counts) == [0, 4, 8, 1, 5]
+    assert list(batch.comment_counts) == [0, 1, 2, 3, 4]
+
+
+def test_batch_from_snapshot_posts():
+    batch = MediaBatch.from_posts([
+        {'id': '1', 'created_at_timestamp': 20, 'likes': 5, 'comments': 2},
+        {'id': '2', 'created_at_timestamp': 10, 'likes': 7}
+    ])
+
+    assert batch.ids == ['1', '2']
+    assert list(batch.like_counts) == [5, 7]
+    assert list(batch.comment_counts) == [2, 0]
+
+
+def test_summarize_batch_matches_lists():
+    records = [record(index) for index in range(100)]
+    batch = MediaBatch()
+    batch.extend(records)
+
+    assert RunningStatistics.summarize(batch.like_counts, batch.ids) == RunningStatistics.summarize(
+        [post.like_count for post in records], [post.id for post in records]
+    )
+    assert RunningStatistics.summarize(MediaBatch().like_counts, []) == RunningStatistics().summary()
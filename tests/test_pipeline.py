@@ -0,0 +1,27 @@
+import pytest
+from Opt import Opt
+
+pytest.importorskip('requests')
+
+from Pipeline import Pipeline
+
+
+def hashtag_count(verdict):
+    """
+    Returns:
+        The number of hashtags a verdict of caption-hashtag-count-preview reports.
+    """
+    return int(verdict.split()[3])
+
+
+def test_options_take_precedence_top_level_then_job_then_command_line():
+    jobs = [
+        {'tool': 'caption-hashtag-count-preview'},
+        {'tool': 'caption-hashtag-count-preview', 'options': {'-c': '#one #two'}}
+    ]
+
+    pipeline = Pipeline(jobs, {Opt.Caption: '#one'}, None)
+    assert [hashtag_count(pipeline.run_job(job)) for job in jobs] == [1, 2]
+
+    pipeline = Pipeline(jobs, {Opt.Caption: '#one'}, None, overrides={Opt.Caption: '#one #two #three'})
+    assert [hashtag_count(pipeline.run_job(job)) for job in jobs] == [3, 3]
@@ -0,0 +1,173 @@
+import sqlite3
+import threading
+import time
+from ResponseCache import ResponseCache
+
+
+class FakeResponse:
+    """
+    The parts of a `requests.Response` the cache stores.
+    """
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+
+def stored(path):
+    """
+    Returns:
+        A tuple of the keys of the entries in the cache database at path, oldest used first, the combined size of
+        their bodies, and the total recorded in the database.
+    """
+    connection = sqlite3.connect(path)
+
+    try:
+        keys = [key for key, in connection.execute('SELECT key FROM responses ORDER BY accessed_at, key')]
+        size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        total = connection.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+        return keys, size, total
+    finally:
+        connection.close()
+
+
+def test_stores_and_serves_responses(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'))
+    key = ResponseCache.key('username', 'instagram')
+
+    assert cache.get('username', key) is None
+
+    cache.set('username', key, FakeResponse(b'{"id": "1"}'))
+    response = cache.get('username', key)
+
+    assert response.status_code == 200
+    assert response.json() == {'id': '1'}
+    assert response.from_cache
+
+
+def test_modes_and_failed_responses(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path)
+
+    cache.set('username', 'failed', FakeResponse(b'', status_code=500))
+    ResponseCache(path, mode='bypass').set('username', 'bypassed', FakeResponse(b'{}'))
+    ResponseCache(path, mode='refresh').set('username', 'refreshed', FakeResponse(b'{}'))
+
+    assert cache.get('username', 'failed') is None
+    assert cache.get('username', 'bypassed') is None
+    assert cache.get('username', 'refreshed') is not None
+    assert ResponseCache(path, mode='refresh').get('username', 'refreshed') is None
+    assert cache.get('username', 'refreshed', mode='bypass') is None
+
+
+def test_entries_expire_by_endpoint(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), ttls={'search': 0.1})
+
+    cache.set('search', 'query', FakeResponse(b'[]'))
+    cache.set('username', 'user', FakeResponse(b'{}'))
+    assert cache.get('search', 'query') is not None
+
+    time.sleep(0.2)
+
+    assert cache.get('search', 'query') is None
+    assert cache.get('username', 'user') is not None
+
+
+def test_total_bytes_follows_stores_and_replacements(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path)
+
+    cache.set('username', 'a', FakeResponse(b'x' * 100))
+    cache.set('username', 'b', FakeResponse(b'x' * 50))
+    cache.set('username', 'a', FakeResponse(b'x' * 10))
+
+    assert cache.total_bytes() == 60
+    assert stored(path)[1:] == (60, 60)
+
+    cache.clear()
+
+    assert stored(path) == ([], 0, 0)
+
+
+def test_least_recently_used_entries_are_evicted_to_low_water(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path, max_bytes=1000)
+
+    for key in ['a', 'b', 'c']:
+        cache.set('username', key, FakeResponse(b'x' * 300))
+        time.sleep(0.01)
+
+    # A hit on a, though only remembered in memory, keeps it from being evicted before b
+    assert cache.get('username', 'a') is not None
+    cache.set('username', 'd', FakeResponse(b'x' * 300))
+
+    keys, size, total = stored(path)
+
+    assert sorted(keys) == ['a', 'c', 'd']
+    assert size == total == 900
+    assert total <= cache.max_bytes * ResponseCache.eviction_low_water
+
+
+def test_expired_entries_are_evicted_first(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path, ttls={'search': 0.1}, max_bytes=1000)
+
+    cache.set('username', 'old', FakeResponse(b'x' * 300))
+    cache.set('search', 'expiring', FakeResponse(b'x' * 300))
+    time.sleep(0.2)
+    cache.set('username', 'a', FakeResponse(b'x' * 300))
+    cache.set('username', 'b', FakeResponse(b'x' * 300))
+
+    keys, size, total = stored(path)
+
+    assert sorted(keys) == ['a', 'b', 'old']
+    assert size == total == 900
+
+
+def test_hits_are_written_in_batches(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path)
+    cache.access_batch_size = 2
+
+    for key in ['a', 'b', 'c']:
+        cache.set('username', key, FakeResponse(b'{}'))
+        time.sleep(0.01)
+
+    # Reads leave the database alone until a batch of hits has been remembered
+    cache.get('username', 'a')
+    assert stored(path)[0] == ['a', 'b', 'c']
+
+    cache.get('username', 'b')
+    assert stored(path)[0] == ['c', 'a', 'b']
+    assert cache.accessed_at == {}
+
+
+def test_caches_sharing_a_file(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    first = ResponseCache(path, max_bytes=10000)
+    second = ResponseCache(path, max_bytes=10000)
+
+    first.set('username', 'shared', FakeResponse(b'{"id": "1"}'))
+    assert second.get('username', 'shared').json() == {'id': '1'}
+
+    def store(cache, prefix):
+        for index in range(100):
+            cache.set('username', '{}{}'.format(prefix, index % 40), FakeResponse(b'x' * (50 + index)))
+            cache.get('username', '{}{}'.format(prefix, index % 7))
+
+    threads = [
+        threading.Thread(target=store, args=(cache, prefix))
+        for cache, prefix in [(first, 'a'), (second, 'b'), (first, 'c'), (second, 'd')]
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    keys, size, total = stored(path)
+
+    # Every process evicts against the same total, which stays true to the entries stored
+    assert size == total
+    assert total <= first.max_bytes
+    assert first.total_bytes() == second.total_bytes() == total
@@ -0,0 +1,106 @@
+import json
+import pytest
+from MediaRecord import MediaRecord
+from ResponseParser import ResponseParser
+
+timeline_media_fields = {
+    'edges': ('data', 'user', 'edge_owner_to_timeline_media', 'edges'),
+    'page_info': ('data', 'user', 'edge_owner_to_timeline_media', 'page_info')
+}
+
+
+def node(index):
+    """
+    Returns:
+        A synthetic media node, as found in a page of Instagram's timeline responses.
+    """
+    return {
+        'id': str(1000 + index),
+        'shortcode': 'B{}'.format(index),
+        'taken_at_timestamp': 1530000000 - index * 3600,
+        'edge_media_to_caption': {'edges': [{'node': {'text': '#one#two caption {}'.format(index)}}]} if index % 3 else
+        {'edges': []},
+        'edge_media_preview_like': {'count': index * 7},
+        'edge_media_to_comment': {'count': index},
+        'comments_disabled': index % 2 == 0,
+        'owner': {'id': '25025320'},
+        'is_video': index % 4 == 0,
+        'video_view_count': index * 100,
+        'dimensions': {'width': 1080, 'height': 1350},
+        'display_url': 'https://example.com/{}.jpg'.format(index),
+        'thumbnail_src': 'https://example.com/{}_t.jpg'.format(index),
+        'accessibility_caption': 'Photo {}'.format(index),
+        'like_ratio': 0.5 + index / 100
+    }
+
+
+def timeline_document(count=12):
+    """
+    Returns:
+        A synthetic page of a timeline, with fields the projection does not ask for before and after the edges.
+    """
+    return {
+        'data': {
+            'user': {
+                'edge_felix_video_timeline': {'edges': [node(index) for index in range(3)]},
+                'edge_owner_to_timeline_media': {
+                    'count': 1000,
+                    'page_info': {'has_next_page': True, 'end_cursor': 'QVFD'},
+                    'edges': [{'node': node(index)} for index in range(count)]
+                },
+                'edge_saved_media': {'count': 0, 'edges': []}
+            }
+        },
+        'status': 'ok'
+    }
+
+
+def test_project_document_picks_out_paths():
+    projection = ResponseParser.project_document(timeline_document(), timeline_media_fields)
+
+    assert projection['page_info'] == {'has_next_page': True, 'end_cursor': 'QVFD'}
+    assert len(projection['edges']) == 12
+
+
+def test_project_document_missing_path_raises():
+    with pytest.raises(Exception, match='data.user.edge_owner_to_timeline_media.edges'):
+        ResponseParser.project_document({'data': {'user': None}}, timeline_media_fields)
+
+
+def test_project_stream_matches_project_document():
+    pytest.importorskip('ijson')
+    content = json.dumps(timeline_document()).encode('utf-8')
+
+    streamed = ResponseParser.project_stream(content, timeline_media_fields)
+    parsed = ResponseParser.project_document(json.loads(content), timeline_media_fields)
+
+    assert streamed == parsed
+
+    streamed_records = [MediaRecord.from_node(edge['node']) for edge in streamed['edges']]
+    parsed_records = [MediaRecord.from_node(edge['node']) for edge in parsed['edges']]
+
+    for streamed_record, parsed_record in zip(streamed_records, parsed_records):
+        for field in MediaRecord.__slots__:
+            assert getattr(streamed_record, field) == getattr(parsed_record, field)
+            assert type(getattr(streamed_record, field)) is type(getattr(parsed_record, field))
+
+
+def test_project_stream_scalars_and_missing_paths():
+    pytest.importorskip('ijson')
+    content = json.dumps({'data': {'user': {'id': '1', 'edge_followed_by': {'count': 10}}}}).encode('utf-8')
+
+    assert ResponseParser.project_stream(
+        content, {'id': ('data', 'user', 'id'), 'followers': ('data', 'user', 'edge_followed_by', 'count')}
+    ) == {'id': '1', 'followers': 10}
+
+    with pytest.raises(Exception, match='data.user.username'):
+        ResponseParser.project_stream(content, {'username': ('data', 'user', 'username')})
+
+
+def test_project_matches_whichever_parser_is_installed():
+    document = timeline_document()
+    content = json.dumps(document).encode('utf-8')
+
+    assert ResponseParser.project(content, timeline_media_fields) == ResponseParser.project_document(
+        document, timeline_media_fields
+    )
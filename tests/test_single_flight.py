@@ -0,0 +1,139 @@
+import threading
+import time
+import pytest
+from SingleFlight import SingleFlight
+
+
+def run_threads(count, target):
+    """
+    Runs target on count threads at once, and waits for them all to finish.
+
+    Returns:
+        A list of what each thread's call of target returned or raised.
+    """
+    outcomes = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(index):
+        barrier.wait()
+
+        try:
+            outcomes[index] = target()
+        except Exception as e:
+            outcomes[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return outcomes
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {'id': '1'}
+
+    outcomes = run_threads(16, lambda: flight.do('instagram', fetch))
+
+    assert len(calls) == 1
+    assert all(outcome == {'id': '1'} for outcome in outcomes)
+
+    # Without remember, a later call is made again
+    flight.do('instagram', fetch)
+    assert len(calls) == 2
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    calls = []
+    lock = threading.Lock()
+    counter = iter(range(100))
+
+    def fetch():
+        with lock:
+            calls.append(1)
+            key = next(counter)
+
+        time.sleep(0.05)
+        return key
+
+    outcomes = run_threads(4, lambda: flight.do(threading.get_ident(), fetch))
+
+    assert len(calls) == 4
+    assert sorted(outcomes) == [0, 1, 2, 3]
+
+
+def test_errors_are_shared_and_not_remembered():
+    flight = SingleFlight(remember=True)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        raise Exception("Instagram responded with 500 status code")
+
+    outcomes = run_threads(8, lambda: flight.do('instagram', fetch))
+
+    assert len(calls) == 1
+    assert all(isinstance(outcome, Exception) for outcome in outcomes)
+
+    with pytest.raises(Exception):
+        flight.do('instagram', fetch)
+
+    assert len(calls) == 2
+
+
+def test_remembered_results_expire():
+    flight = SingleFlight(remember=True, ttl=0.1)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do('instagram', fetch) == 1
+    assert flight.do('instagram', fetch) == 1
+
+    time.sleep(0.2)
+
+    assert flight.do('instagram', fetch) == 2
+    assert len(calls) == 2
+
+
+def test_least_recently_used_results_are_forgotten():
+    flight = SingleFlight(remember=True, max_remembered=2)
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        return key
+
+    flight.do('a', lambda: fetch('a'))
+    flight.do('b', lambda: fetch('b'))
+    flight.do('a', lambda: fetch('a'))
+    flight.do('c', lambda: fetch('c'))
+    flight.do('a', lambda: fetch('a'))
+    flight.do('b', lambda: fetch('b'))
+
+    assert calls == ['a', 'b', 'c', 'b']
+
+
+def test_clear_forgets_results():
+    flight = SingleFlight(remember=True)
+    calls = []
+
+    flight.do('a', lambda: calls.append(1))
+    flight.clear()
+    flight.do('a', lambda: calls.append(1))
+
+    assert len(calls) == 2
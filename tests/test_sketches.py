@@ -0,0 +1,235 @@
+import json
+import random
+from collections import Counter
+from Sketches import SpaceSaving, HyperLogLog, KllSketch
+
+
+def zipf_stream(count, distinct, seed):
+    """
+    Returns:
+        A list of count items drawn from a Zipf-like distribution over distinct items, like hashtags or like counts.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(range(distinct), weights=weights, k=count)
+
+
+def rank_error(values, q, estimate):
+    """
+    Returns:
+        How far the estimate of quantile q of values is from it in rank, as a fraction of the number of values.
+    """
+    ordered = sorted(values)
+    target = q * (len(ordered) - 1)
+    lowest = next(index for index, value in enumerate(ordered) if value >= estimate)
+    highest = max(index for index, value in enumerate(ordered) if value <= estimate)
+
+    if lowest <= target <= highest:
+        return 0
+
+    return min(abs(lowest - target), abs(highest - target)) / len(ordered)
+
+
+def test_space_saving_counts_exactly_below_capacity():
+    summary = SpaceSaving(10)
+
+    for item in ['a', 'b', 'a', 'c', 'a', 'b']:
+        summary.update(item)
+
+    assert summary.top(2) == [('a', 3), ('b', 2)]
+    assert summary.total == 6
+
+
+def test_space_saving_overestimates_within_bound():
+    items = zipf_stream(20000, 2000, seed=1)
+    error = 0.01
+    summary = SpaceSaving.for_error(error)
+
+    for item in items:
+        summary.update(item)
+
+    true_counts = Counter(items)
+    bound = error * len(items)
+
+    assert len(summary.counts) <= summary.capacity
+
+    for item, count in summary.counts.items():
+        assert true_counts[item] <= count <= true_counts[item] + bound
+
+    # Every item counted more than total / capacity times is guaranteed to be kept
+    for item, count in true_counts.items():
+        if count > len(items) / summary.capacity:
+            assert item in summary.counts
+
+
+def test_space_saving_merge_keeps_heavy_hitters_and_total():
+    first_items = zipf_stream(10000, 1000, seed=2)
+    second_items = zipf_stream(10000, 1000, seed=3)
+    first = SpaceSaving.for_error(0.01)
+    second = SpaceSaving.for_error(0.01)
+
+    for item in first_items:
+        first.update(item)
+    for item in second_items:
+        second.update(item)
+
+    first.merge(second)
+    true_counts = Counter(first_items + second_items)
+
+    assert first.total == 20000
+    assert len(first.counts) <= first.capacity
+    assert [item for item, _ in first.top(3)] == [item for item, _ in true_counts.most_common(3)]
+
+    for item, count in first.counts.items():
+        assert count >= true_counts[item]
+
+
+def test_space_saving_state_round_trip():
+    summary = SpaceSaving(50)
+
+    for item in zipf_stream(5000, 500, seed=4):
+        summary.update(str(item))
+
+    restored = SpaceSaving.from_state(json.loads(json.dumps(summary.state())))
+
+    assert restored.top(50) == summary.top(50)
+    assert restored.total == summary.total
+
+    # The restored summary carries on counting as the original would
+    for item in ['new', 'new', '0']:
+        summary.update(item)
+        restored.update(item)
+
+    assert restored.top(50) == summary.top(50)
+
+
+def test_hyperloglog_estimate_within_error():
+    for precision, distinct in [(10, 100), (12, 50000)]:
+        sketch = HyperLogLog(precision)
+
+        for item in range(distinct):
+            sketch.add('user{}'.format(item))
+            sketch.add('user{}'.format(item))
+
+        standard_error = 1.04 / (2 ** precision) ** 0.5
+        assert abs(sketch.count() - distinct) <= 4 * standard_error * distinct
+
+
+def test_hyperloglog_for_error_precision():
+    assert HyperLogLog.for_error(0.01).precision == 14
+    assert HyperLogLog.for_error(0.5).precision == 4
+    assert HyperLogLog.for_error(0.0001).precision == 18
+
+
+def test_hyperloglog_merge_equals_union():
+    first = HyperLogLog(12)
+    second = HyperLogLog(12)
+    union = HyperLogLog(12)
+
+    for item in range(0, 6000):
+        first.add(item)
+        union.add(item)
+    for item in range(4000, 10000):
+        second.add(item)
+        union.add(item)
+
+    first.merge(second)
+
+    assert first.registers == union.registers
+
+
+def test_hyperloglog_state_round_trip():
+    sketch = HyperLogLog(8)
+
+    for item in range(1000):
+        sketch.add(item)
+
+    restored = HyperLogLog.from_state(json.loads(json.dumps(sketch.state())))
+
+    assert restored.registers == sketch.registers
+    assert restored.count() == sketch.count()
+
+
+def test_kll_exact_while_small():
+    sketch = KllSketch(200)
+
+    for value in range(100):
+        sketch.add(value)
+
+    assert sketch.quantile(0) == 0
+    assert sketch.quantile(0.5) == 49
+    assert sketch.quantile(1) == 99
+    assert KllSketch().quantile(0.5) is None
+
+
+def test_kll_rank_error_within_bound():
+    random.seed(5)
+    rng = random.Random(6)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(50000)]
+    error = 0.01
+    sketch = KllSketch.for_error(error)
+
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == len(values)
+
+    for q in [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]:
+        assert rank_error(values, q, sketch.quantile(q)) <= error
+
+
+def test_kll_memory_is_bounded():
+    random.seed(7)
+    sketch = KllSketch(200)
+
+    for value in range(200000):
+        sketch.add(value)
+
+    assert sum(len(values) for values in sketch.compactors) < 200 * 4
+
+
+def test_kll_weight_is_preserved():
+    random.seed(8)
+    sketch = KllSketch(16)
+
+    for value in range(12345):
+        sketch.add(value)
+
+    assert sum(len(values) * 2 ** level for level, values in enumerate(sketch.compactors)) == 12345
+
+
+def test_kll_merge_estimates_union():
+    random.seed(9)
+    rng = random.Random(10)
+    first_values = [rng.random() for _ in range(20000)]
+    second_values = [rng.random() * 2 for _ in range(20000)]
+    first = KllSketch.for_error(0.01)
+    second = KllSketch.for_error(0.01)
+
+    for value in first_values:
+        first.add(value)
+    for value in second_values:
+        second.add(value)
+
+    first.merge(second)
+
+    assert first.count == 40000
+
+    for q in [0.1, 0.5, 0.9]:
+        assert rank_error(first_values + second_values, q, first.quantile(q)) <= 0.02
+
+
+def test_kll_state_round_trip():
+    random.seed(11)
+    sketch = KllSketch(50)
+
+    for value in range(5000):
+        sketch.add(value)
+
+    restored = KllSketch.from_state(json.loads(json.dumps(sketch.state())))
+
+    assert restored.count == sketch.count
+    assert restored.compactors == sketch.compactors
+
+    for q in [0.1, 0.5, 0.9]:
+        assert restored.quantile(q) == sketch.quantile(q)
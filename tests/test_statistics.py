@@ -0,0 +1,109 @@
+import json
+import random
+from Statistics import RunningStatistics, ApproximateStatistics
+
+
+def test_running_statistics_summary():
+    statistics = RunningStatistics()
+
+    for item, value in enumerate([5, 1, 3, 3, 8, 3]):
+        statistics.add(value, item)
+
+    summary = statistics.summary()
+
+    assert summary['count'] == 6
+    assert summary['sum'] == 23
+    assert summary['median'] == 3
+    assert summary['mode'] == 3
+    assert summary['minimum'] == {'value': 1, 'item': 1}
+    assert summary['maximum'] == {'value': 8, 'item': 4}
+
+
+def test_running_statistics_empty_summary():
+    summary = RunningStatistics().summary()
+
+    assert summary['count'] == 0
+    assert summary['median'] is None
+    assert summary['mode'] is None
+    assert summary['minimum'] is None
+
+
+def test_running_statistics_merge_equals_single_pass():
+    rng = random.Random(1)
+    values = [rng.randint(0, 100) for _ in range(1000)]
+    first = RunningStatistics()
+    second = RunningStatistics()
+    whole = RunningStatistics()
+
+    for index, value in enumerate(values):
+        (first if index % 2 else second).add(value, index)
+        whole.add(value, index)
+
+    first.merge(second)
+
+    assert first.summary()['count'] == whole.summary()['count']
+    assert first.summary()['median'] == whole.summary()['median']
+    assert first.summary()['mode'] == whole.summary()['mode']
+    assert first.summary()['minimum']['value'] == whole.summary()['minimum']['value']
+
+
+def test_running_statistics_state_round_trip():
+    statistics = RunningStatistics()
+
+    for item, value in enumerate([4, 4, 2, 9]):
+        statistics.add(value, 'post{}'.format(item))
+
+    restored = RunningStatistics.from_state(json.loads(json.dumps(statistics.state())))
+
+    assert restored.summary() == statistics.summary()
+
+
+def test_summarize_matches_running_statistics():
+    values = [7, 2, 2, 9, 4, 4, 4, 1]
+    items = ['p{}'.format(index) for index in range(len(values))]
+    statistics = RunningStatistics()
+
+    for value, item in zip(values, items):
+        statistics.add(value, item)
+
+    assert RunningStatistics.summarize(values, items) == statistics.summary()
+
+
+def test_approximate_statistics_close_to_exact():
+    random.seed(2)
+    rng = random.Random(3)
+    values = [int(rng.lognormvariate(4, 1)) for _ in range(20000)]
+    exact = RunningStatistics()
+    approximate = ApproximateStatistics(0.01)
+
+    for index, value in enumerate(values):
+        exact.add(value, index)
+        approximate.add(value, index)
+
+    exact_summary = exact.summary()
+    approximate_summary = approximate.summary()
+    ordered = sorted(values)
+
+    for key in ['count', 'sum', 'mean', 'minimum', 'maximum']:
+        assert approximate_summary[key] == exact_summary[key]
+
+    median_rank = ordered.index(approximate_summary['median'])
+    assert abs(median_rank - len(values) / 2) <= 0.01 * len(values) + values.count(approximate_summary['median'])
+
+
+def test_approximate_statistics_merge_and_round_trip():
+    random.seed(4)
+    first = ApproximateStatistics(0.05)
+    second = ApproximateStatistics(0.05)
+
+    for value in range(1000):
+        first.add(value % 10, value)
+    for value in range(1000, 3000):
+        second.add(value % 7, value)
+
+    first.merge(second)
+    restored = ApproximateStatistics.from_state(json.loads(json.dumps(first.state())))
+
+    assert first.count == 3000
+    assert first.mode() == 0
+    assert restored.summary() == first.summary()
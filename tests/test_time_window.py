@@ -0,0 +1,132 @@
+import pytest
+from MediaRecord import MediaRecord
+from TimeWindow import TimeWindow
+
+
+def timeline(count):
+    """
+    Returns:
+        A synthetic timeline of count posts, newest first, with the post at index i posted at timestamp count - i.
+    """
+    return [MediaRecord(id=str(index), created_at_timestamp=count - index) for index in range(count)]
+
+
+def crawl(window, posts):
+    """
+    Pages through a synthetic timeline with `InstagramDataService.iter_user_media_pages`, optionally within a window.
+
+    Returns:
+        A tuple of the timestamps of the posts selected, and the sizes of the pages requested.
+    """
+    pytest.importorskip('requests')
+    from InstagramDataService import InstagramDataService
+
+    requested = []
+
+    class SyntheticDataService(InstagramDataService):
+        def media_page(self, user_id, count, after):
+            position = after or 0
+            requested.append(count)
+            next_position = position + count
+
+            return {
+                'data': posts[position:next_position],
+                'pagination': {'next_max_id': next_position if next_position < len(posts) else None}
+            }
+
+    pages = SyntheticDataService().iter_user_media_pages('1', window=window)
+    return [record.created_at_timestamp for page in pages for record in page], requested
+
+
+def test_page_size_without_limit_is_full():
+    assert TimeWindow(since=10).page_size(50, 0) == 50
+    assert TimeWindow(until=10).page_size(50, 1000, oldest=5) == 50
+
+
+def test_page_size_shrinks_to_limit():
+    window = TimeWindow(limit=5)
+
+    assert window.page_size(50, 0) == 5
+    assert window.page_size(50, 3) == 2
+    assert window.page_size(50, 5) == 0
+    assert window.page_size(3, 0) == 3
+
+
+def test_page_size_is_full_until_paging_has_passed_until():
+    window = TimeWindow(until=500, limit=5)
+
+    assert window.page_size(50, 0) == 50
+    assert window.page_size(50, 0, oldest=600) == 50
+    assert window.page_size(50, 0, oldest=500) == 50
+    assert window.page_size(50, 2, oldest=499) == 3
+
+
+def test_select_is_done_at_since():
+    window = TimeWindow(since=8)
+    records, done = window.select(timeline(10), 0)
+
+    assert [record.created_at_timestamp for record in records] == [10, 9, 8]
+    assert done
+
+
+def test_select_skips_posts_from_until_onwards():
+    window = TimeWindow(until=8)
+    records, done = window.select(timeline(10), 0)
+
+    assert [record.created_at_timestamp for record in records] == [7, 6, 5, 4, 3, 2, 1]
+    assert not done
+
+
+def test_select_is_done_at_limit_across_pages():
+    window = TimeWindow(limit=4)
+    posts = timeline(10)
+
+    first, done = window.select(posts[:3], 0)
+    assert len(first) == 3 and not done
+
+    second, done = window.select(posts[3:], 3)
+    assert [record.created_at_timestamp for record in second] == [7]
+    assert done
+
+
+def test_reduced_by():
+    assert TimeWindow(limit=5).reduced_by(3).limit == 2
+    assert TimeWindow(limit=5).reduced_by(8).limit == 0
+    assert TimeWindow(since=1).reduced_by(3).limit is None
+
+
+def test_negative_limit_is_rejected():
+    with pytest.raises(Exception):
+        TimeWindow(limit=-1)
+
+
+def test_parse_time():
+    assert TimeWindow.parse_time('1530000000') == 1530000000
+    assert abs(TimeWindow.parse_time('1d') - (TimeWindow.parse_time('0s') - 24 * 60 * 60)) <= 1
+
+    with pytest.raises(Exception):
+        TimeWindow.parse_time('yesterday')
+
+
+@pytest.mark.parametrize('window, expected, requests', [
+    # The last 30 posts take a page of 30, rather than a page of 50
+    (TimeWindow(limit=30), list(range(1000, 970, -1)), [30]),
+    # A window of time stops at the first page reaching past since
+    (TimeWindow(since=901), list(range(1000, 900, -1)), [50, 50, 50]),
+    # Pages are full until paging has passed until, and only then no larger than the rest of the limit needs
+    (TimeWindow(until=500, limit=5), [499, 498, 497, 496, 495], [50] * 11),
+    (TimeWindow(until=475, limit=30), list(range(474, 444, -1)), [50] * 11 + [6]),
+    (TimeWindow(since=200, until=300), list(range(299, 199, -1)), [50] * 17)
+])
+def test_crawl_over_synthetic_timeline(window, expected, requests):
+    selected, requested = crawl(window, timeline(1000))
+
+    assert selected == expected
+    assert requested == requests
+
+
+def test_crawl_without_window_fetches_every_page():
+    selected, requested = crawl(None, timeline(1000))
+
+    assert selected == list(range(1000, 0, -1))
+    assert requested == [50] * 20
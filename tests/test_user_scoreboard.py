@@ -0,0 +1,39 @@
+import pytest
+from Opt import Opt
+
+pytest.importorskip('requests')
+
+from toolkit.UserScoreboardTool import UserScoreboardTool
+
+
+class CountingScoreboardTool(UserScoreboardTool):
+    """
+    Looks up made up media counts, remembering every username looked up.
+    """
+
+    def __init__(self):
+        super().__init__(None)
+        self.looked_up = []
+
+    def lookup_media_count(self, username):
+        self.looked_up.append(username)
+        return {'username': username, 'media_count': len(username)}
+
+
+def test_read_usernames_skips_blank_lines_and_repeats(tmp_path):
+    path = tmp_path / 'users.txt'
+    path.write_text('alice\n\n  \n@Alice\nbob \n@\n')
+
+    assert UserScoreboardTool.read_usernames(str(path)) == {'alice': 'alice', 'bob': 'bob'}
+
+
+def test_queue_never_looks_up_blank_usernames(tmp_path, capsys):
+    path = tmp_path / 'users.txt'
+    path.write_text('alice\nbob\n\n')
+    tool = CountingScoreboardTool()
+
+    results = tool.crawl_queue({Opt.Queue: str(tmp_path / 'queue.sqlite3'), Opt.File: str(path)}, 2)
+
+    assert sorted(tool.looked_up) == ['alice', 'bob']
+    assert sorted(result['username'] for result in results) == ['alice', 'bob']
+    assert 'could not be found' not in capsys.readouterr().out
@@ -0,0 +1,101 @@
+import time
+from UserSearchIndex import UserSearchIndex
+
+
+def user(user_id, username, full_name=''):
+    return {'id': user_id, 'username': username, 'full_name': full_name}
+
+
+def food_results():
+    return [
+        user(1, 'foodie', 'Ann Smith'),
+        user(2, 'foo_bar', 'Bob Food'),
+        user(3, 'foolish', 'Cat Jones'),
+        user(4, 'barfoo', 'Dan Foo')
+    ]
+
+
+def test_repeated_queries_are_answered():
+    index = UserSearchIndex()
+
+    assert index.search('foo') is None
+    index.add('foo', food_results())
+
+    assert index.search('foo') == food_results()
+    assert index.search(UserSearchIndex.normalize('  FOO ')) == food_results()
+
+
+def test_results_are_copied_in_and_out():
+    index = UserSearchIndex()
+    results = food_results()
+
+    index.add('foo', results)
+    results[0]['username'] = 'changed'
+    index.search('foo')[1]['username'] = 'changed'
+
+    assert index.search('foo') == food_results()
+
+
+def test_results_expire():
+    index = UserSearchIndex(ttl=0.1)
+    index.add('foo', food_results())
+
+    time.sleep(0.2)
+
+    assert index.search('foo') is None
+
+
+def test_longer_queries_are_not_narrowed_by_default():
+    index = UserSearchIndex()
+    index.add('foo', food_results())
+
+    assert index.search('food') is None
+
+
+def test_narrowing_by_username_and_full_name():
+    index = UserSearchIndex(narrow=True)
+    index.add('foo', food_results())
+
+    # Ranked as Instagram ranked them for the shorter query
+    assert [found['id'] for found in index.search('food')] == [1, 2]
+    assert [found['id'] for found in index.search('fooli')] == [3]
+    assert index.search('foodies') == []
+
+    # Multiple words, and queries with no shorter query known, go to Instagram
+    assert index.search('foo bar') is None
+    assert index.search('bar') is None
+
+
+def test_capped_results_are_not_narrowed():
+    index = UserSearchIndex(narrow=True)
+    index.add('f', [user(100 + user_id, 'f{}'.format(user_id)) for user_id in range(UserSearchIndex.max_results)])
+    index.add('fo', food_results())
+
+    assert [found['id'] for found in index.search('foo')] == [1, 2, 3, 4]
+
+    index = UserSearchIndex(narrow=True)
+    index.add('f', [user(100 + user_id, 'f{}'.format(user_id)) for user_id in range(UserSearchIndex.max_results)])
+
+    assert index.search('fo') is None
+
+
+def test_users_are_reindexed_when_their_details_change():
+    index = UserSearchIndex(narrow=True)
+    index.add('foo', [user(1, 'foodie', 'Ann Smith')])
+    index.add('fo', [user(1, 'foolish', 'Ann Smith'), user(2, 'football')])
+
+    assert [found['id'] for found in index.search('food')] == []
+    assert [found['username'] for found in index.search('fool')] == ['foolish']
+    assert index.prefixes == [('ann', 1), ('foolish', 1), ('football', 2), ('smith', 1)]
+
+
+def test_least_recently_used_queries_are_forgotten():
+    index = UserSearchIndex(max_queries=2)
+
+    index.add('a', [user(1, 'a')])
+    index.add('b', [user(2, 'b')])
+    index.search('a')
+    index.add('c', [user(3, 'c')])
+
+    assert index.search('b') is None
+    assert index.search('a') is not None
@@ -0,0 +1,125 @@
+import time
+from WorkQueue import WorkQueue
+
+
+def test_enqueue_is_idempotent_and_lease_keeps_order(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'))
+
+    queue.enqueue([('a', 'A'), ('b', 'B'), ('c', 'C')])
+    queue.enqueue([('b', 'B'), ('d', 'D')])
+
+    assert queue.counts()['pending'] == 4
+    assert queue.lease(2) == [('a', 'A'), ('b', 'B')]
+    assert queue.lease(5) == [('c', 'C'), ('d', 'D')]
+    assert queue.lease(5) == []
+
+
+def test_leased_items_are_not_handed_to_another_worker(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    first = WorkQueue(path)
+    second = WorkQueue(path)
+
+    first.enqueue([('a', 'A'), ('b', 'B')])
+
+    assert first.lease(1) == [('a', 'A')]
+    assert second.lease(5) == [('b', 'B')]
+    assert second.lease(5) == []
+
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    dead_worker = WorkQueue(path, lease_seconds=0.1)
+    worker = WorkQueue(path, lease_seconds=0.1)
+
+    dead_worker.enqueue([('a', 'A')])
+    assert dead_worker.lease(1) == [('a', 'A')]
+    assert worker.lease(1) == []
+
+    time.sleep(0.2)
+
+    assert worker.lease(1) == [('a', 'A')]
+
+    # The first worker's late result still counts, but its failure does not, as it no longer holds the lease
+    dead_worker.fail('a', 'Too late')
+    assert worker.counts()['leased'] == 1
+
+    worker.ack('a', {'media_count': 3})
+    assert worker.results() == [('a', {'media_count': 3})]
+
+
+def test_failed_items_are_retried_up_to_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'), max_attempts=3)
+    queue.enqueue([('a', 'A')])
+
+    for attempt in range(3):
+        assert queue.lease(1) == [('a', 'A')]
+        queue.fail('a', 'Attempt {} failed'.format(attempt + 1))
+
+    assert queue.lease(1) == []
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+    assert queue.failures() == [('A', 'Attempt 3 failed')]
+
+
+def test_failure_without_retry_fails_at_once(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'), max_attempts=3)
+    queue.enqueue([('a', 'A'), ('b', 'B')])
+
+    queue.lease(2)
+    queue.fail('a', 'User not found', retry=False)
+    queue.fail('b', 'Timed out')
+
+    assert queue.failures() == [('A', 'User not found')]
+    assert queue.lease(5) == [('b', 'B')]
+
+
+def test_expired_lease_on_last_attempt_fails(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'), lease_seconds=0.1, max_attempts=1)
+    queue.enqueue([('a', 'A')])
+
+    assert queue.lease(1) == [('a', 'A')]
+    time.sleep(0.2)
+
+    assert queue.lease(1) == []
+    assert queue.failures() == [('A', 'Lease expired')]
+
+
+def test_ack_keeps_first_result(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite3'))
+    queue.enqueue([('a', 'A'), ('b', 'B')])
+
+    queue.lease(2)
+    queue.ack('b', 2)
+    queue.ack('a', 1)
+    queue.ack('a', 10)
+
+    assert queue.results() == [('a', 1), ('b', 2)]
+    assert queue.counts()['done'] == 2
+
+
+def test_claim_is_won_once(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    first = WorkQueue(path)
+    second = WorkQueue(path)
+
+    assert first.claim('report')
+    assert not second.claim('report')
+    assert not first.claim('report')
+    assert second.claim('other')
+
+
+def test_claims_are_released_by_new_items(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    first = WorkQueue(path)
+    second = WorkQueue(path)
+
+    first.enqueue([('a', 'A')])
+    assert first.claim('report')
+
+    # Enqueuing items already in the queue keeps the claim
+    second.enqueue([('a', 'A')])
+    assert not second.claim('report')
+
+    # A later run adding new users reports the scoreboard again
+    second.enqueue([('a', 'A'), ('b', 'B')])
+    assert second.claim('report')
+    assert not first.claim('report')
@@ -1,11 +1,51 @@
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from Opt import Opt
 from InstagramDataService import InstagramDataService
+from HashtagTokenizer import HashtagTokenizer
+
+
+def caption_verdict(caption):
+    """
+    Counts the hashtags in a caption, and determines whether the caption can be posted. A module level function, so
+    that it can be sent to worker processes.
+
+    Args:
+        caption: The caption to check.
+
+    Returns:
+        A tuple of the number of hashtags in the caption, and a verdict on whether it can be posted.
+    """
+    hashtag_count = HashtagTokenizer.count(caption)
+
+    if hashtag_count < 30:
+        verdict = "Your caption contains {} {}, you have {} {} remaining."\
+            .format(hashtag_count, "hashtag" if hashtag_count == 1 else "hashtags",
+                    30 - hashtag_count, "hashtag" if 30 - hashtag_count == 1 else "hashtags")
+    elif hashtag_count == 30:
+        verdict = "Your caption has the maximum amount of 30 hashtags per comment. To include additional hashtags " \
+                  "you will need to post another comment."
+    else:
+        verdict = "Your caption contains {} hashtags, and will fail to be posted to Instagram as the limit is 30 " \
+                  "per caption/comment".format(hashtag_count)
+
+    return hashtag_count, verdict
 
 
 class CaptionHashtagCountPreviewTool:
     """
-    Calculates the amount of hashtags in a given caption, provided by the user.
+    Calculates the amount of hashtags in a given caption, provided by the user. Alternatively, in batch mode, checks
+    every caption in a file or stdin, spreading the work across a pool of processes.
+
+    Hashtags are recognised as Instagram links them, by HashtagTokenizer: `#one#two` is two hashtags, and a purely
+    numeric `#1` is none.
     """
+
+    # Number of captions submitted to the process pool at once
+    batch_size = 10000
+
     def __init__(self, instagram_data_service: InstagramDataService) -> None:
         """
         Initialization.
@@ -21,30 +61,118 @@ class CaptionHashtagCountPreviewTool:
             A dictionary containing two sets, `mandatory`, and `optional`.
         """
         return {
-            "mandatory": {Opt.Caption},
-            "optional": set()
+            "mandatory": set(),
+            "optional": {Opt.Caption, Opt.File, Opt.Format, Opt.Concurrency}
         }
 
+    @staticmethod
+    def requires_network():
+        """
+        Whether the tool makes requests to Instagram.
+
+        Returns:
+            False, captions are checked locally.
+        """
+        return False
+
     def run(self, options):
         """
+        Runs the tool.
+
+        Arguments:
+            options: The options the tools needs to run this command successfully.
+
+        Returns:
+            The verdict on the caption provided with -c. In batch mode, the verdicts are printed as they are made, and an
+            empty string is returned.
+        """
+        if Opt.Caption in options:
+            return caption_verdict(options[Opt.Caption])[1]
+
+        if Opt.File not in options:
+            raise Exception("Please provide a caption with -c, or a file of captions with -file")
+
+        input_format = options.get(Opt.Format, 'lines')
+        if input_format not in {'lines', 'jsonl'}:
+            raise Exception("format must be one of: jsonl, lines")
+
+        f = sys.stdin if options[Opt.File] == '-' else open(options[Opt.File])
+
+        try:
+            # Every line is a caption in lines mode, even a blank one, so that the Nth verdict is always the Nth line's
+            entries = (self.parse_entry(line, input_format) for line in f if input_format == 'lines' or line.strip())
+            workers = int(options[Opt.Concurrency]) if Opt.Concurrency in options else None
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Submit captions a batch at a time, so memory stays bounded however large the input is.
+                while True:
+                    batch = list(islice(entries, self.batch_size))
+                    if not batch:
+                        break
+
+                    verdicts = executor.map(
+                        caption_verdict, [caption for caption, _, error in batch if error is None], chunksize=256
+                    )
+
+                    for caption, entry_id, error in batch:
+                        # A line which cannot be read gets an error in place of its verdict, rather than ending the run
+                        if error is not None:
+                            print(json.dumps({'id': entry_id, 'error': error}))
+                            continue
+
+                        hashtag_count, verdict = next(verdicts)
+
+                        if input_format == 'lines':
+                            print(verdict)
+                        else:
+                            print(json.dumps({
+                                'id': entry_id,
+                                'hashtag_count': hashtag_count,
+                                'verdict': verdict
+                            }))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+        return ""
+
+    @staticmethod
+    def parse_entry(line, input_format):
+        """
+        Parses a single line of a batch of captions.
+
+        Args:
+            line: The line to parse.
+            input_format: The format of the batch, either 'lines', where each line is a caption, or 'jsonl', where each
+                line is a JSON string, or a JSON object with a `caption` and optionally an `id`.
+
+        Returns:
+            A tuple of the caption, its ID if one was provided, and a description of why the line could not be parsed,
+            in which case the caption is None.
         """
-        words_in_caption = options[Opt.Caption].split(" ")
+        if input_format == 'lines':
+            return line.rstrip('\n'), None, None
+
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            return None, None, "Invalid JSON: {}".format(e)
+
+        if isinstance(entry, str):
+            return entry, None, None
+
+        if not isinstance(entry, dict):
+            return None, None, "Expected a caption, or an object with a caption"
 
-        # lambda to determine hashtags in caption
-        hashtags_in_caption = [x for x in words_in_caption if x[0] is '#']
+        try:
+            caption = entry['caption']
+        except KeyError:
+            return None, entry.get('id'), "Missing caption"
 
-        hashtag_count = len(hashtags_in_caption)
+        if not isinstance(caption, str):
+            return None, entry.get('id'), "The caption must be a string"
 
-        if hashtag_count < 30:
-            return "Your caption contains {} {}, you have {} {} remaining."\
-                .format("hashtag" if hashtag_count is 1 else "hashtags",
-                        hashtag_count, 30 - hashtag_count, "hashtag" if 30 - hashtag_count is 1 else "hashtags")
-        elif hashtag_count == 30:
-            return "Your caption has the maximum amount of 30 hashtags per comment. To include additional hashtags " \
-                   "you will need to post another comment."
-        else:
-            return "Your caption contains {} hashtags, and will fail to be posted to Instagram as the limit is 30 " \
-                   "per caption/comment".format(hashtag_count)
+        return caption, entry.get('id'), None
 
     def __str__(self):
         """
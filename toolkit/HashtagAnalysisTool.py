@@ -1,5 +1,8 @@
 from Opt import Opt
 from InstagramDataService import InstagramDataService
+from HashtagTokenizer import HashtagTokenizer, HashtagCounter, ApproximateHashtagCounter
+from Statistics import RunningStatistics, ApproximateStatistics
+from TimeWindow import TimeWindow
 
 
 class HashtagAnalysisTool:
@@ -8,6 +11,9 @@ class HashtagAnalysisTool:
     mode, and most used hashtags.
     """
 
+    # Number of most used hashtags to report, unless overridden with -top
+    default_top_count = 10
+
     def __init__(self, instagram_data_service: InstagramDataService) -> None:
         """
         Initialization.
@@ -24,9 +30,19 @@ class HashtagAnalysisTool:
         """
         return {
             "mandatory": {Opt.Username},
-            "optional": {Opt.RecentPostLimit}
+            "optional": {Opt.RecentPostLimit, Opt.Since, Opt.Until, Opt.TopCount, Opt.Approximate}
         }
 
+    @staticmethod
+    def requires_network():
+        """
+        Whether the tool makes requests to Instagram.
+
+        Returns:
+            True.
+        """
+        return True
+
     def run(self, options):
         """
         Runs the tool.
@@ -35,25 +51,47 @@ class HashtagAnalysisTool:
             options: The options the tools needs to run this command successfully.
 
         Returns:
-            The hashtag analysis for the particular user.
+            The hashtag analysis for the particular user, as a dictionary of the `post_count`, the `hashtag_count` and
+            `distinct_hashtag_count`, the `mean`, `median`, and `mode` of hashtags per post, and the `most_used`
+            hashtags.
         """
-        words_in_caption = options[Opt.Caption].split(" ")
-
-        # lambda to determine hashtags in caption
-        hashtags_in_caption = [x for x in words_in_caption if x[0] is '#']
+        user_info = self.instagram_data_service.user_info(options[Opt.Username], fields=[('id',), ('username',)])
 
-        hashtag_count = len(hashtags_in_caption)
+        if user_info is None:
+            raise Exception("API Error")
 
-        if hashtag_count < 30:
-            return "Your caption contains {} {}, you have {} {} remaining."\
-                .format("hashtag" if hashtag_count is 1 else "hashtags",
-                        hashtag_count, 30 - hashtag_count, "hashtag" if 30 - hashtag_count is 1 else "hashtags")
-        elif hashtag_count == 30:
-            return "Your caption has the maximum amount of 30 hashtags per comment. To include additional hashtags " \
-                   "you will need to post another comment."
+        # With -approximate, hashtags are counted in fixed memory, however many distinct hashtags there are
+        if Opt.Approximate in options:
+            hashtag_counter = ApproximateHashtagCounter(float(options[Opt.Approximate]))
+            statistics = ApproximateStatistics(float(options[Opt.Approximate]))
         else:
-            return "Your caption contains {} hashtags, and will fail to be posted to Instagram as the limit is 30 " \
-                   "per caption/comment".format(hashtag_count)
+            hashtag_counter = HashtagCounter()
+            statistics = RunningStatistics()
+
+        images = self.instagram_data_service.iter_user_media(
+            user_info['data']['id'], count=50, window=TimeWindow.from_options(options)
+        )
+
+        for image in images:
+            hashtags = HashtagTokenizer.hashtags(image.caption_text)
+
+            hashtag_counter.update(hashtags)
+            statistics.add(len(hashtags), image.id)
+
+        summary = statistics.summary()
+
+        return {
+            'post_count': summary['count'],
+            'hashtag_count': summary['sum'],
+            'distinct_hashtag_count': hashtag_counter.distinct(),
+            'mean': summary['mean'],
+            'median': summary['median'],
+            'mode': summary['mode'],
+            'most_used': [
+                {'hashtag': hashtag, 'count': count}
+                for hashtag, count in hashtag_counter.top(int(options.get(Opt.TopCount, self.default_top_count)))
+            ]
+        }
 
     def __str__(self):
         """
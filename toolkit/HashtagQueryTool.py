@@ -0,0 +1,102 @@
+from Opt import Opt
+from InstagramDataService import InstagramDataService
+from HashtagIndex import HashtagIndex
+
+
+class HashtagQueryTool:
+    """
+    Queries the hashtag index built up by other tools as they fetch media, without making any requests to Instagram.
+    For one or more hashtags, finds the posts and users which used them together, and the hashtags most often used
+    alongside them. Alternatively, for a user, finds the hashtags they use most.
+    """
+
+    # Number of posts, users, and hashtags reported, unless overridden with -top
+    default_top_count = 10
+
+    def __init__(self, instagram_data_service: InstagramDataService) -> None:
+        """
+        Initialization.
+        """
+        self.instagram_data_service = instagram_data_service
+
+    @staticmethod
+    def requested_options():
+        """
+        The options needed and preferred for the tool to run successfully.
+
+        Returns:
+            A dictionary containing two sets, `mandatory`, and `optional`.
+        """
+        return {
+            "mandatory": set(),
+            "optional": {Opt.Hashtag, Opt.Username, Opt.HashtagIndex, Opt.TopCount}
+        }
+
+    @staticmethod
+    def requires_network():
+        """
+        Whether the tool makes requests to Instagram.
+
+        Returns:
+            False, as the tool only reads the hashtag index.
+        """
+        return False
+
+    def run(self, options):
+        """
+        Runs the tool.
+
+        Arguments:
+            options: The options the tools needs to run this command successfully.
+
+        Returns:
+            For hashtags given with `-tag`, separated by commas, a dictionary of the `hashtags`, the number of posts
+            which used them all as `post_count`, the most recent such `posts`, the `users` with the most such posts, and
+            the hashtags most often used alongside them as `cooccurring`. For a user given with `-u`, a dictionary of
+            their `username`, `id`, number of posts indexed as `post_count`, and their most used `hashtags`.
+        """
+        index = HashtagIndex(options.get(Opt.HashtagIndex, HashtagIndex.default_path))
+        top_count = int(options.get(Opt.TopCount, self.default_top_count))
+
+        if Opt.Hashtag in options:
+            hashtags = sorted(set(
+                hashtag.strip().lstrip('#').casefold() for hashtag in options[Opt.Hashtag].split(',') if hashtag.strip()
+            ))
+
+            if not hashtags:
+                raise Exception("Please provide one or more hashtags with -tag, separated by commas")
+
+            return {
+                'hashtags': hashtags,
+                'post_count': index.post_count(hashtags),
+                'posts': index.posts(hashtags, top_count),
+                'users': index.users(hashtags, top_count),
+                'cooccurring': [
+                    {'hashtag': hashtag, 'count': count} for hashtag, count in index.cooccurring(hashtags, top_count)
+                ]
+            }
+
+        if Opt.Username in options:
+            username = InstagramDataService.normalize_username(options[Opt.Username])
+            profile = index.profile(username, top_count)
+
+            if profile is None:
+                raise Exception("{} has not been indexed".format(username))
+
+            return {
+                'username': username,
+                'id': profile['id'],
+                'post_count': profile['post_count'],
+                'hashtags': [{'hashtag': hashtag, 'count': count} for hashtag, count in profile['hashtags']]
+            }
+
+        raise Exception("Please provide hashtags to look up with -tag, or a user to profile with -u")
+
+    def __str__(self):
+        """
+        Retrieves the name of this tool.
+
+        Returns:
+            A stringified representation of this class. Just the name of the tool.
+        """
+        return 'hashtag-query'
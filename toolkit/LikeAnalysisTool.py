@@ -1,18 +1,32 @@
-import time
-
+import json
+import os
+import threading
 from Opt import Opt
+from CrawlCheckpoint import CrawlCheckpoint
 from InstagramDataService import InstagramDataService
+from CrawlScheduler import CrawlScheduler
+from MediaRecord import MediaBatch
+from MediaSnapshotStore import MediaSnapshotStore
+from Statistics import RunningStatistics, ApproximateStatistics
+from TimeWindow import TimeWindow
+
 
 class LikeAnalysisTool:
     """
     Calculates the sum of likes for a user's photos and videos, along with a mean, median, mode, and most liked &
-    least liked posts.
+    least liked posts. Alternatively, in batch mode, analyses every user in a line-separated file, crawling their
+    timelines side by side.
     """
+
+    # Number of requests in flight at once in batch mode, unless overridden with -concurrency
+    default_concurrency = 8
+
     def __init__(self, instagram_data_service: InstagramDataService) -> None:
         """
         Initialization.
         """
         self.instagram_data_service = instagram_data_service
+        self.overall_lock = threading.Lock()
 
     @staticmethod
     def requested_options():
@@ -23,10 +37,23 @@ class LikeAnalysisTool:
             A dictionary containing two sets, `mandatory`, and `optional`.
         """
         return {
-            "mandatory": {Opt.Username},
-            "optional": {Opt.RecentPostLimit}
+            "mandatory": set(),
+            "optional": {
+                Opt.Username, Opt.File, Opt.Concurrency, Opt.RecentPostLimit, Opt.Snapshots, Opt.RefreshWindow,
+                Opt.Checkpoint, Opt.Resume, Opt.Since, Opt.Until, Opt.Approximate
+            }
         }
 
+    @staticmethod
+    def requires_network():
+        """
+        Whether the tool makes requests to Instagram.
+
+        Returns:
+            True.
+        """
+        return True
+
     def run(self, options):
         """
         Runs the tool.
@@ -35,40 +62,310 @@ class LikeAnalysisTool:
             options: The options the tools needs to run this command successfully.
 
         Returns:
-            The like analysis for the particular user.
+            The like analysis for the particular user, as a dictionary of the `post_count`, and the `sum`, `mean`,
+            `median`, `mode`, and 90th and 99th `percentiles` of likes, along with the `most_liked` and `least_liked`
+            posts. In batch mode, the analysis of each user is printed as a line of JSON as soon as it is finished, and
+            an empty string is returned; or with `-approximate`, the analysis of every post of every user together,
+            along with the `user_count`.
+        """
+        if Opt.Username in options:
+            checkpoint = CrawlCheckpoint.from_options(
+                options, str(self), InstagramDataService.normalize_username(options[Opt.Username])
+            )
+            crawl = self.crawl(options[Opt.Username], options, checkpoint)
+
+            try:
+                while True:
+                    try:
+                        next(crawl)
+                    except StopIteration as stop:
+                        return stop.value
+            finally:
+                if checkpoint is not None:
+                    checkpoint.close()
+
+        if Opt.File not in options:
+            raise Exception("Please provide a username with -u, or a file of usernames with -file")
+
+        scheduler = CrawlScheduler(int(options.get(Opt.Concurrency, self.default_concurrency)))
+        checkpoint = CrawlCheckpoint.from_options(options, str(self), os.path.abspath(options[Opt.File]))
+
+        # Approximate statistics take the same fixed memory however many posts they cover, so each user's are merged
+        # into statistics of every post analysed.
+        overall = self.create_statistics(options) if Opt.Approximate in options else None
+        user_count = 0
+
+        try:
+            with open(options[Opt.File]) as f:
+                crawls = (
+                    (username, self.crawl(username, options, checkpoint, overall))
+                    for username in self.read_usernames(f)
+                )
+
+                for username, analysis, error in scheduler.run(crawls):
+                    if error is not None:
+                        print("User could not be analysed: {}. Skipping...".format(username))
+                        continue
+
+                    user_count += 1
+                    print(json.dumps(dict(username=username, **analysis)), flush=True)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+        if overall is not None:
+            return dict(user_count=user_count, **self.analysis(overall.summary()))
+
+        return ""
+
+    @staticmethod
+    def read_usernames(f):
+        """
+        Lazily reads a newline-separated file of usernames. Each user is only analysed once, however many times, or
+        however cased, they appear in the file.
+
+        Args:
+            f: The open file.
+
+        Yields:
+            Each username, as it first appears in the file.
+        """
+        seen = set()
+
+        for line in f:
+            username = line.strip()
+            normalized_username = InstagramDataService.normalize_username(username)
+
+            if normalized_username and normalized_username not in seen:
+                seen.add(normalized_username)
+                yield username
+
+    @staticmethod
+    def create_statistics(options, state=None):
+        """
+        Creates the statistics likes are gathered in: exact, or with `-approximate <error>`, approximate in fixed
+        memory.
+
+        Args:
+            options: The options the tool was run with.
+            state: Optional statistics gathered previously to restore, as returned by their `state`.
+
+        Returns:
+            A RunningStatistics, or an ApproximateStatistics.
+        """
+        if Opt.Approximate in options:
+            if state is not None:
+                return ApproximateStatistics.from_state(state)
+
+            return ApproximateStatistics(float(options[Opt.Approximate]))
+
+        return RunningStatistics.from_state(state) if state is not None else RunningStatistics()
+
+    def crawl(self, username, options, checkpoint=None, overall=None):
+        """
+        Analyses the likes of a single user, one request at a time. A generator, which makes a single request to
+        Instagram each time it is advanced, so that a CrawlScheduler can interleave the crawls of many users.
+
+        Args:
+            username: The username of the user to analyse.
+            options: The options the tool was run with.
+            checkpoint: An optional CrawlCheckpoint to record the crawl's progress in after each page, and to resume the
+                crawl from.
+            overall: Optional ApproximateStatistics of every user's posts, to merge the statistics of the user's posts
+                into once they have all been analysed.
+
+        Yields:
+            None, after each request.
+
+        Returns:
+            The like analysis for the user, as per `run`.
         """
-        user_info = self.instagram_data_service.user_info(options[Opt.Username])
+        key = InstagramDataService.normalize_username(username)
+        window = TimeWindow.from_options(options)
+        progress = None
 
-        if user_info is None:
-            raise Exception("API Error")
+        if checkpoint is not None:
+            result = checkpoint.result(key)
+            if result is not None:
+                if overall is not None:
+                    self.merge_overall(overall, self.create_statistics(options, result['statistics']))
 
-        images = []
+                return result['analysis']
 
-        while True:
-            time.sleep(2)
-            after = None
+            progress = checkpoint.progress(key)
 
-            if len(images) > 0:
-                after = images[-1]['id']
+        if progress is not None:
+            user = progress['user']
+        else:
+            user_info = self.instagram_data_service.user_info(username, fields=[('id',), ('username',)])
 
-            images_from_pass = self.instagram_data_service.users_user_id_media_recent(
-                user_info['data']['id'],
-                count=50,
-                after=after
-            )['data']
+            if user_info is None:
+                raise Exception("API Error")
 
-            images.extend(images_from_pass)
+            user = user_info['data']
 
-            if len(images_from_pass) is not 50:
+            yield
+
+        if Opt.Snapshots in options:
+            posts = yield from self.update_snapshot(
+                MediaSnapshotStore(options[Opt.Snapshots]),
+                user,
+                int(options.get(Opt.RefreshWindow, 0))
+            )
+
+            # The snapshot is kept whole, and only the posts within the window analysed
+            if window is not None:
+                posts = [post for post in posts if window.contains(post['created_at_timestamp'])][:window.limit]
+
+            # The posts are held in memory already, so are summarized column-wise
+            batch = MediaBatch.from_posts(posts)
+
+            if Opt.Approximate in options:
+                statistics = self.create_statistics(options)
+
+                for like_count, post_id in zip(batch.like_counts, batch.ids):
+                    statistics.add(like_count, post_id)
+
+                analysis = self.analysis(statistics.summary())
+            else:
+                statistics = None
+                analysis = self.analysis(RunningStatistics.summarize(batch.like_counts, batch.ids))
+        else:
+            statistics = self.create_statistics(options, progress['statistics'] if progress else None)
+
+            # Posts analysed before the crawl was interrupted count towards the limit
+            if window is not None:
+                window = window.reduced_by(statistics.count)
+
+            pages = self.instagram_data_service.iter_user_media_pages(
+                user['id'], count=50, after=progress['after'] if progress else None, cursors=True, window=window
+            )
+
+            for page, after in pages:
+                for image in page:
+                    statistics.add(image.like_count, image.id)
+
+                # The last page is not recorded, since the result is recorded as soon as it has been processed.
+                if checkpoint is not None and after is not None:
+                    checkpoint.record_progress(key, {
+                        'user': user,
+                        'after': after,
+                        'statistics': statistics.state()
+                    })
+
+                yield
+
+            analysis = self.analysis(statistics.summary())
+
+        # Approximate statistics are small enough to keep alongside the analysis, to be merged again on resuming
+        if checkpoint is not None:
+            checkpoint.record_result(key, {
+                'analysis': analysis,
+                'statistics': statistics.state() if Opt.Approximate in options else None
+            })
+
+        if overall is not None:
+            self.merge_overall(overall, statistics)
+
+        return analysis
+
+    def merge_overall(self, overall, statistics):
+        """
+        Merges the statistics of a user's posts into the statistics of every user's posts. Crawls run on many threads,
+        so merges take turns.
+
+        Args:
+            overall: The ApproximateStatistics of every user's posts.
+            statistics: The ApproximateStatistics of the user's posts.
+        """
+        with self.overall_lock:
+            overall.merge(statistics)
+
+    @staticmethod
+    def analysis(summary):
+        """
+        Formats summary statistics of like counts as a like analysis.
+
+        Args:
+            summary: The summary statistics of the like counts of a user's posts, keyed by post ID, as returned by
+                `RunningStatistics.summary`.
+
+        Returns:
+            The like analysis, as returned by `run`.
+        """
+        return {
+            'post_count': summary['count'],
+            'sum': summary['sum'],
+            'mean': summary['mean'],
+            'median': summary['median'],
+            'mode': summary['mode'],
+            'percentiles': summary['percentiles'],
+            'most_liked': {
+                'id': summary['maximum']['item'],
+                'likes': summary['maximum']['value']
+            } if summary['maximum'] else None,
+            'least_liked': {
+                'id': summary['minimum']['item'],
+                'likes': summary['minimum']['value']
+            } if summary['minimum'] else None
+        }
+
+    def update_snapshot(self, snapshot_store, user, refresh_window):
+        """
+        Brings the stored snapshot of a user's timeline up to date. Only posts newer than the head of the snapshot are
+        fetched, along with the `refresh_window` most recent posts already in the snapshot, whose like counts are likely
+        to still be changing. Older posts are taken from the snapshot as is. If no snapshot exists, the entire timeline
+        is fetched. A generator, which yields after each request, as per `crawl`.
+
+        Args:
+            snapshot_store: The MediaSnapshotStore holding the snapshots.
+            user: The user's details, as returned in `data` by `InstagramDataService.user_info`.
+            refresh_window: The number of the most recent posts in the snapshot to refetch.
+
+        Yields:
+            None, after each request.
+
+        Returns:
+            The updated snapshot of the user's posts, newest first.
+        """
+        snapshot = snapshot_store.load(user['id']) or []
+
+        refreshed_ids = set(post['id'] for post in snapshot[:refresh_window])
+        stale_ids = set(post['id'] for post in snapshot[refresh_window:])
+
+        fetched_posts = []
+
+        for page in self.instagram_data_service.iter_user_media_pages(user['id'], count=50):
+            reached_snapshot = False
+
+            for image in page:
+                # Everything from here on is already in the snapshot, and old enough not to need refreshing.
+                if image.id in stale_ids:
+                    reached_snapshot = True
+                    break
+
+                fetched_posts.append({
+                    'id': image.id,
+                    'created_at_timestamp': image.created_at_timestamp,
+                    'likes': image.like_count,
+                    'comments': image.comment_count
+                })
+
+            if reached_snapshot:
                 break
 
-        like_count = 0
+            yield
+
+        # Posts in the refresh window which were not fetched again have since been deleted, so are dropped.
+        fetched_ids = set(post['id'] for post in fetched_posts)
+        posts = fetched_posts + [
+            post for post in snapshot if post['id'] not in fetched_ids and post['id'] not in refreshed_ids
+        ]
+        posts.sort(key=lambda post: post['created_at_timestamp'], reverse=True)
 
-        while images:
-            like_count += images[0]['likes']['count']
-            images = images[1:]
+        snapshot_store.save(user['id'], user['username'], posts)
 
-        return like_count
+        return posts
 
     def __str__(self):
         """
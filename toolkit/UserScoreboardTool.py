@@ -1,6 +1,11 @@
-from Opt import Opt
-from InstagramDataService import InstagramDataService
+import contextvars
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from Opt import Opt
+from CrawlCheckpoint import CrawlCheckpoint
+from WorkQueue import WorkQueue
+from InstagramDataService import InstagramDataService, UserNotFoundException
 
 
 class UserScoreboardTool:
@@ -8,6 +13,13 @@ class UserScoreboardTool:
     For a given file line-separated file of instagram users, calculates the total post count for all users, and order the
     resulting output by most posts first.
     """
+
+    # Number of users to look up in parallel, unless overridden with -concurrency
+    default_concurrency = 8
+
+    # Seconds between checks of a shared work queue, while waiting on other workers to finish
+    queue_poll_interval = 5
+
     def __init__(self, instagram_data_service: InstagramDataService) -> None:
         """
         Initialization.
@@ -23,10 +35,20 @@ class UserScoreboardTool:
             A dictionary containing two sets, `mandatory`, and `optional`.
         """
         return {
-            "mandatory": {Opt.File},
-            "optional": set()
+            "mandatory": set(),
+            "optional": {Opt.File, Opt.Concurrency, Opt.Checkpoint, Opt.Resume, Opt.Queue}
         }
 
+    @staticmethod
+    def requires_network():
+        """
+        Whether the tool makes requests to Instagram.
+
+        Returns:
+            True.
+        """
+        return True
+
     def run(self, options):
         """
         Runs the tool.
@@ -37,32 +59,214 @@ class UserScoreboardTool:
         Returns:
             An ordered list of users ordered by post count.
         """
-        filename = options[Opt.File]
+        if Opt.File not in options and Opt.Queue not in options:
+            raise Exception("Please provide a file of usernames with -file, or a work queue to join with -queue")
 
-        usernames = []
+        concurrency = int(options.get(Opt.Concurrency, self.default_concurrency))
 
-        with open(filename) as f:
-            for line in f:
-                usernames.append(line.rstrip())
+        if concurrency < 1:
+            raise Exception("concurrency must be at least 1")
 
-        users_by_media_count = []
+        if Opt.Queue in options:
+            users_by_media_count = self.crawl_queue(options, concurrency)
 
-        for username in usernames:
-            time.sleep(2)
-            try:
-                media_count = self.instagram_data_service.user_info(username)['data']['counts']['media']
-                users_by_media_count.append({
-                    'username': username,
-                    'count': media_count
-                })
-            except Exception as e:
-                print("User could not be found: {}. Skipping...".format(username))
+            if users_by_media_count is None:
+                return ""
+        else:
+            users_by_media_count = self.crawl_file(options, concurrency)
 
         for user_with_media_count in sorted(users_by_media_count, key=lambda user: user['count'], reverse=True):
             print(user_with_media_count['username'].ljust(25) + str(user_with_media_count['count']))
 
         return ""
 
+    @staticmethod
+    def read_usernames(filename):
+        """
+        Reads a newline-separated file of usernames. Each user is only looked up and listed once, however many times,
+        or however cased, they appear in the file. Blank lines are skipped.
+
+        Args:
+            filename: The location of the file.
+
+        Returns:
+            A dictionary of each normalized username to the username as it first appears in the file.
+        """
+        usernames = {}
+
+        with open(filename) as f:
+            for line in f:
+                username = line.strip()
+                normalized_username = InstagramDataService.normalize_username(username)
+
+                if normalized_username:
+                    usernames.setdefault(normalized_username, username)
+
+        return usernames
+
+    def crawl_file(self, options, concurrency):
+        """
+        Looks up the media count of every user in a file, in this process alone.
+
+        Args:
+            options: The options the tool was run with.
+            concurrency: The number of users to look up in parallel.
+
+        Returns:
+            A list of dictionaries of the username and media count of every user found.
+        """
+        filename = options[Opt.File]
+        usernames = self.read_usernames(filename)
+
+        # With a checkpoint, each user's count is recorded as it arrives, and users counted by a previous run which is
+        # being resumed are not looked up again.
+        checkpoint = CrawlCheckpoint.from_options(options, str(self), os.path.abspath(filename))
+        users_by_media_count = []
+        pending_usernames = []
+
+        for key, username in usernames.items():
+            result = checkpoint.result(key) if checkpoint is not None else None
+
+            if result is not None:
+                users_by_media_count.append(result)
+            else:
+                pending_usernames.append(username)
+
+        try:
+            # Workers share the data service's throttle, so their combined request rate adapts to Instagram as a whole.
+            # Each lookup runs in a copy of the caller's context, so that what it prints is captured along with the rest
+            # of the run's output by the daemon.
+            context = contextvars.copy_context()
+
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = executor.map(
+                    lambda username: context.copy().run(self.fetch_media_count, username, checkpoint), pending_usernames
+                )
+                users_by_media_count.extend(result for result in results if result is not None)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+        return users_by_media_count
+
+    def crawl_queue(self, options, concurrency):
+        """
+        Looks up media counts as one of any number of worker processes, on this host or others, sharing a WorkQueue.
+        Users are leased from the queue a batch at a time, and their counts recorded in it. Once every user in the queue
+        has been looked up, by whichever worker, the counts of them all are merged and reported by the worker which saw
+        the queue finish first, or by any worker joining a queue which had already finished.
+
+        Args:
+            options: The options the tool was run with. If a file of usernames is provided, any of its users not yet in
+                the queue are added to it first.
+            concurrency: The number of users this worker looks up in parallel.
+
+        Returns:
+            A list of dictionaries of the username and media count of every user found, or None if another worker
+            reports them.
+        """
+        queue = WorkQueue(options[Opt.Queue])
+
+        if Opt.File in options:
+            queue.enqueue(self.read_usernames(options[Opt.File]).items())
+
+        counts = queue.counts()
+        already_finished = counts['pending'] == 0 and counts['leased'] == 0
+
+        context = contextvars.copy_context()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                items = queue.lease(concurrency)
+
+                if not items:
+                    counts = queue.counts()
+                    if counts['pending'] == 0 and counts['leased'] == 0:
+                        break
+
+                    # Other workers are still busy. Should one of them die, its users are leased again once their
+                    # leases expire.
+                    time.sleep(self.queue_poll_interval)
+                    continue
+
+                list(executor.map(lambda item: context.copy().run(self.work_queue_item, queue, *item), items))
+
+        if not queue.claim('report') and not already_finished:
+            print("{} users looked up in all. The scoreboard is printed by another worker.".format(counts['done']))
+            return None
+
+        for username, error in queue.failures():
+            print("User could not be found: {}. Skipping...".format(username))
+
+        return [result for _, result in queue.results()]
+
+    def work_queue_item(self, queue, key, username):
+        """
+        Looks up the media count of a user leased from a WorkQueue, and records it in the queue, or records that the
+        lookup failed so that it is retried, unless the user does not exist.
+
+        Args:
+            queue: The WorkQueue.
+            key: The key of the user in the queue, their normalized username.
+            username: The username of the user.
+        """
+        try:
+            media_count = self.lookup_media_count(username)
+        except UserNotFoundException as e:
+            queue.fail(key, e, retry=False)
+            return
+        except Exception as e:
+            queue.fail(key, e)
+            return
+
+        queue.ack(key, {
+            'username': username,
+            'count': media_count
+        })
+
+    def lookup_media_count(self, username):
+        """
+        Looks up the number of posts a user has made. With a hashtag index, the data service also records the user's
+        ID and username in it, as it does for every user looked up.
+
+        Args:
+            username: The username of the user.
+
+        Returns:
+            The number of posts the user has made.
+
+        Raises:
+            Exception: If the user could not be looked up.
+        """
+        return self.instagram_data_service.user_info(username, fields=[('counts', 'media')])['data']['counts']['media']
+
+    def fetch_media_count(self, username, checkpoint=None):
+        """
+        Retrieves the media count for a single user. Run concurrently by the worker pool.
+
+        Args:
+            username: The username of the user to retrieve the media count for.
+            checkpoint: An optional CrawlCheckpoint to record the media count in.
+
+        Returns:
+            A dictionary of the username and their media count, or None if the user could not be found.
+        """
+        try:
+            media_count = self.lookup_media_count(username)
+        except Exception as e:
+            print("User could not be found: {}. Skipping...".format(username))
+            return None
+
+        result = {
+            'username': username,
+            'count': media_count
+        }
+
+        if checkpoint is not None:
+            checkpoint.record_result(InstagramDataService.normalize_username(username), result)
+
+        return result
+
     def __str__(self):
         """
         Retrieves the name of this tool.
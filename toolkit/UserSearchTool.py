@@ -0,0 +1,67 @@
+from Opt import Opt
+from InstagramDataService import InstagramDataService
+
+
+class UserSearchTool:
+    """
+    Searches for users by username or full name, as Instagram's own search box does.
+    """
+
+    # Number of users reported, unless overridden with -top
+    default_top_count = 10
+
+    def __init__(self, instagram_data_service: InstagramDataService) -> None:
+        """
+        Initialization.
+        """
+        self.instagram_data_service = instagram_data_service
+
+    @staticmethod
+    def requested_options():
+        """
+        The options needed and preferred for the tool to run successfully.
+
+        Returns:
+            A dictionary containing two sets, `mandatory`, and `optional`.
+        """
+        return {
+            "mandatory": {Opt.Query},
+            "optional": {Opt.TopCount}
+        }
+
+    @staticmethod
+    def requires_network():
+        """
+        Whether the tool makes requests to Instagram.
+
+        Returns:
+            True.
+        """
+        return True
+
+    def run(self, options):
+        """
+        Runs the tool.
+
+        Arguments:
+            options: The options the tools needs to run this command successfully.
+
+        Returns:
+            A list of the users found, best match first, as dictionaries of their `id`, `username`, and `full_name`.
+        """
+        users = self.instagram_data_service.users_search(
+            q=options[Opt.Query], count=int(options.get(Opt.TopCount, self.default_top_count))
+        )['data']
+
+        return [
+            {'id': user['id'], 'username': user.get('username'), 'full_name': user.get('full_name')} for user in users
+        ]
+
+    def __str__(self):
+        """
+        Retrieves the name of this tool.
+
+        Returns:
+            A stringified representation of this class. Just the name of the tool.
+        """
+        return 'user-search'